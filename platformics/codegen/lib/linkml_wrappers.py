@@ -366,6 +366,12 @@ class EntityWrapper:
             return self.wrapped_class.annotations["mutable"].value
         return True
 
+    @cached_property
+    def result_cache_ttl(self) -> float | None:
+        if "result_cache_ttl" in self.wrapped_class.annotations:
+            return float(self.wrapped_class.annotations["result_cache_ttl"].value)
+        return None
+
     @cached_property
     def is_system_only_mutable(self) -> bool:
         if "system_writable_only" in self.wrapped_class.annotations:
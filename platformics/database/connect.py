@@ -1,4 +1,7 @@
-from typing import Any, Optional
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
 
 from sqlalchemy.engine import Engine, create_engine
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
@@ -6,14 +9,21 @@ from sqlalchemy.orm import Session, sessionmaker
 
 
 class AsyncDB:
-    def __init__(self, engine: AsyncEngine):
+    def __init__(self, engine: AsyncEngine, replica_engines: Optional[list[AsyncEngine]] = None):
         self._engine = engine
         self._session_maker: Optional[async_sessionmaker[AsyncSession]] = None
+        self._replica_engines = replica_engines or []
+        self._replica_session_makers: Optional[list[async_sessionmaker[AsyncSession]]] = None
+        self._replica_counter = itertools.count()
 
     @property
     def engine(self) -> AsyncEngine:
         return self._engine
 
+    @property
+    def replica_engines(self) -> list[AsyncEngine]:
+        return self._replica_engines
+
     @property
     def session(self) -> async_sessionmaker[AsyncSession]:
         if not self._session_maker:
@@ -21,6 +31,91 @@ class AsyncDB:
             self._session_maker = session
         return self._session_maker
 
+    @property
+    def read_session(self) -> async_sessionmaker[AsyncSession]:
+        """
+        Session factory for read-only work. Round-robins between the read replicas, whose
+        transactions are all READ ONLY, and falls back to the primary if there are no replicas.
+        """
+        if not self._replica_engines:
+            return self.session
+        if not self._replica_session_makers:
+            self._replica_session_makers = [
+                async_sessionmaker(engine.execution_options(postgresql_readonly=True), expire_on_commit=False)
+                for engine in self._replica_engines
+            ]
+        return self._replica_session_makers[next(self._replica_counter) % len(self._replica_session_makers)]
+
+    async def dispose(self) -> None:
+        await self._engine.dispose()
+        for engine in self._replica_engines:
+            await engine.dispose()
+
+
+class RequestSessionManager:
+    """
+    Hands out a bounded number of sessions that are reused for the lifetime of a single request,
+    so that all resolvers and dataloader batches of a GraphQL operation share a few DB connections
+    instead of checking out a new one for every top-level field and every batch.
+
+    Read-only work is sent to the read replicas until the request borrows a session to write
+    with; from then on, reads are pinned to the primary so that they see the request's writes.
+    Sessions borrowed to write with are never lent out for reads (and vice versa), so that
+    rolling back a failed write can't expire rows that other resolvers have already returned.
+    """
+
+    def __init__(self, db: AsyncDB, max_sessions: int = 1):
+        self._db = db
+        self._semaphore = asyncio.Semaphore(max_sessions)
+        # Idle sessions, by (read_only, use_replica)
+        self._idle: dict[tuple[bool, bool], list[AsyncSession]] = {}
+        self._sessions: list[AsyncSession] = []
+        self.has_written = False
+        # Number of times a session was borrowed to write with
+        self.writes = 0
+
+    @asynccontextmanager
+    async def session(self, read_only: bool = False) -> AsyncIterator[AsyncSession]:
+        """
+        Borrow a session for the duration of the context. Sessions can't run concurrent
+        statements, so a session is only ever lent to one caller at a time.
+        """
+        if not read_only:
+            self.has_written = True
+            self.writes += 1
+        use_replica = read_only and not self.has_written
+        async with self._semaphore:
+            idle = self._idle.setdefault((read_only, use_replica), [])
+            if idle:
+                session = idle.pop()
+            else:
+                session = self._db.read_session() if use_replica else self._db.session()
+                self._sessions.append(session)
+            try:
+                yield session
+            except BaseException:
+                if read_only:
+                    # Rolling back would expire every row read through the session, which other resolvers
+                    # may still be returning. Closing it detaches them instead, with their loaded values.
+                    await session.close()
+                else:
+                    # Don't leak half-finished changes to the next borrower
+                    await session.rollback()
+                raise
+            else:
+                if read_only and session.in_transaction():
+                    # Don't leave the connection idle in transaction until the end of the request
+                    # (sessions don't expire their rows on commit)
+                    await session.commit()
+            finally:
+                idle.append(session)
+
+    async def close(self) -> None:
+        for session in self._sessions:
+            await session.close()
+        self._sessions = []
+        self._idle = {}
+
 
 class SyncDB:
     def __init__(self, engine: Engine):
@@ -39,9 +134,10 @@ class SyncDB:
         return self._session_maker
 
 
-def init_async_db(db_uri: str, **kwargs: dict[str, Any]) -> AsyncDB:
+def init_async_db(db_uri: str, replica_uris: Optional[list[str]] = None, **kwargs: dict[str, Any]) -> AsyncDB:
     engine = create_async_engine(db_uri, future=True, **kwargs)
-    return AsyncDB(engine)
+    replica_engines = [create_async_engine(uri, future=True, **kwargs) for uri in replica_uris or []]
+    return AsyncDB(engine, replica_engines)
 
 
 def init_sync_db(db_uri: str, **kwargs: dict[str, Any]) -> SyncDB:
@@ -1,3 +1,4 @@
 # isort: skip_file
 
 from platformics.database.models.base import Base, meta  # noqa: F401
+from platformics.database.models.table_version import table_version  # noqa: F401
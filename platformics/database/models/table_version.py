@@ -0,0 +1,11 @@
+from sqlalchemy import BigInteger, Column, String, Table
+
+from platformics.database.models.base import meta
+
+# The write version of each model table (see platformics/database/table_versions.py)
+table_version = Table(
+    "platformics_table_version",
+    meta,
+    Column("table_name", String, primary_key=True),
+    Column("version", BigInteger, nullable=False),
+)
@@ -0,0 +1,174 @@
+"""
+Write versions of the model tables, shared by all workers.
+
+Every transaction that writes to a table bumps the table's version in the platformics_table_version table
+(see TableVersions.bump_on_flush, which the generated mutations call), and broadcasts the new version with
+Postgres NOTIFY, which is only delivered once the transaction commits. Each worker listens for these
+notifications (see TableVersions.start) and keeps a map of the latest version of each table, so that caches
+can key their entries on the versions of the tables they were read from: as soon as any worker commits a
+write to one of these tables, the cached entries stop matching.
+"""
+
+import asyncio
+import contextlib
+import logging
+import typing
+from typing import Iterable, Optional
+
+import sqlalchemy as sa
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from platformics.database.connect import AsyncDB
+from platformics.database.models.table_version import table_version
+from platformics.settings import APISettings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "platformics_table_version"
+# How often to check that the listening connection is still alive, in seconds
+HEARTBEAT_INTERVAL = 30
+
+# Where sessions keep the versions they've bumped until they commit
+_BUMPED_KEY = "platformics_bumped_table_versions"
+
+
+class TableVersions:
+    """
+    The latest write version of each table, kept up to date by listening for the versions that any worker
+    commits. Versions are only reliable while `is_live` is true: notifications sent while the listener is
+    (re)connecting are lost, so callers shouldn't trust versions until it has caught up again.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        self.enabled = settings.DB_TABLE_VERSIONS
+        self.reconnect_delay = settings.DB_TABLE_VERSIONS_RECONNECT_DELAY
+        self.is_live = False
+        self._versions: dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, table_name: str) -> int:
+        return self._versions.get(table_name, 0)
+
+    def get_versions(self, table_names: Iterable[str]) -> Optional[tuple[int, ...]]:
+        """
+        The versions of several tables, or None if they're not reliable (see `is_live`)
+        """
+        if not self.is_live:
+            return None
+        return tuple(self.get(table_name) for table_name in table_names)
+
+    def update(self, table_name: str, version: int) -> None:
+        # Notifications can arrive after the versions are re-read on (re)connect, so never go back
+        if version > self._versions.get(table_name, 0):
+            self._versions[table_name] = version
+
+    def bump_on_flush(self, session: AsyncSession) -> None:
+        """
+        Bump the versions of the tables that a session writes to, in the same transaction, whenever it's
+        flushed. Call it before the session's first flush (including autoflushes).
+        """
+        if not self.enabled:
+            return
+        sync_session = session.sync_session
+        listeners: list[tuple[str, typing.Callable[..., typing.Any]]] = [
+            ("after_flush", self._after_flush),
+            ("after_commit", self._after_commit),
+            ("after_rollback", self._after_rollback),
+        ]
+        for event_name, listener in listeners:
+            if not event.contains(sync_session, event_name, listener):
+                event.listen(sync_session, event_name, listener)
+
+    def _after_flush(self, session: Session, flush_context: typing.Any) -> None:
+        # The session's new, dirty and deleted collections still hold what was just flushed
+        table_names = {
+            table.name
+            for obj in [*session.new, *session.dirty, *session.deleted]
+            for table in sa.inspect(obj).mapper.tables
+        }
+        if not table_names:
+            return
+        # Bump the versions in a consistent order, so that concurrent transactions don't deadlock
+        upsert = insert(table_version).values([{"table_name": name, "version": 1} for name in sorted(table_names)])
+        stmt = upsert.on_conflict_do_update(
+            index_elements=[table_version.c.table_name],
+            set_={"version": table_version.c.version + 1},
+        ).returning(table_version.c.table_name, table_version.c.version)
+        connection = session.connection()
+        bumped = connection.execute(stmt).all()
+        # Notifications are only delivered once (and if) the transaction commits
+        connection.execute(select(*[func.pg_notify(CHANNEL, f"{name}:{version}") for name, version in bumped]))
+        session.info.setdefault(_BUMPED_KEY, []).extend(bumped)
+
+    def _after_commit(self, session: Session) -> None:
+        # Don't wait for the notifications to come back to this worker
+        for table_name, version in session.info.pop(_BUMPED_KEY, []):
+            self.update(table_name, version)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_BUMPED_KEY, None)
+
+    def start(self, db: AsyncDB) -> None:
+        """
+        Start listening for the versions that workers commit, until `stop` is called
+        """
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._listen(db.engine))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _listen(self, engine: AsyncEngine) -> None:
+        while True:
+            try:
+                async with engine.connect() as conn:
+                    await self._listen_on(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Lost the connection that listens for table versions")
+            logger.warning("Reconnecting to listen for table versions in %s seconds", self.reconnect_delay)
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen_on(self, conn: AsyncConnection) -> None:
+        """
+        Listen for versions on one connection, until it's lost
+        """
+        raw_connection = await conn.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        if driver_connection is None:
+            raise Exception("The connection that listens for table versions has no driver connection")
+        disconnected = asyncio.Event()
+        driver_connection.add_termination_listener(lambda _: disconnected.set())
+        await driver_connection.add_listener(CHANNEL, self._on_notification)
+        try:
+            # Catch up with the versions that were committed before we started listening
+            for table_name, version in await conn.execute(select(table_version)):
+                self.update(table_name, version)
+            await conn.rollback()
+            self.is_live = True
+            while not disconnected.is_set():
+                try:
+                    await asyncio.wait_for(disconnected.wait(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # A dead connection would silently stop delivering notifications
+                    await driver_connection.execute("SELECT 1")
+        finally:
+            self.is_live = False
+            if not driver_connection.is_closed():
+                await driver_connection.remove_listener(CHANNEL, self._on_notification)
+
+    def _on_notification(self, connection: typing.Any, pid: int, channel: str, payload: str) -> None:
+        table_name, _, version = payload.rpartition(":")
+        try:
+            self.update(table_name, int(version))
+        except ValueError:
+            logger.warning("Ignoring malformed table version notification: %s", payload)
@@ -0,0 +1,93 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor holds the values of a row's sort keys (the query's orderBy fields, followed by the primary key as a
+tie-breaker), so that the next page can be fetched with `WHERE (sort keys) > (cursor values)` instead of an
+OFFSET that makes the database scan and discard every row of the previous pages.
+"""
+
+import base64
+import binascii
+import datetime
+import enum
+import json
+import uuid
+from typing import Any, Iterable, Optional
+
+from strawberry.types import Info
+
+from platformics.graphql_api.core.errors import PlatformicsError
+
+# Context key of the cursors of the paginated lists that a request has resolved, by their path in the response
+CURSORS_KEY = "platformics_cursors"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"date": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"uuid": str(value)}
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "datetime" in value:
+            return datetime.datetime.fromisoformat(value["datetime"])
+        if "date" in value:
+            return datetime.date.fromisoformat(value["date"])
+        if "uuid" in value:
+            return uuid.UUID(value["uuid"])
+        raise ValueError("Unknown cursor value")
+    return value
+
+
+def encode_cursor(values: list[Any]) -> str:
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, num_values: Optional[int] = None) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(values, list) or (num_values is not None and len(values) != num_values):
+            raise ValueError("Unexpected number of cursor values")
+        return [_decode_value(value) for value in values]
+    except (ValueError, binascii.Error, UnicodeError):
+        # Cursors are only valid for the orderBy they were created with
+        raise PlatformicsError("Invalid cursor") from None
+
+
+class PaginatedRows(list):
+    """
+    The rows of a paginated query, along with the cursor of each of them (in the same order). The same row can
+    be returned by several queries (rows are identity-mapped by the sessions that resolvers share, and can be
+    shared by concurrent requests), so its cursor is kept with the query's results rather than on the row.
+    """
+
+    def __init__(self, rows: Iterable[Any], cursors: list[str]) -> None:
+        super().__init__(rows)
+        self.cursors = cursors
+
+
+def set_cursors(info: Info, rows: Any) -> None:
+    """
+    Make the cursors of the rows that a list field resolved to available to their `_cursor` fields
+    """
+    if isinstance(rows, PaginatedRows):
+        info.context.setdefault(CURSORS_KEY, {})[tuple(info.path.as_list())] = rows.cursors
+
+
+def get_cursor(info: Info) -> Optional[str]:
+    """
+    Return the cursor of the row that a `_cursor` field belongs to, if it's an item of a paginated list
+    """
+    item_path = info.path.prev
+    if item_path is None or item_path.prev is None or not isinstance(item_path.key, int):
+        return None
+    cursors = info.context.get(CURSORS_KEY, {}).get(tuple(item_path.prev.as_list()))
+    return cursors[item_path.key] if cursors is not None else None
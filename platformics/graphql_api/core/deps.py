@@ -4,10 +4,15 @@ from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 
-from platformics.database.connect import AsyncDB, init_async_db
+from platformics.database.connect import AsyncDB, RequestSessionManager
+from platformics.database.table_versions import TableVersions
+from platformics.graphql_api.core.entity_cache import EntityCache
 from platformics.graphql_api.core.error_handler import PlatformicsError
-from platformics.security.authorization import AuthzClient, Principal, hydrate_auth_principal
+from platformics.graphql_api.core.result_cache import ResultCache
+from platformics.security.auth_executor import AuthExecutor
+from platformics.security.authorization import AuthzClient, Principal, PrincipalCache, hydrate_auth_principal
 from platformics.settings import APISettings
+from platformics.support.singleflight import SingleFlight
 
 
 def get_settings(request: Request) -> APISettings:
@@ -15,21 +20,36 @@ def get_settings(request: Request) -> APISettings:
     return request.app.state.settings
 
 
-async def get_engine(
+def get_engine(request: Request) -> AsyncDB:
+    """Get the DB engine (and its connection pool) that lives for the lifetime of the app"""
+    return request.app.state.db
+
+
+async def get_session_manager(
+    request: Request,
+    engine: AsyncDB = Depends(get_engine),
     settings: APISettings = Depends(get_settings),
-) -> typing.AsyncGenerator[AsyncDB, None]:
-    """Wrap resolvers in a DB engine"""
-    engine = init_async_db(settings.DB_URI, echo=settings.DB_ECHO)  # type: ignore
+) -> typing.AsyncGenerator[RequestSessionManager, None]:
+    """Share a bounded number of db sessions between all resolvers and dataloaders of a request"""
+    session_manager = RequestSessionManager(engine, settings.DB_CONNECTIONS_PER_REQUEST)
+    request.state.session_manager = session_manager
     try:
-        yield engine
+        yield session_manager
     finally:
-        pass
+        await session_manager.close()
 
 
 async def get_db_session(
+    request: Request,
     engine: AsyncDB = Depends(get_engine),
 ) -> typing.AsyncGenerator[AsyncSession, None]:
-    """Wrap resolvers in a sqlalchemy-compatible db session"""
+    """Wrap resolvers in a sqlalchemy-compatible db session, connected to the primary db"""
+    # Borrow a session from the request's session manager if there is one (see get_context)
+    session_manager: typing.Optional[RequestSessionManager] = getattr(request.state, "session_manager", None)
+    if session_manager:
+        async with session_manager.session() as session:
+            yield session
+        return
     session = engine.session()
     try:
         yield session
@@ -37,8 +57,59 @@ async def get_db_session(
         await session.close()  # type: ignore
 
 
-def get_authz_client(settings: APISettings = Depends(get_settings)) -> AuthzClient:
-    return AuthzClient(settings=settings)
+async def get_read_db_session(
+    request: Request,
+    engine: AsyncDB = Depends(get_engine),
+) -> typing.AsyncGenerator[AsyncSession, None]:
+    """
+    Wrap read-only resolvers in a sqlalchemy-compatible db session, connected to a read replica
+    unless the request has already written to the primary db
+    """
+    session_manager: typing.Optional[RequestSessionManager] = getattr(request.state, "session_manager", None)
+    if session_manager:
+        async with session_manager.session(read_only=True) as session:
+            yield session
+        return
+    session = engine.read_session()
+    try:
+        yield session
+    finally:
+        await session.close()  # type: ignore
+
+
+def get_authz_client(request: Request) -> AuthzClient:
+    """Get the authz client that lives for the lifetime of the app"""
+    return request.app.state.authz_client
+
+
+def get_entity_cache(request: Request) -> EntityCache:
+    """Get the cache of rows shared by all requests, which lives for the lifetime of the app"""
+    return request.app.state.entity_cache
+
+
+def get_result_cache(request: Request) -> ResultCache:
+    """Get the cache of query results shared by all requests, which lives for the lifetime of the app"""
+    return request.app.state.result_cache
+
+
+def get_read_flights(request: Request) -> typing.Optional[SingleFlight]:
+    """Get the reads in flight that concurrent requests can share (if DB_COALESCE_READS is enabled)"""
+    return request.app.state.read_flights
+
+
+def get_table_versions(request: Request) -> TableVersions:
+    """Get the write versions of the tables, which live for the lifetime of the app"""
+    return request.app.state.table_versions
+
+
+def get_principal_cache(request: Request) -> PrincipalCache:
+    """Get the cache of hydrated principals that lives for the lifetime of the app"""
+    return request.app.state.principal_cache
+
+
+def get_auth_executor(request: Request) -> AuthExecutor:
+    """Get the pool that runs CPU-bound auth work, which lives for the lifetime of the app"""
+    return request.app.state.auth_executor
 
 
 def get_user_token(request: Request) -> typing.Optional[str]:
@@ -54,13 +125,15 @@ def get_user_token(request: Request) -> typing.Optional[str]:
     return parts[1]
 
 
-def get_auth_principal(
+async def get_auth_principal(
     request: Request,
     settings: APISettings = Depends(get_settings),
     user_token: typing.Optional[str] = Depends(get_user_token),
+    principal_cache: PrincipalCache = Depends(get_principal_cache),
+    auth_executor: AuthExecutor = Depends(get_auth_executor),
 ) -> typing.Optional[Principal]:
     try:
-        principal = hydrate_auth_principal(settings, user_token)
+        principal = await hydrate_auth_principal(settings, user_token, principal_cache, auth_executor)
     except:  # noqa
         raise PlatformicsError("Unauthorized") from None
     return principal
@@ -0,0 +1,96 @@
+"""
+A cache of rows shared by all requests, for primary key lookups (see gql_loaders.EntityLoader).
+
+Entries hold a row's column values, regardless of who read it: each request still checks whether its
+principal can view a cached row (see AuthzClient.can_view_row). The generated mutations evict the rows
+they write, and entries also expire after ENTITY_CACHE_TTL seconds, which bounds how stale rows written
+by other processes (or read from a lagging replica) can get.
+
+EntityCache keeps rows in-process. Other backends (e.g. one shared between processes) can subclass it
+and override `get_row`, `set_row` and `evict`.
+"""
+
+import typing
+from typing import Any, Iterable, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from platformics.settings import APISettings
+from platformics.support import sqlalchemy_helpers
+from platformics.support.cache import LRUCache
+
+# Where sessions keep the rows they've evicted until they commit
+_EVICTED_KEY = "platformics_evicted_entities"
+
+
+class EntityCache(LRUCache[Tuple[str, Any], dict[str, Any]]):
+    """
+    Column values of rows, keyed by (table name, primary key). Check `stats` for its hits, misses
+    and evictions.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        super().__init__(maxsize=settings.ENTITY_CACHE_SIZE, ttl=settings.ENTITY_CACHE_TTL)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get_row(self, model_cls: Any, pk: Any) -> Optional[dict[str, Any]]:
+        return self.get((model_cls.__tablename__, pk))
+
+    def set_row(self, model_cls: Any, pk: Any, values: dict[str, Any]) -> None:
+        self.set((model_cls.__tablename__, pk), values)
+
+    def evict(self, model_cls: Any, pks: Iterable[Any]) -> None:
+        for pk in pks:
+            self.pop((model_cls.__tablename__, pk))
+
+    def evict_rows(self, rows: Iterable[Any]) -> list[Tuple[Any, Any]]:
+        """
+        Evict the entries of ORM instances, and return their (model, primary key)
+        """
+        evicted = []
+        for row in rows:
+            primary_key = sqlalchemy_helpers.get_model_metadata(type(row)).primary_key
+            if primary_key is None:
+                continue
+            pk = sa.inspect(row).dict.get(primary_key[0])
+            if pk is not None:
+                self.evict(type(row), [pk])
+                evicted.append((type(row), pk))
+        return evicted
+
+    def evict_on_flush(self, session: AsyncSession) -> None:
+        """
+        Evict the rows that a session updates or deletes when it's flushed, and again when it commits, in case
+        other requests re-read the old rows in between. Call it before the session's first flush (including
+        autoflushes). Rows deleted by ORM cascades are evicted too, but rows that the database deletes itself
+        (ON DELETE CASCADE) never reach the session, and only expire after ENTITY_CACHE_TTL seconds.
+        """
+        if not self.enabled:
+            return
+        sync_session = session.sync_session
+        listeners: list[Tuple[str, typing.Callable[..., Any]]] = [
+            ("after_flush", self._after_flush),
+            ("after_commit", self._after_commit),
+            ("after_rollback", self._after_rollback),
+        ]
+        for event_name, listener in listeners:
+            if not event.contains(sync_session, event_name, listener):
+                event.listen(sync_session, event_name, listener)
+
+    def _after_flush(self, session: Session, flush_context: typing.Any) -> None:
+        # The session's dirty and deleted collections still hold what was just flushed
+        evicted = self.evict_rows([*session.dirty, *session.deleted])
+        session.info.setdefault(_EVICTED_KEY, []).extend(evicted)
+
+    def _after_commit(self, session: Session) -> None:
+        for model_cls, pk in session.info.pop(_EVICTED_KEY, []):
+            self.evict(model_cls, [pk])
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_EVICTED_KEY, None)
@@ -1,16 +1,38 @@
+import asyncio
+import sys
+import time
 import typing
 from collections import defaultdict
-from typing import Any, Mapping, Optional, Sequence, Tuple
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Mapping, Optional, Sequence, Tuple
 
 import sqlalchemy as sa
-from sqlalchemy.orm import RelationshipProperty
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import MANYTOONE, RelationshipProperty
 from strawberry.dataloader import DataLoader
 
-from platformics.database.connect import AsyncDB
+from platformics.database.connect import AsyncDB, RequestSessionManager
+from platformics.graphql_api.core.entity_cache import EntityCache
 from platformics.graphql_api.core.errors import PlatformicsError
-from platformics.graphql_api.core.query_builder import get_aggregate_db_query, get_db_query, get_db_rows
+from platformics.graphql_api.core.query_builder import (
+    SortKey,
+    apply_load_only,
+    apply_sort_keys,
+    freeze,
+    get_aggregate_db_query,
+    get_db_rows,
+    get_order_by_clauses,
+    get_sort_key,
+    get_sorted_db_query,
+    select_record_columns,
+    uses_query_plans,
+)
+from platformics.graphql_api.core.query_input_types import orderBy
+from platformics.graphql_api.core.records import Record, to_records
+from platformics.graphql_api.core.result_cache import ResultCache, freeze_selections, get_read_models
 from platformics.security.authorization import AuthzAction, AuthzClient, Principal
 from platformics.support import sqlalchemy_helpers
+from platformics.support.singleflight import SingleFlight
 
 E = typing.TypeVar("E")
 T = typing.TypeVar("T")
@@ -36,6 +58,62 @@ def get_input_hash(input_dict: dict) -> int:
     return hash(tuple(sorted(hash_dict.items())))
 
 
+# A (start, stop) slice of the rows related to each parent. A stop of None means "all remaining rows"
+Window = Tuple[int, Optional[int]]
+
+
+class ConnectionRows:
+    """
+    The rows of a nested relay connection, loaded lazily.
+
+    `relay.ListConnection` paginates the rows returned by a resolver by slicing them. Slicing this object
+    instead narrows down the window of rows that its dataloader fetches (per parent) from the database, so
+    that `first: 10` only loads 11 rows (ListConnection overfetches by one) rather than every related row.
+    """
+
+    def __init__(
+        self,
+        entity_loader: "EntityLoader",
+        relationship: RelationshipProperty,
+        key: Any,
+        where: Optional[Any] = None,
+        order_by: Optional[Any] = None,
+        columns: Optional[Sequence[str]] = None,
+        window: Window = (0, None),
+    ) -> None:
+        self.entity_loader = entity_loader
+        self.relationship = relationship
+        self.key = key
+        self.where = where
+        self.order_by = order_by
+        self.columns = columns
+        self.window = window
+
+    def __getitem__(self, item: slice) -> "ConnectionRows":
+        if not isinstance(item, slice) or item.step not in (None, 1) or (item.start or 0) < 0:
+            raise TypeError("ConnectionRows only support slices with non-negative bounds")
+        current_start, current_stop = self.window
+        start = current_start + (item.start or 0)
+        stop = current_stop
+        # ListConnection slices up to sys.maxsize when it needs every row
+        if item.stop is not None and item.stop < sys.maxsize:
+            stop = current_start + item.stop if current_stop is None else min(current_stop, current_start + item.stop)
+        return ConnectionRows(
+            self.entity_loader,
+            self.relationship,
+            self.key,
+            self.where,
+            self.order_by,
+            self.columns,
+            (start, stop),
+        )
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        loader = self.entity_loader.loader_for(self.relationship, self.where, self.order_by, self.window, self.columns)
+        for row in await loader.load(self.key):
+            yield row
+
+
 class EntityLoader:
     """
     Creates DataLoader instances on-the-fly for SQLAlchemy relationships
@@ -53,8 +131,21 @@ class EntityLoader:
 
     _loaders: dict[RelationshipProperty, DataLoader]  # Cache of relationship dataloaders
     _aggregate_loaders: dict[RelationshipProperty, DataLoader]  # Cache for aggregate operations
+    _node_loaders: dict[Any, DataLoader]  # Cache of primary key dataloaders, per class
 
-    def __init__(self, engine: AsyncDB, authz_client: AuthzClient, principal: Principal) -> None:
+    def __init__(
+        self,
+        engine: AsyncDB,
+        authz_client: AuthzClient,
+        principal: Principal,
+        session_manager: Optional[RequestSessionManager] = None,
+        max_batch_size: Optional[int] = None,
+        max_sessions: int = 1,
+        core_reads: bool = False,
+        entity_cache: Optional[EntityCache] = None,
+        result_cache: Optional[ResultCache] = None,
+        flights: Optional[SingleFlight] = None,
+    ) -> None:
         """
         Initialize the EntityLoader with database connection and security context.
 
@@ -62,50 +153,331 @@ class EntityLoader:
             engine: The async database connection
             authz_client: Client that handles authorization checks
             principal: The user/service making the request
+            session_manager: Request-scoped sessions shared with the rest of the request. If not
+                provided, every batch opens (and closes) its own session.
+            max_batch_size: Max number of keys to load in one statement. Larger batches are split into
+                chunks that run concurrently, on as many sessions as the request can hold at once.
+            max_sessions: Max number of sessions that batches can use at once, if there is no session_manager
+                (which has its own limit).
+            core_reads: Read rows without the ORM, as records (see records.py)
+            entity_cache: Rows shared by all requests, for primary key lookups (see entity_cache.py). It's
+                only used if queries are authorized by query plans alone, which cached rows are checked against.
+            result_cache: Results of top-level queries shared by all requests (see result_cache.py). It's also only
+                used if queries are authorized by query plans alone, which its keys are made of.
+            flights: Reads in flight, shared with other requests that run the same statements at the same time
+                (see query_builder.get_db_rows). Only reads that started after this loader was created (i.e.
+                during the request) are shared, since older ones may not see writes committed before it.
         """
         self._loaders = {}
         self._aggregate_loaders = {}
+        self._node_loaders = {}
+        self._identity_cache: dict[Tuple[Any, Any], Any] = {}
+        self._identity_cache_writes = 0
         self.engine = engine
         self.authz_client = authz_client
         self.principal = principal
+        self.session_manager = session_manager
+        self.max_batch_size = max_batch_size
+        self.core_reads = core_reads
+        self.entity_cache: Optional[EntityCache] = None
+        if entity_cache is not None and entity_cache.enabled and uses_query_plans(authz_client):
+            self.entity_cache = entity_cache
+        self.result_cache: Optional[ResultCache] = None
+        if result_cache is not None and result_cache.enabled and uses_query_plans(authz_client):
+            self.result_cache = result_cache
+        self._semaphore = asyncio.Semaphore(max_sessions)
+        self._flights = flights.since(time.monotonic()) if flights is not None else None
+
+    @property
+    def flights(self) -> Optional[SingleFlight]:
+        """
+        The reads in flight to share, unless the request has written to the db: a read that started before the
+        write might not see it
+        """
+        if self.session_manager and self.session_manager.writes:
+            return None
+        return self._flights
 
-    async def resolve_nodes(self, cls: Any, node_ids: list[str]) -> Sequence[E]:
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """
+        Borrow a (read-only) db session to run a batch with.
+        """
+        if self.session_manager:
+            async with self.session_manager.session(read_only=True) as session:
+                yield session
+            return
+        async with self._semaphore:
+            session = self.engine.read_session()
+            try:
+                yield session
+            finally:
+                await session.close()
+
+    async def resolve_nodes(self, cls: Any, node_ids: list[str]) -> Sequence[Optional[E]]:
         """
         Fetch entities by their node IDs for GraphQL Relay's node interface.
 
         The Relay node interface lets clients fetch any object by ID without
         knowing its type. This method handles those requests by looking up
-        objects of a specific class by their IDs.
+        objects of a specific class by their IDs. Rows that the request has already
+        read are returned from the identity cache (see cache_rows), and the other
+        lookups are batched per class (see node_loader_for), so a query with many
+        `node(id:)` fields only runs one statement per class.
 
         Args:
             cls: The entity class to query
             node_ids: List of IDs to fetch
 
         Returns:
-            A sequence of found entities
+            The entities, in the same order as the IDs (None for the ones that weren't found)
         """
-        db_session = self.engine.session()
-
         # What's the class identifier?
         pk_col_name, pk_field = sqlalchemy_helpers.get_primary_key(cls)
-        field_type = pk_field.property.columns[0].type
-
-        # if the field type is an int, we need to convert the node_ids to int
-        # TODO - handle other types like date, bool, etc?
-        if isinstance(field_type, (sa.Integer, sa.BigInteger, sa.SmallInteger)):
-            node_ids = [int(node_id) for node_id in node_ids]  # type: ignore
         if pk_col_name is None:
             raise Exception("Primary keys are required for each class")
-        where = {pk_col_name: {"_in": node_ids}}
-        rows = await get_db_rows(cls, db_session, self.authz_client, self.principal, where)
-        await db_session.close()
+        # Convert the node IDs to the type of the primary key (e.g. int or UUID), so that they match
+        # the keys of the rows in the identity cache
+        python_type = pk_field.property.columns[0].type.python_type
+        keys = []
+        for node_id in node_ids:
+            try:
+                keys.append(node_id if isinstance(node_id, python_type) else python_type(node_id))
+            except ValueError:
+                raise PlatformicsError(f"Invalid ID: {node_id}") from None
+        rows = [self.get_cached_row(cls, key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing:
+            loaded = await self.node_loader_for(cls).load_many([keys[i] for i in missing])
+            for i, row in zip(missing, loaded, strict=True):
+                rows[i] = row
         return rows
 
+    def node_loader_for(self, cls: Any) -> DataLoader:
+        """
+        Get or create the DataLoader that fetches rows of a class by primary key, for the node interface.
+        """
+        try:
+            return self._node_loaders[cls]
+        except KeyError:
+            pk_col_name, _ = sqlalchemy_helpers.get_primary_key(cls)
+
+            async def load_fn(keys: list[Any]) -> typing.Sequence[Any]:
+                rows_by_key = await self._get_shared_rows(cls, keys) if self.entity_cache is not None else {}
+                missing = [key for key in keys if key not in rows_by_key]
+                if missing:
+                    where = {pk_col_name: {"_in": missing}}
+                    async with self.session() as db_session:
+                        rows = await get_db_rows(
+                            cls,
+                            db_session,
+                            self.authz_client,
+                            self.principal,
+                            where,
+                            core=self.core_reads,
+                            flights=self.flights,
+                        )
+                    self.cache_rows(rows)
+                    self._share_rows(cls, rows)
+                    rows_by_key.update((getattr(row, pk_col_name), row) for row in rows)
+                return [rows_by_key.get(key) for key in keys]
+
+            self._node_loaders[cls] = DataLoader(load_fn=load_fn, max_batch_size=self.max_batch_size)
+            return self._node_loaders[cls]
+
+    async def _get_shared_rows(self, cls: Any, keys: list[Any]) -> dict[Any, Optional[Any]]:
+        """
+        Look rows up in the shared entity cache, and check that the principal can view them. Returns records of
+        the rows that it can view, and None for the ones it can't.
+        """
+        assert self.entity_cache is not None
+        rows_by_key: dict[Any, Optional[Any]] = {}
+        column_keys = sorted(sqlalchemy_helpers.get_model_metadata(cls).column_keys)
+        for key in keys:
+            values = self.entity_cache.get_row(cls, key)
+            if values is None:
+                continue
+            allowed = await self.authz_client.can_view_row(self.principal, cls, values)
+            if allowed is None:
+                # Let the database decide
+                continue
+            rows_by_key[key] = None
+            if allowed:
+                record = to_records(cls, column_keys, [[values[column] for column in column_keys]])[0]
+                self.cache_rows([record])
+                rows_by_key[key] = record
+        return rows_by_key
+
+    def _share_rows(self, cls: Any, rows: Sequence[Any]) -> None:
+        """
+        Add complete rows that were read by primary key to the shared entity cache
+        """
+        # Rows read after the request has written to the db may not be committed yet
+        if self.entity_cache is None or (self.session_manager and self.session_manager.writes):
+            return
+        metadata = sqlalchemy_helpers.get_model_metadata(cls)
+        pk_col_name = metadata.primary_key[0]  # type: ignore
+        for row in rows:
+            if not self._has_columns(row, None):
+                continue
+            if isinstance(row, Record):
+                values = {key: getattr(row, key) for key in metadata.column_keys}
+            else:
+                values = {key: sa.inspect(row).dict[key] for key in metadata.column_keys}
+            self.entity_cache.set_row(cls, values[pk_col_name], values)
+
+    async def load_result(
+        self,
+        model_cls: Any,
+        arguments: Any,
+        load: typing.Callable[[], typing.Awaitable[T]],
+        ttl: Optional[float],
+        where: Optional[Any] = None,
+        order_by: Optional[Any] = None,
+        group_by: Optional[Sequence[Any]] = None,
+        to_one: typing.Iterable[str] = (),
+    ) -> T:
+        """
+        Run a top-level query with `load`, or return its result from the shared result cache. Results are only
+        cached for models with a TTL, and until the request writes to the db (after which they may not be
+        committed yet). `arguments` must hold every other argument that the result depends on, besides the where /
+        orderBy / groupBy clauses (e.g. limits and selected columns).
+        """
+        if self.result_cache is None or ttl is None or (self.session_manager and self.session_manager.writes):
+            return await load()
+        read_models = get_read_models(model_cls, where, order_by, group_by, to_one)
+        key = await self.result_cache.get_key(
+            self.authz_client,
+            self.principal,
+            model_cls,
+            (freeze(arguments), freeze(where), freeze(order_by), freeze_selections(group_by)),
+            read_models,
+        )
+        return await self.result_cache.get_or_load(key, load, ttl)
+
+    def cache_rows(self, rows: Sequence[Any]) -> None:
+        """
+        Add rows that the request has read to its identity cache, keyed by (model, primary key), so that
+        node lookups and many-to-one relationships that refer to them don't need another query (see
+        get_cached_row). Every row that EntityLoader reads is added, and so are the rows of top-level
+        queries (see the generated resolvers). These are all rows that the principal is allowed to view.
+        """
+        self._check_identity_cache()
+        for row in rows:
+            if row is None:
+                continue
+            cls = row.__model__ if isinstance(row, Record) else type(row)
+            primary_key = sqlalchemy_helpers.get_model_metadata(cls).primary_key
+            if primary_key is None:
+                continue
+            if isinstance(row, Record):
+                pk = getattr(row, primary_key[0], None)
+            else:
+                # Don't load the primary key if it wasn't loaded (which would need IO)
+                pk = sa.inspect(row).dict.get(primary_key[0])
+            if pk is None:
+                continue
+            key = (cls, pk)
+            cached_row = self._identity_cache.get(key)
+            # Don't replace a row with a copy that has fewer columns
+            if cached_row is None or self._has_columns(row, None) or not self._has_columns(cached_row, None):
+                self._identity_cache[key] = row
+
+    def get_cached_row(self, cls: Any, key: Any, columns: Optional[Sequence[str]] = None) -> Optional[Any]:
+        """
+        Return the row of a model with the given primary key from the identity cache, if the request has
+        already read it along with the given columns (all of them by default).
+        """
+        self._check_identity_cache()
+        row = self._identity_cache.get((cls, key))
+        if row is None or not self._has_columns(row, columns):
+            return None
+        return row
+
+    def _check_identity_cache(self) -> None:
+        # Rows read before the request's latest write may be out of date
+        writes = self.session_manager.writes if self.session_manager else 0
+        if writes != self._identity_cache_writes:
+            self._identity_cache = {}
+            self._identity_cache_writes = writes
+
+    def _has_columns(self, row: Any, columns: Optional[Sequence[str]]) -> bool:
+        if isinstance(row, Record):
+            if columns is None:
+                return row.is_complete()
+            return all(hasattr(row, column) for column in columns)
+        unloaded = sa.inspect(row).unloaded
+        if columns is None:
+            columns = sqlalchemy_helpers.get_model_metadata(type(row)).column_keys  # type: ignore
+        return unloaded.isdisjoint(columns)  # type: ignore
+
+    async def load_to_one(
+        self,
+        relationship: RelationshipProperty,
+        key: Any,
+        where: Optional[Any] = None,
+        order_by: Optional[Any] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Optional[Any]:
+        """
+        Load the row of a many-to-one relationship. Unfiltered relationships that refer to the related row by
+        its primary key are answered from the identity cache, if the request has already read that row, or
+        else looked up by primary key, if there's a shared entity cache.
+        """
+        if key is not None and not where and relationship.direction == MANYTOONE:
+            related_model = relationship.entity.entity
+            primary_key = sqlalchemy_helpers.get_model_metadata(related_model).primary_key
+            if primary_key and [remote.key for _, remote in relationship.local_remote_pairs] == [primary_key[0]]:  # type: ignore
+                row = self.get_cached_row(related_model, key, columns)
+                if row is not None:
+                    return row
+                if self.entity_cache is not None:
+                    return await self.node_loader_for(related_model).load(key)
+        return await self.loader_for(relationship, where, order_by, columns=columns).load(key)
+
+    def load_connection(
+        self,
+        relationship: RelationshipProperty,
+        key: Any,
+        where: Optional[Any] = None,
+        order_by: Optional[Any] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> ConnectionRows:
+        """
+        Lazily load the rows of a one-to-many relationship for a relay connection. Only the page
+        of rows that the connection asks for is fetched from the database.
+        """
+        return ConnectionRows(self, relationship, key, where, order_by, columns)
+
+    def prime_to_one(
+        self,
+        model_cls: Any,
+        rows: Sequence[Any],
+        to_one: dict[str, Optional[Sequence[str]]],
+    ) -> None:
+        """
+        Prime the dataloaders of many-to-one relationships that were loaded along with their parent rows
+        (see query_builder.get_db_rows), so that resolving them doesn't need another query.
+        """
+        metadata = sqlalchemy_helpers.get_model_metadata(model_cls)
+        for relationship_name, columns in to_one.items():
+            relationship = metadata.relationships[relationship_name]
+            loader = self.loader_for(relationship, columns=columns)
+            local_keys = metadata.local_keys[relationship_name]
+            for row in rows:
+                key = getattr(row, local_keys[0])
+                if key is not None:
+                    related_row = sa.inspect(row).dict.get(relationship_name)
+                    loader.prime(key, related_row)
+                    self.cache_rows([related_row])
+
     def loader_for(
         self,
         relationship: RelationshipProperty,
         where: Optional[Any] = None,
         order_by: Optional[Any] = None,
+        window: Optional[Window] = None,
+        columns: Optional[Sequence[str]] = None,
     ) -> DataLoader:
         """
         Get or create a DataLoader for a specific relationship with optional filters.
@@ -124,6 +496,8 @@ class EntityLoader:
             relationship: The SQLAlchemy relationship to load data for
             where: Optional filter conditions
             order_by: Optional sort order
+            window: Optional (start, stop) slice of the related rows to load for each parent key
+            columns: Optional subset of the related model's columns to load (all of them by default)
 
         Returns:
             A DataLoader configured for the specific relationship and filters
@@ -142,10 +516,15 @@ class EntityLoader:
         for item in order_by:
             input_dict.update(item)
         input_hash = get_input_hash(input_dict)
+        if window == (0, None) or not relationship.uselist:
+            window = None
+        if columns is not None:
+            columns = tuple(columns)
+        loader_key = (relationship, input_hash, window, columns)
 
-        # Check if we already have a DataLoader for this relationship + filters
+        # Check if we already have a DataLoader for this relationship + filters + window + columns
         try:
-            return self._loaders[(relationship, input_hash)]  # type: ignore
+            return self._loaders[loader_key]  # type: ignore
         except KeyError:
             # If not, we need to create a new one
             related_model = relationship.entity.entity
@@ -170,11 +549,11 @@ class EntityLoader:
                 # Build filters to fetch all related objects for the requested keys
                 filters = []
                 for _, remote in relationship.local_remote_pairs:
-                    # Create an "IN" clause with all the requested keys
-                    filters.append(remote.in_(keys))
+                    # Compare with all the requested keys, bound as a single array
+                    filters.append(sqlalchemy_helpers.in_array(remote, keys))
 
                 # Build the base query with security checks and user-provided filters
-                query = get_db_query(
+                query, sort_keys = await get_sorted_db_query(
                     related_model,
                     AuthzAction.VIEW,
                     self.authz_client,
@@ -188,10 +567,25 @@ class EntityLoader:
                 for item in filters:
                     query = query.where(item)
 
+                if window:
+                    query = self._apply_window(query, related_model, relationship, sort_keys, window)
+                else:
+                    query = apply_sort_keys(query, sort_keys)
+
                 # Execute the query
-                db_session = self.engine.session()
-                rows = (await db_session.execute(query)).scalars().all()
-                await db_session.close()
+                if self.core_reads:
+                    query, column_keys = select_record_columns(query, related_model, columns)
+                    async with self.session() as db_session:
+                        rows: Sequence[Any] = to_records(
+                            related_model,
+                            column_keys,
+                            (await db_session.execute(query)).all(),
+                        )
+                else:
+                    query = apply_load_only(query, related_model, columns)
+                    async with self.session() as db_session:
+                        rows = (await db_session.execute(query)).scalars().all()
+                self.cache_rows(rows)
 
                 # Helper function to group the returned rows by the parent object they're related to.
                 def group_by_remote_key(row: Any) -> Tuple:
@@ -214,8 +608,48 @@ class EntityLoader:
                     return [grouped_keys[key][0] if grouped_keys[key] else None for key in keys]
 
             # Create and cache the new DataLoader
-            self._loaders[(relationship, input_hash)] = DataLoader(load_fn=load_fn)  # type: ignore
-            return self._loaders[(relationship, input_hash)]  # type: ignore
+            self._loaders[loader_key] = DataLoader(load_fn=load_fn, max_batch_size=self.max_batch_size)  # type: ignore
+            return self._loaders[loader_key]  # type: ignore
+
+    def _apply_window(
+        self,
+        query: sa.Select,
+        related_model: Any,
+        relationship: RelationshipProperty,
+        sort_keys: list[SortKey],
+        window: Window,
+    ) -> sa.Select:
+        """
+        Only select a window of rows for each parent key of an (unordered) query. The rows are numbered per
+        parent with ROW_NUMBER() OVER (PARTITION BY <foreign key> ORDER BY <sort keys, primary key>), and the
+        returned query yields them in that order.
+        """
+        pk_col_name, pk_field = sqlalchemy_helpers.get_primary_key(related_model)
+        # The primary key makes the numbering (and therefore pagination) deterministic
+        sort_keys = [*sort_keys, get_sort_key(pk_col_name, orderBy.asc, query)]
+        row_number = (
+            sa.func.row_number()
+            .over(
+                partition_by=[remote for _, remote in relationship.local_remote_pairs],  # type: ignore
+                order_by=get_order_by_clauses(sort_keys),
+            )
+            .label("window_row_number")
+        )
+        ranked = query.with_only_columns(
+            pk_field.label("window_pk"),
+            row_number,
+            maintain_column_froms=True,
+        ).subquery()
+        start, stop = window
+        windowed_query = (
+            sa.select(related_model)
+            .join(ranked, pk_field == ranked.c.window_pk)  # type: ignore
+            .where(ranked.c.window_row_number > start)
+            .order_by(ranked.c.window_row_number)
+        )
+        if stop is not None:
+            windowed_query = windowed_query.where(ranked.c.window_row_number <= stop)
+        return windowed_query
 
     def aggregate_loader_for(
         self,
@@ -244,7 +678,7 @@ class EntityLoader:
                     raise Exception("invalid relationship")
                 filters = []
                 for _, remote in relationship.local_remote_pairs:
-                    filters.append(remote.in_(keys))
+                    filters.append(sqlalchemy_helpers.in_array(remote, keys))
                 order_by: list = []
                 if relationship.order_by:
                     order_by = [relationship.order_by]
@@ -259,7 +693,7 @@ class EntityLoader:
                 if not aggregate_selections:
                     raise PlatformicsError("No aggregate functions selected")
 
-                query, group_by = get_aggregate_db_query(
+                query, group_by = await get_aggregate_db_query(
                     related_model,
                     AuthzAction.VIEW,
                     self.authz_client,
@@ -276,9 +710,8 @@ class EntityLoader:
                     query = query.order_by(item)
                 if group_by:
                     query = query.group_by(*group_by)  # type: ignore
-                db_session = self.engine.session()
-                rows = (await db_session.execute(query)).mappings().all()
-                await db_session.close()
+                async with self.session() as db_session:
+                    rows = (await db_session.execute(query)).mappings().all()
 
                 def group_by_remote_key(row: Any) -> Tuple:
                     if not relationship.local_remote_pairs:
@@ -294,5 +727,8 @@ class EntityLoader:
                 else:
                     return [grouped_keys[key][0] if grouped_keys[key] else None for key in keys]
 
-            self._aggregate_loaders[(relationship, str_selections, input_hash)] = DataLoader(load_fn=load_fn)  # type: ignore
+            self._aggregate_loaders[(relationship, str_selections, input_hash)] = DataLoader(  # type: ignore
+                load_fn=load_fn,
+                max_batch_size=self.max_batch_size,
+            )
             return self._aggregate_loaders[(relationship, str_selections, input_hash)]  # type: ignore
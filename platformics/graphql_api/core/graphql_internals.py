@@ -0,0 +1,109 @@
+"""
+The Strawberry and graphql-core internals that the query compiler (see query_compiler.py) relies on, in one place.
+
+Compiling a query means walking its selections the way graphql-core's executor does, and converting arguments the
+way Strawberry does for resolvers, neither of which is part of their public APIs. These helpers are only known to
+work with the versions in SUPPORTED_VERSIONS: with any other version, `is_supported()` is false and compiled
+queries are executed by the regular resolvers instead.
+"""
+
+import functools
+import logging
+from importlib.metadata import version
+from typing import Any, Optional
+
+import strawberry
+from graphql import FieldNode, GraphQLField, GraphQLObjectType, GraphQLSchema, SelectionSetNode
+from graphql.execution import ExecutionContext as GraphQLExecutionContext
+from graphql.execution.collect_fields import collect_fields as graphql_collect_fields
+from graphql.execution.collect_fields import collect_sub_fields as graphql_collect_sub_fields
+from graphql.execution.values import get_argument_values
+from strawberry.schema.schema_converter import GraphQLCoreConverter
+from strawberry.types.arguments import convert_arguments
+from strawberry.types.field import StrawberryField
+
+logger = logging.getLogger(__name__)
+
+# Distribution name -> supported version prefixes
+SUPPORTED_VERSIONS = {
+    "strawberry-graphql": ("0.257.",),
+    "graphql-core": ("3.2.",),
+}
+
+
+@functools.cache
+def is_supported() -> bool:
+    for distribution, prefixes in SUPPORTED_VERSIONS.items():
+        installed = version(distribution)
+        if not installed.startswith(prefixes):
+            logger.warning("Compiled queries are disabled: unsupported version %s of %s", installed, distribution)
+            return False
+    return True
+
+
+def get_graphql_schema(schema: strawberry.Schema) -> GraphQLSchema:
+    """
+    The graphql-core schema that a Strawberry schema is converted into
+    """
+    return schema._schema
+
+
+def get_strawberry_field(field_def: GraphQLField) -> Optional[StrawberryField]:
+    """
+    The Strawberry field that a graphql-core field was converted from
+    """
+    strawberry_field = field_def.extensions.get(GraphQLCoreConverter.DEFINITION_BACKREF)
+    return strawberry_field if isinstance(strawberry_field, StrawberryField) else None
+
+
+def collect_fields(
+    context: GraphQLExecutionContext,
+    object_type: GraphQLObjectType,
+    selection_set: SelectionSetNode,
+) -> dict[str, list[FieldNode]]:
+    """
+    The fields of a selection set, by response key, with fragments and @skip / @include applied
+    """
+    return graphql_collect_fields(
+        context.schema,
+        context.fragments,
+        context.variable_values,
+        object_type,
+        selection_set,
+    )
+
+
+def collect_sub_fields(
+    context: GraphQLExecutionContext,
+    object_type: GraphQLObjectType,
+    field_nodes: list[FieldNode],
+) -> dict[str, list[FieldNode]]:
+    """
+    The fields selected on the value of a field, by response key (see collect_fields)
+    """
+    return graphql_collect_sub_fields(
+        context.schema,
+        context.fragments,
+        context.variable_values,
+        object_type,
+        field_nodes,
+    )
+
+
+def get_arguments(
+    schema: strawberry.Schema,
+    context: GraphQLExecutionContext,
+    field_def: GraphQLField,
+    strawberry_field: StrawberryField,
+    field_node: FieldNode,
+) -> dict[str, Any]:
+    """
+    The arguments of a field, converted the way Strawberry converts them for its resolver
+    """
+    values = get_argument_values(field_def, field_node, context.variable_values)
+    return convert_arguments(
+        values,
+        strawberry_field.arguments,
+        scalar_registry=schema.schema_converter.scalar_registry,
+        config=schema.config,
+    )
@@ -7,49 +7,157 @@ from collections import defaultdict
 from typing import Any, Optional, Sequence, Tuple
 
 import strcase
-from sqlalchemy import ColumnElement, and_, distinct, inspect
+from sqlalchemy import ColumnElement, and_, bindparam, distinct, false, or_
 from sqlalchemy.engine.row import RowMapping
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.sql import Select
 from strawberry.types.nodes import SelectedField
 from typing_extensions import TypedDict
 
 from platformics.database.models.base import Base
+from platformics.graphql_api.core.cursors import PaginatedRows, decode_cursor, encode_cursor
 from platformics.graphql_api.core.errors import PlatformicsError
 from platformics.graphql_api.core.query_input_types import aggregator_map, operator_map, orderBy
+from platformics.graphql_api.core.records import to_records
 from platformics.graphql_api.core.strawberry_helpers import filter_meta_fields
 from platformics.security.authorization import AuthzAction, AuthzClient, Principal
 from platformics.support import sqlalchemy_helpers
+from platformics.support.singleflight import SingleFlight
 
 E = typing.TypeVar("E")
 T = typing.TypeVar("T")
 
 
+# A sort key: (column, descending, nulls first)
+SortKey = Tuple[ColumnElement[Any], bool, bool]
+
+
+def get_sort_key(field: str, direction: orderBy, query: Select) -> SortKey:
+    column = getattr(query.selected_columns, field)
+    descending = direction.value.startswith("desc")
+    # Postgres sorts nulls as if they were larger than any other value by default
+    if direction.value.endswith("nulls_first"):
+        nulls_first = True
+    elif direction.value.endswith("nulls_last"):
+        nulls_first = False
+    else:
+        nulls_first = descending
+    return column, descending, nulls_first
+
+
+def get_order_by_clauses(sort_keys: list[SortKey], reverse: bool = False) -> list[ColumnElement[Any]]:
+    clauses: list[ColumnElement[Any]] = []
+    for column, descending, nulls_first in sort_keys:
+        if reverse:
+            descending, nulls_first = not descending, not nulls_first
+        clause = column.desc() if descending else column.asc()
+        clauses.append(clause.nullsfirst() if nulls_first else clause.nullslast())
+    return clauses
+
+
+def apply_sort_keys(query: Select, sort_keys: list[SortKey], reverse: bool = False) -> Select:
+    return query.order_by(*get_order_by_clauses(sort_keys, reverse))
+
+
 def apply_order_by(field: str, direction: orderBy, query: Select) -> Select:
-    match direction.value:
-        case "asc":
-            query = query.order_by(getattr(query.selected_columns, field).asc())
-        case "asc_nulls_first":
-            query = query.order_by(getattr(query.selected_columns, field).asc().nullsfirst())
-        case "asc_nulls_last":
-            query = query.order_by(getattr(query.selected_columns, field).asc().nullslast())
-        case "desc":
-            query = query.order_by(getattr(query.selected_columns, field).desc())
-        case "desc_nulls_first":
-            query = query.order_by(getattr(query.selected_columns, field).desc().nullsfirst())
-        case "desc_nulls_last":
-            query = query.order_by(getattr(query.selected_columns, field).desc().nullslast())
+    return apply_sort_keys(query, [get_sort_key(field, direction, query)])
+
+
+def apply_load_only(query: Select, model_cls: Any, columns: Optional[Sequence[str]]) -> Select:
+    """
+    Only load the given columns of the model (see strawberry_helpers.get_selected_columns). The other
+    columns are deferred, and must not be accessed on the loaded objects.
+    """
+    if columns is None:
+        return query
+    return query.options(load_only(*[getattr(model_cls, column) for column in columns]))
+
+
+def select_record_columns(
+    query: Select,
+    model_cls: Any,
+    columns: Optional[Sequence[str]] = None,
+) -> Tuple[Select, list[str]]:
+    """
+    Select the given columns of the model (all of them by default) instead of the model itself, to read rows
+    as records rather than ORM instances (see records.py). Other columns that the query selects (e.g. cursor
+    values) are kept after the model's. Returns the query along with the names of the model's columns.
+    """
+    keys = sorted(sqlalchemy_helpers.get_model_metadata(model_cls).column_keys) if columns is None else list(columns)
+    other_columns = [description["expr"] for description in query.column_descriptions[1:]]
+    query = query.with_only_columns(
+        *[getattr(model_cls, key).label(key) for key in keys],
+        *other_columns,
+        maintain_column_froms=True,
+    )
+    return query, keys
+
+
+def get_to_one_alias(relationship_name: str) -> str:
+    return f"to_one_{relationship_name}"
+
+
+async def join_to_one_relationships(
+    query: Select,
+    model_cls: Any,
+    authz_client: AuthzClient,
+    principal: Principal,
+    to_one: dict[str, Optional[Sequence[str]]],
+) -> Select:
+    """
+    Outer join many-to-one relationships into a query, so that the related objects are loaded along with the
+    model instead of by a dataloader. Each related model is joined through its own authorized query, so
+    related objects the principal can't see come back as None. The related objects are selected as extra
+    entities, named by `get_to_one_alias`.
+    """
+    relationships = sqlalchemy_helpers.get_model_metadata(model_cls).relationships
+    for relationship_name, columns in to_one.items():
+        relationship = relationships[relationship_name]
+        related_model = relationship.mapper.class_
+        related_query = await authz_client.get_resource_query(principal, AuthzAction.VIEW, related_model)
+        related_alias = aliased(related_model, related_query.subquery(), name=get_to_one_alias(relationship_name))
+        join_conditions = [
+            local == getattr(related_alias, relationship.mapper.get_property_by_column(remote).key)
+            for local, remote in relationship.local_remote_pairs  # type: ignore
+        ]
+        query = query.outerjoin(related_alias, and_(*join_conditions)).add_columns(related_alias)
+        if columns is not None:
+            query = query.options(load_only(*[getattr(related_alias, column) for column in columns]))
     return query
 
 
+def get_keyset_filter(sort_keys: list[SortKey], values: list[Any], reverse: bool = False) -> ColumnElement[bool]:
+    """
+    Build a filter for the rows that sort strictly after the given sort key values (or before them, if reversed):
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with ">" meaning "sorts after", nulls included.
+    """
+    clauses = []
+    equal_prefix: list[ColumnElement[bool]] = []
+    for (column, descending, nulls_first), value in zip(sort_keys, values, strict=True):
+        if reverse:
+            descending, nulls_first = not descending, not nulls_first
+        if value is None:
+            sorts_after = column.is_not(None) if nulls_first else false()
+            equal = column.is_(None)
+        else:
+            sorts_after = column < value if descending else column > value
+            if not nulls_first and getattr(column, "nullable", True):
+                sorts_after = or_(sorts_after, column.is_(None))
+            equal = column == value
+        clauses.append(and_(*equal_prefix, sorts_after))
+        equal_prefix.append(equal)
+    return or_(*clauses)
+
+
 class IndexedOrderByClause(TypedDict):
     field: dict[str, orderBy] | dict[str, dict[str, Any]]
     index: int
     sort: orderBy
 
 
-def convert_where_clauses_to_sql(
+async def convert_where_clauses_to_sql(
     principal: Principal,
     authz_client: AuthzClient,
     action: AuthzAction,
@@ -119,7 +227,7 @@ def convert_where_clauses_to_sql(
     local_group_by = []
 
     # SQLAlchemy model introspection
-    mapper = inspect(sa_model)
+    relationships = sqlalchemy_helpers.get_model_metadata(sa_model).relationships
 
     # Create a dictionary with the keys as the related field/field names
     # The values are dict of {order_by: {"field": ..., "index": ...}, where: {...}, group_by: [...]}
@@ -132,7 +240,7 @@ def convert_where_clauses_to_sql(
     # Parse order_by clause
     for item in order_by:
         for col, v in item["field"].items():
-            if col in mapper.relationships:  # type: ignore
+            if col in relationships:  # type: ignore
                 # If ordering on a related field, defer it to recursive join handling
                 if not ordergroup_joins[col].get("order_by"):
                     ordergroup_joins[col]["order_by"] = []
@@ -143,10 +251,10 @@ def convert_where_clauses_to_sql(
 
     # Parse where_clause
     for col, v in where_clause.items():
-        if col in mapper.relationships:  # type: ignore
+        if col in relationships:  # type: ignore
             # Handle nested filter on related model
             where_joins[col]["where"] = v
-        elif col.removesuffix("_aggregate") in mapper.relationships:
+        elif col.removesuffix("_aggregate") in relationships:
             # Handle aggregate filters on related model (e.g., _aggregate: { count: ... })
             col_name = col.removesuffix("_aggregate")
             aggregate_joins[col_name] = v  # type: ignore
@@ -160,7 +268,7 @@ def convert_where_clauses_to_sql(
     # Parse group_by selections
     for group in filter_meta_fields(group_by):  # type: ignore
         col = strcase.to_snake(group.name)
-        if col in mapper.relationships:  # type: ignore
+        if col in relationships:  # type: ignore
             # If grouping by related field, defer to join handling
             ordergroup_joins[col]["group_by"] = filter_meta_fields(group.selections)
         else:
@@ -173,14 +281,14 @@ def convert_where_clauses_to_sql(
 
     # Handle filtering on related models
     for join_field, join_info in where_joins.items():
-        relationship = mapper.relationships[join_field]  # type: ignore
+        relationship = relationships[join_field]  # type: ignore
         related_cls = relationship.mapper.entity
 
         # Start with a secure subquery from the related model
-        secure_query = authz_client.get_resource_query(principal, action, related_cls)
+        secure_query = await authz_client.get_resource_query(principal, action, related_cls)
 
         # Recurse into subquery to resolve nested filters/order/group, and get parameters to apply to the current query
-        subquery, subquery_order_by, subquery_group_by = convert_where_clauses_to_sql(
+        subquery, subquery_order_by, subquery_group_by = await convert_where_clauses_to_sql(
             principal,
             authz_client,
             action,
@@ -196,15 +304,15 @@ def convert_where_clauses_to_sql(
         query_alias = aliased(related_cls, subquery)  # type: ignore
 
         # Create WHERE condition matching the current model to the subquery
-        for local, remote in relationship.local_remote_pairs:
-            subquery = subquery.filter((getattr(sa_model, local.key) == getattr(query_alias, remote.key)))
+        for local, remote in relationship.local_remote_pairs:  # type: ignore
+            subquery = subquery.filter((getattr(sa_model, local.key) == getattr(query_alias, remote.key)))  # type: ignore
 
         # Join the two queries with an EXISTS() clause
         query = query.where(subquery.exists())
 
     # Handle filtering on aggregates (e.g., school.students.count > 5)
     for aggregate_field, aggregate_info in aggregate_joins.items():
-        relationship = mapper.relationships[aggregate_field]  # type: ignore
+        relationship = relationships[aggregate_field]  # type: ignore
         related_cls = relationship.mapper.entity
 
         # We only support `count` for filtered aggregates right now, so we can
@@ -222,7 +330,7 @@ def convert_where_clauses_to_sql(
             arguments["columns"] = count_input["arguments"].name
         # TODO - it would be better if query builder didn't depend on our GQL schema structure so much
         aggregate_config = SelectedField(name="count", arguments=arguments, directives=None, selections=None)
-        subquery, _order_by = get_aggregate_db_query(
+        subquery, _order_by = await get_aggregate_db_query(
             related_cls,
             action,
             authz_client,
@@ -235,22 +343,22 @@ def convert_where_clauses_to_sql(
         query_alias = aliased(related_cls, subquery)  # type: ignore
 
         # Join this aggregate subquery back to the parent query
-        for local, remote in relationship.local_remote_pairs:
-            subquery = subquery.filter((getattr(sa_model, local.key) == getattr(query_alias, remote.key)))
+        for local, remote in relationship.local_remote_pairs:  # type: ignore
+            subquery = subquery.filter((getattr(sa_model, local.key) == getattr(query_alias, remote.key)))  # type: ignore
         query = query.where(subquery.exists())
 
     # Handle ordering by and grouping by related models. e.g:
     #    `schools(orderBy: {district: {name: asc}})`
     #    `schoolsAggregate(groupBy: {district: {name}})`
     for join_field, join_info in ordergroup_joins.items():
-        relationship = mapper.relationships[join_field]  # type: ignore
+        relationship = relationships[join_field]  # type: ignore
         related_cls = relationship.mapper.entity
 
         # Get a secure query for the related class
-        secure_query = authz_client.get_resource_query(principal, action, related_cls)
+        secure_query = await authz_client.get_resource_query(principal, action, related_cls)
 
         # Get the subquery, nested order_by fields, and nested group_by fields that need to be applied to the current query
-        subquery, subquery_order_by, subquery_group_by = convert_where_clauses_to_sql(
+        subquery, subquery_order_by, subquery_group_by = await convert_where_clauses_to_sql(
             principal,
             authz_client,
             action,
@@ -265,17 +373,15 @@ def convert_where_clauses_to_sql(
         # Convert the subquery to a subquery object
         subquery = subquery.subquery()  # type: ignore
 
-        # Create an alias for the related class
-        query_alias = aliased(related_cls, subquery)  # type: ignore
-
         # Create the join condition between parent and child tables
         joincondition_a = [
-            (getattr(sa_model, local.key) == getattr(query_alias, remote.key))
-            for local, remote in relationship.local_remote_pairs
+            (getattr(sa_model, local.key) == getattr(subquery.c, remote.key))  # type: ignore
+            for local, remote in relationship.local_remote_pairs  # type: ignore
         ]
 
-        # Join the parent query with the subquery
-        query = query.join(query_alias, and_(*joincondition_a))
+        # Join the parent query with the subquery. This is a Core join (rather than one to an aliased
+        # class), so that copies of the query with re-bound parameters (see get_sorted_db_query) copy it too.
+        query = query.join(subquery, and_(*joincondition_a))  # type: ignore
 
         # Add the order_by fields from the subquery to the parent query
         for aliased_field_num, item in enumerate(subquery_order_by):
@@ -317,6 +423,11 @@ def convert_where_clauses_to_sql(
                     query = query.filter(
                         getattr(getattr(sa_model, col), sa_comparator["comparator"])(value, sa_comparator["flag"]),
                     )
+            elif sa_comparator in ("in_", "not_in"):
+                # Bind lists as a single array so the statement text doesn't depend on their length
+                query = query.filter(
+                    sqlalchemy_helpers.in_array(getattr(sa_model, col), value, negate=sa_comparator == "not_in"),
+                )
             else:
                 # Apply standard operators (e.g., ==, !=, >, <, etc.)
                 query = query.filter(getattr(getattr(sa_model, col), sa_comparator)(value))  # type: ignore
@@ -325,27 +436,179 @@ def convert_where_clauses_to_sql(
     return query, local_order_by, local_group_by
 
 
-def get_db_query(
+def freeze(value: Any) -> typing.Hashable:
+    """
+    Returns a hashable copy of (nested) dicts, lists and tuples
+    """
+    if isinstance(value, dict):
+        return tuple((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def parameterize_where(where: Optional[dict[str, Any]], params: dict[str, Any]) -> Tuple[typing.Hashable, Any]:
+    """
+    Returns the shape of a where clause (its structure, without the values it compares with), along with a
+    copy of it that compares with bind parameters named `where_<i>` instead. The values are added to `params`.
+    """
+    if not where:
+        return None, where
+    shape: list[Tuple[str, typing.Hashable]] = []
+    template: dict[str, Any] = {}
+    for key, value in where.items():
+        if key in operator_map and operator_map[key] != "IS_NULL" and value is not None:
+            name = f"where_{len(params)}"
+            params[name] = value
+            template[key] = bindparam(name)
+            shape.append((key, isinstance(value, list)))
+        elif isinstance(value, dict):
+            item_shape, template[key] = parameterize_where(value, params)
+            shape.append((key, item_shape))
+        else:
+            # Values that change the structure of the query (e.g. `_is_null`, or the columns to count)
+            template[key] = value
+            shape.append((key, freeze(value)))
+    return tuple(shape), template
+
+
+def uses_query_plans(authz_client: AuthzClient) -> bool:
+    """
+    Whether queries are only authorized by the principal's query plans, i.e. the authz client doesn't
+    customize how they're authorized (see docs/HOWTO-override-authorization.md).
+    """
+    authz_client_cls = type(authz_client)
+    return (
+        authz_client_cls.get_resource_query is AuthzClient.get_resource_query
+        and authz_client_cls.modify_where_clause is AuthzClient.modify_where_clause
+    )
+
+
+def can_cache_statements(authz_client: AuthzClient) -> bool:
+    """
+    Statements can be cached unless the authz client customizes how they're authorized, in which case they
+    might depend on more than the principal's query plans.
+    """
+    return authz_client.statement_cache.maxsize > 0 and uses_query_plans(authz_client)
+
+
+class StatementTemplateAuthzClient:
+    """
+    Stands in for the authz client while a statement is built for the statement cache: authorizes every
+    (sub)query with a filter whose values are left as bind parameters, named after the order they're built in,
+    and records the plans that they come from.
+    """
+
+    def __init__(self, authz_client: AuthzClient) -> None:
+        self.authz_client = authz_client
+        self.plans: list[Tuple[Any, AuthzAction]] = []
+        self.plan_fingerprints: list[typing.Hashable] = []
+        self.params: dict[str, Any] = {}
+
+    async def get_resource_query(
+        self,
+        principal: Principal,
+        action: AuthzAction,
+        model_cls: Any,
+        relationship: Optional[Any] = None,
+    ) -> Select:
+        param_prefix = f"authz_{len(self.plans)}"
+        query, fingerprint, values = await self.authz_client.get_resource_query_template(
+            principal,
+            action,
+            model_cls,
+            param_prefix,
+        )
+        self.plans.append((model_cls, action))
+        self.plan_fingerprints.append(fingerprint)
+        self.params.update({f"{param_prefix}_{i}": value for i, value in enumerate(values)})
+        return query
+
+    def modify_where_clause(self, *args: Any) -> None:
+        self.authz_client.modify_where_clause(*args)
+
+
+async def get_sorted_db_query(
     model_cls: type[E],
     action: AuthzAction,
     authz_client: AuthzClient,
     principal: Principal,
-    # TODO it would be nicer if we could have the WhereClause classes inherit from a BaseWhereClause
-    # so that these type checks could be smarter, but TypedDict doesn't support type checks like that
     where: dict[str, Any],
     order_by: Optional[list[dict[str, Any]]] = None,
     relationship: Optional[Any] = None,
-) -> Select:
+) -> Tuple[Select, list[SortKey]]:
     """
-    Given a model class and a where clause, return a SQLAlchemy query that is limited
-    based on the where clause, and which entities the user has access to.
+    Same as get_db_query, but also returns the sort keys that the query is ordered by. The query
+    itself isn't ordered yet.
+
+    Queries are built with bind parameters instead of values and cached (see StatementCache), so that queries
+    with the same shape of where clause, orderBy and authorization plans are only built once.
     """
-    query = authz_client.get_resource_query(principal, action, model_cls, relationship)  # type: ignore
-    # Add indices to the order_by fields so that we can preserve the order of the fields
     if order_by is None:
         order_by = []
+    if not can_cache_statements(authz_client):
+        query, sort_fields = await build_sorted_db_query(
+            model_cls,
+            action,
+            authz_client,
+            principal,
+            where,
+            order_by,
+            relationship,
+        )
+        return query, [get_sort_key(field, direction, query) for field, direction in sort_fields]
+
+    statement_cache = authz_client.statement_cache
+    params: dict[str, Any] = {}
+    where_shape, where_template = parameterize_where(where, params)
+    shape_key = (model_cls, action, relationship, where_shape, freeze(order_by))
+    template = None
+    plans = statement_cache.plans.get(shape_key)
+    if plans is not None:
+        plan_fingerprints = []
+        for i, (plan_model_cls, plan_action) in enumerate(plans):
+            fingerprint, values = await authz_client.get_plan_fingerprint(principal, plan_action, plan_model_cls)
+            plan_fingerprints.append(fingerprint)
+            params.update({f"authz_{i}_{j}": value for j, value in enumerate(values)})
+        template = statement_cache.get((shape_key, tuple(plan_fingerprints)))
+    if template is None:
+        template_authz_client = StatementTemplateAuthzClient(authz_client)
+        template = await build_sorted_db_query(
+            model_cls,
+            action,
+            template_authz_client,  # type: ignore
+            principal,
+            where_template,
+            order_by,
+            relationship,
+        )
+        statement_cache.plans.set(shape_key, template_authz_client.plans)
+        statement_cache.set((shape_key, tuple(template_authz_client.plan_fingerprints)), template)
+        params.update(template_authz_client.params)
+
+    query, sort_fields = template
+    if params:
+        query = query.params(params)
+    # Sort keys point at the columns of the (re-bound copy of the) query
+    return query, [get_sort_key(field, direction, query) for field, direction in sort_fields]
+
+
+async def build_sorted_db_query(
+    model_cls: type[E],
+    action: AuthzAction,
+    authz_client: AuthzClient,
+    principal: Principal,
+    where: dict[str, Any],
+    order_by: list[dict[str, Any]],
+    relationship: Optional[Any] = None,
+) -> Tuple[Select, list[Tuple[str, orderBy]]]:
+    """
+    Build an authorized query for get_sorted_db_query, along with the (field, direction) pairs it's sorted by
+    """
+    query = await authz_client.get_resource_query(principal, action, model_cls, relationship)  # type: ignore
+    # Add indices to the order_by fields so that we can preserve the order of the fields
     order_by = [IndexedOrderByClause({"field": x, "index": i}) for i, x in enumerate(order_by)]  # type: ignore
-    query, order_by, _group_by = convert_where_clauses_to_sql(
+    query, order_by, _group_by = await convert_where_clauses_to_sql(
         principal,
         authz_client,
         action,
@@ -358,9 +621,34 @@ def get_db_query(
     )
     # Sort the order_by fields by their index so that we can apply them in the correct order
     order_by.sort(key=lambda x: x["index"])
-    for item in order_by:
-        query = apply_order_by(item["field"], item["sort"], query)
-    return query
+    return query, [(item["field"], item["sort"]) for item in order_by]  # type: ignore
+
+
+async def get_db_query(
+    model_cls: type[E],
+    action: AuthzAction,
+    authz_client: AuthzClient,
+    principal: Principal,
+    # TODO it would be nicer if we could have the WhereClause classes inherit from a BaseWhereClause
+    # so that these type checks could be smarter, but TypedDict doesn't support type checks like that
+    where: dict[str, Any],
+    order_by: Optional[list[dict[str, Any]]] = None,
+    relationship: Optional[Any] = None,
+) -> Select:
+    """
+    Given a model class and a where clause, return a SQLAlchemy query that is limited
+    based on the where clause, and which entities the user has access to.
+    """
+    query, sort_keys = await get_sorted_db_query(
+        model_cls,
+        action,
+        authz_client,
+        principal,
+        where,
+        order_by,
+        relationship,
+    )
+    return apply_sort_keys(query, sort_keys)
 
 
 async def get_db_rows(
@@ -373,22 +661,149 @@ async def get_db_rows(
     action: AuthzAction = AuthzAction.VIEW,
     limit: Optional[int] = None,
     offset: Optional[int] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    columns: Optional[Sequence[str]] = None,
+    to_one: Optional[dict[str, Optional[Sequence[str]]]] = None,
+    core: bool = False,
+    flights: Optional[SingleFlight] = None,
 ) -> typing.Sequence[E]:
     """
     Retrieve rows from the database, filtered by the where clause and the user's permissions.
+
+    Paginated queries (with a limit or a cursor) are also ordered by primary key, and each row they return
+    gets a cursor (see cursors.py). Pass a row's cursor as `after` to fetch the rows that follow it, or as
+    `before` to fetch the rows that precede it (closest first, when combined with a limit).
+
+    If `columns` is given, only those columns are loaded (see strawberry_helpers.get_selected_columns).
+    Many-to-one relationships listed in `to_one` (see strawberry_helpers.get_selected_to_one_relationships) are
+    loaded in the same query, and set on the returned rows.
+
+    With `core`, the same query is run without the ORM, and rows are returned as records (see records.py),
+    which are much cheaper to build than model instances. Core reads can't join `to_one` relationships.
+
+    With `flights`, concurrent reads that run the same statement (with the same values, which include the
+    principal's authorization filters) share a single execution (see run_coalesced).
     """
+    if core and to_one:
+        raise Exception("Many-to-one relationships can't be joined into core reads")
     if order_by is None:
         order_by = []
-    query = get_db_query(model_cls, action, authz_client, principal, where, order_by)
+    query, sort_keys = await get_sorted_db_query(model_cls, action, authz_client, principal, where, order_by)
+    if to_one:
+        query = await join_to_one_relationships(query, model_cls, authz_client, principal, to_one)
+    paginate = bool(limit or after or before)
+    reverse = False
+    cursor_columns = []
+    if paginate:
+        # The primary key breaks ties, so that every row has a unique position
+        pk_col_name, pk_field = sqlalchemy_helpers.get_primary_key(model_cls)
+        sort_keys.append(get_sort_key(pk_col_name, orderBy.asc, query))
+        if after:
+            query = query.where(get_keyset_filter(sort_keys, decode_cursor(after, len(sort_keys))))
+        # Fetch the rows before the cursor in reverse order, so that the limit keeps the closest ones
+        reverse = bool(before and not after)
+        if before:
+            query = query.where(get_keyset_filter(sort_keys, decode_cursor(before, len(sort_keys)), reverse=True))
+        cursor_columns = [column.label(f"cursor_value_{i}") for i, (column, _, _) in enumerate(sort_keys)]
+        query = query.add_columns(*cursor_columns)
+    query = apply_sort_keys(query, sort_keys, reverse=reverse)
+    if core:
+        query, keys = select_record_columns(query, model_cls, columns)
+    else:
+        query = apply_load_only(query, model_cls, columns)
     if limit:
         query = query.limit(limit)
         if offset:
             query = query.offset(offset)
-    result = await session.execute(query)
-    return result.scalars().all()
 
+    async def read_rows() -> list[Any]:
+        if not (core or paginate or to_one):
+            result = await session.execute(query)
+            return list(result.scalars().all())
+
+        rows = list((await session.execute(query)).all())
+        if reverse:
+            rows.reverse()
+        if core:
+            results: list[Any] = to_records(model_cls, keys, rows)
+        else:
+            for row in rows:
+                for relationship_name in to_one or {}:
+                    set_committed_value(row[0], relationship_name, row._mapping[get_to_one_alias(relationship_name)])
+            results = [row[0] for row in rows]
+        if paginate:
+            cursors = [encode_cursor([row._mapping[column.name] for column in cursor_columns]) for row in rows]
+            return PaginatedRows(results, cursors)
+        return results
+
+    if action != AuthzAction.VIEW:
+        # Rows read for writes must belong to the session that writes them
+        flights = None
+    rows, shared = await run_coalesced(flights, (model_cls, core), session, query, read_rows)
+    if shared and not core:
+        rows = await merge_rows(session, rows)
+    return rows
+
+
+async def run_coalesced(
+    flights: Optional[SingleFlight],
+    key: typing.Hashable,
+    session: AsyncSession,
+    query: Select,
+    fn: typing.Callable[[], typing.Awaitable[T]],
+) -> Tuple[T, bool]:
+    """
+    Run `fn`, which executes `query`, unless the same statement is already being executed with the same values,
+    in which case its result is shared (see SingleFlight). Also returns whether the result was shared.
+    """
+    if flights is None:
+        return await fn(), False
+    statement_key = get_statement_key(query)
+    if statement_key is None:
+        compiled = query.compile(dialect=session.bind.dialect)
+        statement_key = (compiled.string, freeze(compiled.params))
+    return await flights.do((key, statement_key), fn)
+
+
+def get_statement_key(query: Select) -> Optional[typing.Hashable]:
+    """
+    Returns a key that's the same for statements that compile to the same SQL with the same values, without
+    compiling them: the cache key that SQLAlchemy looks their compiled SQL up with, along with the values of
+    their bind parameters. Returns None for statements that SQLAlchemy doesn't cache.
+    """
+    cache_key = query._generate_cache_key()
+    if cache_key is None:
+        return None
+    # Authorization filters are copied with unique bind parameters (see FilterCache.get_filter), whose names
+    # are made of the copy's id, so identify them by their position instead
+    positions = {bind.key: i for i, bind in enumerate(cache_key.bindparams) if bind.unique}
+    return (
+        _replace_strings(cache_key.key, positions) if positions else cache_key.key,
+        tuple(freeze(bind.effective_value) for bind in cache_key.bindparams),
+    )
+
+
+def _replace_strings(value: Any, replacements: dict[str, Any]) -> Any:
+    if isinstance(value, tuple):
+        return tuple(_replace_strings(item, replacements) for item in value)
+    if isinstance(value, str):
+        return replacements.get(value, value)
+    return value
 
-def get_aggregate_db_query(
+
+async def merge_rows(session: AsyncSession, rows: Sequence[Any]) -> list[Any]:
+    """
+    Copy model instances that another session read (along with their loaded relationships) into a session,
+    without reading them again
+    """
+    merged_rows = [await session.merge(row, load=False) for row in rows]
+    if isinstance(rows, PaginatedRows):
+        return PaginatedRows(merged_rows, rows.cursors)
+    return merged_rows
+
+
+async def get_aggregate_db_query(
     model_cls: type[E],
     action: AuthzAction,
     authz_client: AuthzClient,
@@ -411,7 +826,7 @@ def get_aggregate_db_query(
     # TODO, this may need to be adjusted, 5 just seemed like a reasonable starting point
     if depth >= 5:
         raise Exception("Max filter depth exceeded")
-    query = authz_client.get_resource_query(principal, action, model_cls)  # type: ignore
+    query = await authz_client.get_resource_query(principal, action, model_cls)  # type: ignore
     # Deconstruct the aggregate dict and build mappings for the query
     aggregate_query_fields = []
     if remote is not None:
@@ -433,7 +848,12 @@ def get_aggregate_db_query(
             having = aggregator.arguments.get("having", {})
             for comparator, value in having.items():
                 sa_comparator = operator_map[comparator]
-                query = query.having(getattr(count_fn, sa_comparator)(value))  # type: ignore
+                if sa_comparator in ("in_", "not_in"):
+                    query = query.having(
+                        sqlalchemy_helpers.in_array(count_fn, value, negate=sa_comparator == "not_in"),
+                    )
+                else:
+                    query = query.having(getattr(count_fn, sa_comparator)(value))  # type: ignore
 
         else:
             for col in filter_meta_fields(aggregator.selections):
@@ -442,7 +862,7 @@ def get_aggregate_db_query(
                     agg_fn(getattr(model_cls, col_name)).label(f"{aggregator.name}_{col_name}"),  # type: ignore
                 )
     query = query.with_only_columns(*aggregate_query_fields)
-    query, _order_by, group_by = convert_where_clauses_to_sql(
+    query, _order_by, group_by = await convert_where_clauses_to_sql(
         principal,
         authz_client,
         action,
@@ -468,12 +888,27 @@ async def get_aggregate_db_rows(
     order_by: Optional[list[tuple[ColumnElement[Any], ...]]] = None,
     group_by: Optional[ColumnElement[Any]] | Optional[list[Any]] = None,
     action: AuthzAction = AuthzAction.VIEW,
+    flights: Optional[SingleFlight] = None,
 ) -> Sequence[RowMapping]:
     """
     Retrieve aggregate rows from the database, filtered by the where clause and the user's permissions.
+    Concurrent reads of the same aggregates share a single execution if `flights` is given (see get_db_rows).
     """
-    query, group_by = get_aggregate_db_query(model_cls, action, authz_client, principal, where, aggregate, group_by)
+    query, group_by = await get_aggregate_db_query(
+        model_cls,
+        action,
+        authz_client,
+        principal,
+        where,
+        aggregate,
+        group_by,
+    )
     if group_by:
         query = query.group_by(*group_by)  # type: ignore
-    result = await session.execute(query)
-    return result.mappings().all()
+
+    async def read_rows() -> Sequence[RowMapping]:
+        result = await session.execute(query)
+        return result.mappings().all()
+
+    rows, _ = await run_coalesced(flights, "aggregate", session, query, read_rows)
+    return rows
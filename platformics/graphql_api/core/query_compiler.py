@@ -0,0 +1,442 @@
+"""
+Compile whole GraphQL queries into a single SQL statement.
+
+By default, a query is resolved one level at a time: the root resolver fetches its rows, then a dataloader
+fetches the related rows of each nested relationship, and Strawberry serializes the resulting objects. For
+queries marked with the `@compiled` directive, e.g.
+
+    query SamplesAndReads @compiled {
+      samples(where: {name: {_like: "%test%"}}) {
+        name
+        sequencingReads(orderBy: {nucleicAcid: asc}) { edges { node { id nucleicAcid } } }
+      }
+    }
+
+the whole selection tree is instead compiled into one statement, which builds the response with Postgres'
+json_build_object / json_agg, and returned as is. Each level of the tree is selected through the same
+authorized query (see query_builder.get_sorted_db_query) as its resolver, with the same where / orderBy.
+
+Only what the generated resolvers expose can be compiled: columns, many-to-one relationships, and relay
+connections without pagination arguments. If a compiled query selects anything else (aggregates, cursors,
+custom fields), it's executed by the regular resolvers instead.
+"""
+
+import typing
+from typing import Any, AsyncIterator, Optional
+
+import sqlalchemy as sa
+import strawberry
+from graphql import (
+    ExecutionResult,
+    FieldNode,
+    GraphQLEnumType,
+    GraphQLField,
+    GraphQLList,
+    GraphQLNonNull,
+    GraphQLObjectType,
+    GraphQLScalarType,
+    OperationType,
+    get_named_type,
+)
+from graphql.execution import ExecutionContext as GraphQLExecutionContext
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.orm import RelationshipProperty, aliased
+from strawberry.directive import DirectiveLocation
+from strawberry.extensions import SchemaExtension
+from strawberry.types import ExecutionContext
+from strawberry.types.field import StrawberryField
+
+from platformics.graphql_api.core import graphql_internals
+from platformics.graphql_api.core.errors import PlatformicsError
+from platformics.graphql_api.core.query_builder import (
+    apply_sort_keys,
+    get_order_by_clauses,
+    get_sort_key,
+    get_sorted_db_query,
+)
+from platformics.graphql_api.core.query_input_types import orderBy
+from platformics.security.authorization import AuthzAction, AuthzClient, Principal
+from platformics.support import sqlalchemy_helpers
+
+COMPILED_DIRECTIVE = "compiled"
+
+# Scalars whose JSON representation in Postgres is the same as their GraphQL serialization. IDs are
+# serialized as strings, so they're cast to text first.
+COMPILED_SCALARS = {"String", "Int", "Float", "Boolean", "ID", "UUID", "DateTime"}
+
+# json_build_object() takes at most 100 arguments, i.e. 50 key/value pairs
+MAX_OBJECT_FIELDS = 50
+
+
+@strawberry.directive(
+    locations=[DirectiveLocation.QUERY],
+    name=COMPILED_DIRECTIVE,
+    description="Execute this query as a single SQL statement, if all of its selected fields support it.",
+)
+def compiled() -> None:
+    # Queries with this directive are executed by CompiledQueryExtension, this is only a marker
+    return None
+
+
+class UnsupportedSelectionError(Exception):
+    """
+    Raised when a query selects fields that can't be compiled into SQL.
+    """
+
+
+class QueryCompiler:
+    """
+    Compiles the selections of a GraphQL query into a single SQL statement (see module docstring), which
+    returns one row with a JSON column per root field.
+    """
+
+    def __init__(
+        self,
+        schema: strawberry.Schema,
+        context: GraphQLExecutionContext,
+        authz_client: AuthzClient,
+        principal: Principal,
+    ) -> None:
+        self.schema = schema
+        self.context = context
+        self.authz_client = authz_client
+        self.principal = principal
+
+    async def compile(self) -> sa.Select:
+        query_type = self.context.schema.query_type
+        if query_type is None:
+            raise UnsupportedSelectionError("query")
+        fields = graphql_internals.collect_fields(self.context, query_type, self.context.operation.selection_set)
+        columns = []
+        for response_key, field_nodes in fields.items():
+            if field_nodes[0].name.value == "__typename":
+                value = self.get_literal(query_type.name)
+            else:
+                value = await self.compile_root_field(query_type, field_nodes)
+            columns.append(sa.type_coerce(value, JSON).label(response_key))
+        return sa.select(*columns)
+
+    async def compile_root_field(self, query_type: GraphQLObjectType, field_nodes: list[FieldNode]) -> Any:
+        """
+        Compile a root field, resolved by one of the generated `resolve_<plural>` resolvers.
+        """
+        field_def, strawberry_field = self.get_field(query_type, field_nodes[0])
+        resolver = strawberry_field.base_resolver
+        if not resolver or resolver.name != f"resolve_{strawberry_field.python_name}":
+            raise UnsupportedSelectionError(field_nodes[0].name.value)
+        field_type = field_def.type
+        if isinstance(field_type, GraphQLNonNull):
+            field_type = field_type.of_type
+        object_type = get_named_type(field_type)
+        if not isinstance(field_type, GraphQLList) or not isinstance(object_type, GraphQLObjectType):
+            raise UnsupportedSelectionError(field_nodes[0].name.value)
+        model_cls = self.get_model(object_type)
+        supported_arguments = {"where", "order_by", "limit_offset"}
+        arguments = self.get_arguments(field_def, strawberry_field, field_nodes[0], supported_arguments)
+        limit_offset = arguments.get("limit_offset") or {}
+        limit, offset = limit_offset.get("limit"), limit_offset.get("offset")
+        if offset and not limit:
+            # Let the resolver report the error
+            raise UnsupportedSelectionError(field_nodes[0].name.value)
+
+        query, sort_keys = await get_sorted_db_query(
+            model_cls,
+            AuthzAction.VIEW,
+            self.authz_client,
+            self.principal,
+            arguments.get("where"),  # type: ignore
+            arguments.get("order_by") or [],
+        )
+        if limit:
+            # Paginated queries are also ordered by primary key (see query_builder.get_db_rows)
+            pk_col_name, _ = sqlalchemy_helpers.get_primary_key(model_cls)
+            sort_keys.append(get_sort_key(pk_col_name, orderBy.asc, query))
+        rows = self.number_rows(query, sort_keys)
+        if limit:
+            rows = rows.limit(limit).offset(offset)
+        subquery = rows.subquery()
+        value = await self.compile_object(aliased(model_cls, subquery), model_cls, object_type, field_nodes)
+        return self.aggregate(subquery, value)
+
+    async def compile_object(
+        self,
+        entity: Any,
+        model_cls: Any,
+        object_type: GraphQLObjectType,
+        field_nodes: list[FieldNode],
+    ) -> Any:
+        """
+        Build the JSON object for the selections of an entity (a model, aliased to the rows it's selected from)
+        """
+        fields = graphql_internals.collect_sub_fields(self.context, object_type, field_nodes)
+        if len(fields) > MAX_OBJECT_FIELDS:
+            raise UnsupportedSelectionError(object_type.name)
+        metadata = sqlalchemy_helpers.get_model_metadata(model_cls)
+        values = []
+        for response_key, subfield_nodes in fields.items():
+            field_name = subfield_nodes[0].name.value
+            if field_name == "__typename":
+                value = self.get_literal(object_type.name)
+            elif field_name == "_id":
+                # See strawberry.relay.GlobalID: base64("<type name>:<id>")
+                type_prefix = self.get_literal(f"{object_type.name}:")
+                global_id = sa.func.convert_to(type_prefix + sa.cast(entity.id, sa.Text), "UTF8")
+                # Postgres wraps base64 lines at 76 characters
+                value = sa.func.replace(sa.func.encode(global_id, "base64"), "\n", "")
+            else:
+                field_def, strawberry_field = self.get_field(object_type, subfield_nodes[0])
+                name = strawberry_field.python_name
+                if name in metadata.column_keys and not strawberry_field.base_resolver:
+                    if subfield_nodes[0].arguments:
+                        raise UnsupportedSelectionError(field_name)
+                    value = self.compile_column(getattr(entity, name), field_def)
+                elif name in metadata.relationships and strawberry_field.base_resolver:
+                    value = await self.compile_relationship(
+                        entity,
+                        metadata.relationships[name],
+                        field_def,
+                        strawberry_field,
+                        subfield_nodes,
+                    )
+                else:
+                    raise UnsupportedSelectionError(field_name)
+            values.extend([self.get_literal(response_key), value])
+        return sa.func.json_build_object(*values, type_=JSON)
+
+    def compile_column(self, column: Any, field_def: GraphQLField) -> Any:
+        field_type = get_named_type(field_def.type)
+        if isinstance(field_type, GraphQLEnumType):
+            # Enum columns store the names of their members, which are also their GraphQL names
+            return column
+        if not isinstance(field_type, GraphQLScalarType) or field_type.name not in COMPILED_SCALARS:
+            raise UnsupportedSelectionError(field_type.name)
+        if field_type.name == "ID":
+            return sa.cast(column, sa.Text)
+        if field_type.name == "DateTime":
+            return self.compile_datetime(column)
+        return column
+
+    def compile_datetime(self, column: Any) -> Any:
+        """
+        Format a datetime the way Strawberry does, with datetime.isoformat(): microseconds are only included if
+        there are any, and (since asyncpg returns aware datetimes in UTC) the UTC offset is +00:00.
+        """
+        timezone = getattr(column.type, "timezone", False)
+        utc_value = sa.func.timezone("UTC", column) if timezone else column
+        microseconds = sa.case(
+            (sa.func.to_char(utc_value, "US") != "000000", sa.func.to_char(utc_value, ".US")),
+            else_="",
+        )
+        value = sa.func.to_char(utc_value, 'YYYY-MM-DD"T"HH24:MI:SS').op("||")(microseconds)
+        return value.op("||")("+00:00") if timezone else value
+
+    async def compile_relationship(
+        self,
+        entity: Any,
+        relationship: RelationshipProperty,
+        field_def: GraphQLField,
+        strawberry_field: StrawberryField,
+        field_nodes: list[FieldNode],
+    ) -> Any:
+        """
+        Select the related rows of a relationship (see EntityLoader.loader_for) in a LATERAL subquery, and
+        build the JSON for them: a single object for to-one relationships, a relay connection otherwise.
+        """
+        related_model = relationship.mapper.class_
+        arguments = self.get_arguments(field_def, strawberry_field, field_nodes[0], {"where", "order_by"})
+        query, sort_keys = await get_sorted_db_query(
+            related_model,
+            AuthzAction.VIEW,
+            self.authz_client,
+            self.principal,
+            arguments.get("where"),  # type: ignore
+            arguments.get("order_by") or [],
+            relationship,
+        )
+        local_keys = sqlalchemy_helpers.get_model_metadata(relationship.parent.class_).local_keys[relationship.key]
+        local_remote_pairs = relationship.local_remote_pairs or []
+        if len(local_keys) != len(local_remote_pairs):
+            # Joined through another table (secondary)
+            raise UnsupportedSelectionError(relationship.key)
+        for local_key, (_, remote) in zip(local_keys, local_remote_pairs, strict=True):
+            query = query.where(remote == getattr(entity, local_key))
+        # The parent rows are selected a few levels up, which SQLAlchemy doesn't correlate to on its own
+        query = query.correlate(entity)
+
+        if not relationship.uselist:
+            rows = apply_sort_keys(query, sort_keys).limit(1).lateral()
+            related = aliased(related_model, rows)
+            related_type = get_named_type(field_def.type)
+            if not isinstance(related_type, GraphQLObjectType):
+                raise UnsupportedSelectionError(related_type.name)
+            value = await self.compile_object(related, related_model, related_type, field_nodes)
+            return sa.select(value).select_from(related).scalar_subquery()
+
+        # Connections without pagination arguments return their first `relay_max_results` rows, ordered
+        # by primary key after the orderBy fields (see gql_loaders.ConnectionRows)
+        pk_col_name, _ = sqlalchemy_helpers.get_primary_key(related_model)
+        sort_keys.append(get_sort_key(pk_col_name, orderBy.asc, query))
+        rows = self.number_rows(query, sort_keys).limit(self.schema.config.relay_max_results).lateral()
+
+        related = aliased(related_model, rows)
+        connection_type = get_named_type(field_def.type)
+        if not isinstance(connection_type, GraphQLObjectType):
+            raise UnsupportedSelectionError(connection_type.name)
+        edge_type = self.get_field_type(connection_type, "edges")
+        node_type = self.get_field_type(edge_type, "node")
+        values = []
+        for response_key, edges_nodes in self.collect_connection_fields(connection_type, field_nodes, "edges").items():
+            if edges_nodes is None:
+                values.extend([self.get_literal(response_key), self.get_literal(connection_type.name)])
+                continue
+            edge_values = []
+            for edge_key, node_nodes in self.collect_connection_fields(edge_type, edges_nodes, "node").items():
+                if node_nodes is None:
+                    value = self.get_literal(edge_type.name)
+                else:
+                    value = await self.compile_object(related, related_model, node_type, node_nodes)
+                edge_values.extend([self.get_literal(edge_key), value])
+            edges = self.aggregate(rows, sa.func.json_build_object(*edge_values, type_=JSON))
+            values.extend([self.get_literal(response_key), edges])
+        return sa.func.json_build_object(*values, type_=JSON)
+
+    def collect_connection_fields(
+        self,
+        object_type: GraphQLObjectType,
+        field_nodes: list[FieldNode],
+        child: str,
+    ) -> dict[str, Optional[list[FieldNode]]]:
+        """
+        Collect the selections of a connection (or edge) type. Only its `child` field (edges, or node) and
+        __typename are supported; the value for __typename is None.
+        """
+        fields = graphql_internals.collect_sub_fields(self.context, object_type, field_nodes)
+        collected: dict[str, Optional[list[FieldNode]]] = {}
+        for response_key, subfield_nodes in fields.items():
+            field_name = subfield_nodes[0].name.value
+            if field_name == "__typename":
+                collected[response_key] = None
+            elif field_name == child:
+                collected[response_key] = subfield_nodes
+            else:
+                raise UnsupportedSelectionError(field_name)
+        return collected
+
+    def aggregate(self, rows: Any, value: Any) -> Any:
+        """
+        Aggregate the JSON objects built for rows numbered by `number_rows` into an array, in order.
+        """
+        objects = sa.func.json_agg(aggregate_order_by(value, rows.c.compiled_row_number), type_=JSON)
+        return (
+            sa.select(sa.func.coalesce(objects, sa.literal_column("'[]'::json"), type_=JSON))
+            .select_from(rows)
+            .scalar_subquery()
+        )
+
+    def number_rows(self, query: sa.Select, sort_keys: list[Any]) -> sa.Select:
+        """
+        Number the rows of a query in the order of its sort keys, so that they can be aggregated in that order
+        """
+        query = apply_sort_keys(query, sort_keys)
+        row_number = sa.func.row_number().over(order_by=get_order_by_clauses(sort_keys))
+        return query.add_columns(row_number.label("compiled_row_number"))
+
+    def get_field_type(self, object_type: GraphQLObjectType, field_name: str) -> GraphQLObjectType:
+        """
+        The object type of a field (e.g. the edges of a connection), which must exist
+        """
+        if field_name not in object_type.fields:
+            raise UnsupportedSelectionError(object_type.name)
+        field_type = get_named_type(object_type.fields[field_name].type)
+        if not isinstance(field_type, GraphQLObjectType):
+            raise UnsupportedSelectionError(field_type.name)
+        return field_type
+
+    def get_field(self, object_type: GraphQLObjectType, field_node: FieldNode) -> tuple[GraphQLField, StrawberryField]:
+        field_def = object_type.fields[field_node.name.value]
+        strawberry_field = graphql_internals.get_strawberry_field(field_def)
+        if strawberry_field is None:
+            raise UnsupportedSelectionError(field_node.name.value)
+        return field_def, strawberry_field
+
+    def get_arguments(
+        self,
+        field_def: GraphQLField,
+        strawberry_field: StrawberryField,
+        field_node: FieldNode,
+        supported: set[str],
+    ) -> dict[str, Any]:
+        """
+        Get the arguments of a field, converted the way Strawberry converts them for resolvers
+        """
+        arguments = graphql_internals.get_arguments(self.schema, self.context, field_def, strawberry_field, field_node)
+        if any(value is not None for name, value in arguments.items() if name not in supported):
+            raise UnsupportedSelectionError(field_node.name.value)
+        return arguments
+
+    def get_model(self, object_type: Any) -> Any:
+        try:
+            return sqlalchemy_helpers.get_orm_class_by_name(object_type.name)
+        except Exception:
+            raise UnsupportedSelectionError(object_type.name) from None
+
+    def get_literal(self, value: str) -> Any:
+        # GraphQL names can't contain quotes, so they're inlined rather than bound: Postgres can't infer the
+        # type of parameters passed to json_build_object()
+        return sa.literal_column(f"'{value}'", sa.Text)
+
+
+class CompiledQueryExtension(SchemaExtension):
+    """
+    Execute queries marked with the `@compiled` directive as a single SQL statement (see QueryCompiler). Add it,
+    along with the directive, to the schema:
+
+        strawberry.Schema(..., directives=[compiled], extensions=[CompiledQueryExtension])
+    """
+
+    async def on_execute(self) -> AsyncIterator[None]:
+        execution_context = self.execution_context
+        # Strawberry runs the extensions of schemas with directives twice, only compile queries once
+        if execution_context.result is None:
+            result = await self.execute_compiled(execution_context)
+            if result is not None:
+                # Strawberry skips the regular execution if a result is already set
+                execution_context.result = result
+        yield
+
+    async def execute_compiled(self, execution_context: ExecutionContext) -> Optional[ExecutionResult]:
+        context = execution_context.context
+        if not isinstance(context, dict) or "sqlalchemy_loader" not in context:
+            return None
+        if not graphql_internals.is_supported():
+            return None
+        graphql_context = GraphQLExecutionContext.build(
+            graphql_internals.get_graphql_schema(execution_context.schema),
+            execution_context.graphql_document,  # type: ignore
+            execution_context.root_value,
+            context,
+            execution_context.variables,
+            execution_context.operation_name,
+        )
+        # Let the regular execution report invalid operations and variables
+        if isinstance(graphql_context, list):
+            return None
+        operation = graphql_context.operation
+        if operation.operation != OperationType.QUERY:
+            return None
+        if not any(directive.name.value == COMPILED_DIRECTIVE for directive in operation.directives or []):
+            return None
+
+        loader = context["sqlalchemy_loader"]
+        # Unauthenticated requests are rejected by the resolvers
+        if loader.principal is None:
+            return None
+        compiler = QueryCompiler(execution_context.schema, graphql_context, loader.authz_client, loader.principal)
+        try:
+            statement = await compiler.compile()
+        except (UnsupportedSelectionError, PlatformicsError):
+            # Fall back to the regular resolvers, which also report invalid inputs
+            return None
+        async with loader.session() as session:
+            row = (await session.execute(statement)).one()
+        return ExecutionResult(data=dict(typing.cast(Any, row._mapping)))
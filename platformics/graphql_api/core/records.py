@@ -0,0 +1,63 @@
+"""
+Lightweight records for rows that are read without the ORM.
+
+Building ORM instances (with their identity map bookkeeping and instrumented attributes) is the most expensive
+part of reading large lists of rows. Reads in "core" mode (see query_builder.get_db_rows and
+gql_loaders.EntityLoader) select the model's columns instead, and map each row to a record: a plain object
+with a slot per column, which the generated Strawberry types accept in place of a model instance.
+"""
+
+import functools
+from typing import Any, Iterable, Sequence
+
+from strawberry.types.cast import TYPE_CAST_ATTRIBUTE
+
+from platformics.support import sqlalchemy_helpers
+
+
+class Record:
+    """
+    Base class of the records of each model (see get_record_class)
+    """
+
+    # strawberry.cast() tags objects with the Strawberry type they resolve to
+    __slots__ = (TYPE_CAST_ATTRIBUTE,)
+    __model__: Any = None
+
+    def is_complete(self) -> bool:
+        """
+        Whether every column of the row was read (rather than only the ones a query selected)
+        """
+        return all(hasattr(self, key) for key in self.__slots__)
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{key}={getattr(self, key)!r}" for key in self.__slots__ if hasattr(self, key))
+        return f"{type(self).__name__}({values})"
+
+
+@functools.cache
+def get_record_class(model_cls: Any) -> type[Record]:
+    """
+    Return the record class of a model, with a slot for each of its columns
+    """
+    column_keys = sqlalchemy_helpers.get_model_metadata(model_cls).column_keys
+    return type(
+        f"{model_cls.__name__}Record",
+        (Record,),
+        {"__slots__": tuple(sorted(column_keys)), "__model__": model_cls},
+    )
+
+
+def to_records(model_cls: Any, keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> list[Record]:
+    """
+    Map rows whose first values are the `keys` columns of a model to records
+    """
+    record_cls = get_record_class(model_cls)
+    records = []
+    for row in rows:
+        record = record_cls()
+        # Rows can have more values than keys (e.g. cursor values), which are left out
+        for key, value in zip(keys, row, strict=False):
+            setattr(record, key, value)
+        records.append(record)
+    return records
@@ -1,9 +1,10 @@
-from typing import Any, Iterable
+from typing import Any, Iterable, Optional
 
 import strawberry
 from strawberry import relay
 from strawberry.types import Info
 
+from platformics.graphql_api.core.cursors import get_cursor
 from platformics.support import sqlalchemy_helpers
 
 
@@ -14,6 +15,14 @@ class EntityInterface(relay.Node):
     # attribute code" (unless you create a column `code` in the table)
     id: relay.NodeID[str]
 
+    @strawberry.field(
+        name="_cursor",
+        description="Position of this row in a paginated list, to pass as `after` or `before` to fetch the next or previous page.",
+    )
+    def cursor(self, info: Info) -> Optional[str]:
+        # Only rows fetched with a limit or a cursor have one (see query_builder.get_db_rows)
+        return get_cursor(info)
+
     @classmethod
     async def resolve_nodes(cls, *, info: Info, node_ids: Iterable[str], required: bool = False) -> list:
         dataloader = info.context["sqlalchemy_loader"]
@@ -26,6 +35,4 @@ class EntityInterface(relay.Node):
         dataloader = info.context["sqlalchemy_loader"]
         gql_type: str = cls.__strawberry_definition__.name  # type: ignore
         sql_model = sqlalchemy_helpers.get_orm_class_by_name(gql_type)
-        res = await dataloader.resolve_nodes(sql_model, [node_id])
-        if res:
-            return res[0]
+        return (await dataloader.resolve_nodes(sql_model, [node_id]))[0]
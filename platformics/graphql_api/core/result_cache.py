@@ -0,0 +1,225 @@
+"""
+A cache of the results of top-level list and aggregate queries, shared by all requests.
+
+Only models whose LinkML class declares a `result_cache_ttl` annotation are cached, for that many seconds.
+Entries are keyed by:
+  - the query's model and a canonical fingerprint of its arguments (where, orderBy, limits, cursors, and the
+    selected columns or aggregates),
+  - the principal's authorization scope: the query plans that authorize each model that the query reads,
+    so principals that are allowed to see the same rows share entries,
+  - the write versions of each table that the query reads (see database/table_versions.py), so entries stop
+    matching as soon as any worker commits a write to one of them. Nothing is cached while those versions
+    aren't reliable. Results read from a lagging replica can still be cached after a write, until they expire.
+
+Entries hold the column values of the rows that a query returned, rather than the rows themselves: ORM instances
+belong to the session that read them (which expires them on rollback, for example), so each hit rebuilds them.
+"""
+
+import typing
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import sqlalchemy as sa
+import strcase
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from platformics.database.table_versions import TableVersions
+from platformics.graphql_api.core.cursors import PaginatedRows
+from platformics.graphql_api.core.query_builder import freeze
+from platformics.graphql_api.core.records import Record
+from platformics.security.authorization import AuthzAction, AuthzClient, Principal
+from platformics.settings import APISettings
+from platformics.support import sqlalchemy_helpers
+from platformics.support.cache import LRUCache
+
+T = typing.TypeVar("T")
+
+
+def freeze_selections(selections: Optional[Iterable[Any]]) -> typing.Hashable:
+    """
+    Returns a hashable fingerprint of (nested) Strawberry field selections
+    """
+    if not selections:
+        return None
+    return tuple(
+        (
+            getattr(selection, "name", None),
+            freeze(getattr(selection, "arguments", None)),
+            freeze_selections(getattr(selection, "selections", None)),
+        )
+        for selection in selections
+    )
+
+
+def get_read_models(
+    model_cls: Any,
+    where: Optional[Any] = None,
+    order_by: Optional[Any] = None,
+    group_by: Optional[Iterable[Any]] = None,
+    to_one: Iterable[str] = (),
+) -> set[Any]:
+    """
+    The models that a query reads: its own, and the related models that its where clause, orderBy, groupBy
+    and joined many-to-one relationships refer to
+    """
+    models = {model_cls}
+    relationships = sqlalchemy_helpers.get_model_metadata(model_cls).relationships
+
+    def visit(cls: Any, value: Any) -> None:
+        # Filters on related models can be nested anywhere (e.g. in the filter of an aggregate filter)
+        if isinstance(value, list):
+            for item in value:
+                visit(cls, item)
+        if not isinstance(value, dict):
+            return
+        cls_relationships = sqlalchemy_helpers.get_model_metadata(cls).relationships
+        for key, item in value.items():
+            relationship = cls_relationships.get(key.removesuffix("_aggregate"))
+            if relationship is not None:
+                models.add(relationship.mapper.entity)
+                visit(relationship.mapper.entity, item)
+            else:
+                visit(cls, item)
+
+    visit(model_cls, where)
+    visit(model_cls, order_by)
+    for group in group_by or []:
+        relationship = relationships.get(strcase.to_snake(group.name))
+        if relationship is not None:
+            models |= get_read_models(relationship.mapper.entity, group_by=getattr(group, "selections", None))
+    for relationship_name in to_one:
+        models.add(relationships[relationship_name].mapper.entity)
+    return models
+
+
+@dataclass(frozen=True)
+class _RowSnapshot:
+    row_cls: Any
+    values: dict[str, Any]
+    # Snapshots of the many-to-one rows that were loaded along with the row
+    related: dict[str, Optional["_RowSnapshot"]]
+
+
+@dataclass(frozen=True)
+class _RowsSnapshot:
+    rows: tuple[Optional[_RowSnapshot], ...]
+    cursors: Optional[tuple[str, ...]]
+
+
+def _is_row(value: Any) -> bool:
+    return isinstance(value, Record) or sa.inspect(value, raiseerr=False) is not None
+
+
+def _snapshot_row(row: Any) -> Optional[_RowSnapshot]:
+    if row is None:
+        return None
+    if isinstance(row, Record):
+        values = {key: getattr(row, key) for key in type(row).__slots__ if hasattr(row, key)}
+        return _RowSnapshot(type(row), values, {})
+    state = sa.inspect(row)
+    metadata = sqlalchemy_helpers.get_model_metadata(type(row))
+    return _RowSnapshot(
+        type(row),
+        {key: state.dict[key] for key in metadata.column_keys if key in state.dict},
+        {
+            name: _snapshot_row(state.dict[name])
+            for name, relationship in metadata.relationships.items()
+            if name in state.dict and not relationship.uselist
+        },
+    )
+
+
+def _restore_row(snapshot: Optional[_RowSnapshot]) -> Any:
+    if snapshot is None:
+        return None
+    if issubclass(snapshot.row_cls, Record):
+        record = snapshot.row_cls()
+        for key, value in snapshot.values.items():
+            setattr(record, key, value)
+        return record
+    row = sa.inspect(snapshot.row_cls).class_manager.new_instance()
+    for key, value in snapshot.values.items():
+        set_committed_value(row, key, value)
+    for name, related in snapshot.related.items():
+        set_committed_value(row, name, _restore_row(related))
+    # Like the rows of a session that's been closed
+    make_transient_to_detached(row)
+    return row
+
+
+def snapshot_result(result: Any) -> Any:
+    """
+    Returns what to cache for the result of a query: the values of its rows, or the result itself if it's made of
+    plain values already (e.g. aggregates, which are read as row mappings)
+    """
+    if not isinstance(result, list) or not all(_is_row(row) for row in result):
+        return result
+    cursors = tuple(result.cursors) if isinstance(result, PaginatedRows) else None
+    return _RowsSnapshot(tuple(_snapshot_row(row) for row in result), cursors)
+
+
+def restore_result(cached: Any) -> Any:
+    """
+    Rebuild the result of a query from what `snapshot_result` cached
+    """
+    if not isinstance(cached, _RowsSnapshot):
+        return cached
+    rows = [_restore_row(row) for row in cached.rows]
+    return rows if cached.cursors is None else PaginatedRows(rows, list(cached.cursors))
+
+
+class ResultCache(LRUCache[typing.Hashable, Any]):
+    """
+    Results of top-level queries. Check `stats` for its hits, misses and evictions.
+    """
+
+    def __init__(self, settings: APISettings, table_versions: TableVersions) -> None:
+        super().__init__(maxsize=settings.RESULT_CACHE_SIZE)
+        self.table_versions = table_versions
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.table_versions.enabled
+
+    async def get_key(
+        self,
+        authz_client: AuthzClient,
+        principal: Principal,
+        model_cls: Any,
+        arguments: typing.Hashable,
+        read_models: Iterable[Any],
+    ) -> Optional[typing.Hashable]:
+        """
+        The key of a query's result, or None if it can't be cached right now
+        """
+        read_models = sorted(read_models, key=lambda cls: cls.__name__)
+        table_names = sorted({table.name for cls in read_models for table in cls.__mapper__.tables})
+        versions = self.table_versions.get_versions(table_names)
+        if versions is None:
+            return None
+        scope = []
+        for cls in read_models:
+            fingerprint, values = await authz_client.get_plan_fingerprint(principal, AuthzAction.VIEW, cls)
+            scope.append((cls.__name__, fingerprint, freeze(values)))
+        return (model_cls.__name__, arguments, tuple(scope), tuple(zip(table_names, versions, strict=True)))
+
+    async def get_or_load(
+        self,
+        key: Optional[typing.Hashable],
+        load: Callable[[], Awaitable[T]],
+        ttl: float,
+    ) -> T:
+        """
+        Return the cached result for a key, or load (and cache) it. Each hit returns new rows (see restore_result).
+        """
+        if key is None:
+            return await load()
+        cached = self.get(key)
+        if cached is not None:
+            return restore_result(cached)
+        # Only cache results once they're read, even if their tables are written in the meantime: the key has
+        # the versions from before the read, so those writes make the entry unreachable
+        result = await load()
+        self.set(key, snapshot_result(result), ttl=ttl)
+        return result
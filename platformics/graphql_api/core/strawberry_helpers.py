@@ -1,8 +1,12 @@
-from typing import Tuple
+import functools
+from typing import Any, Optional, Tuple
 
-from strawberry.types.nodes import SelectedField
+from sqlalchemy.orm import MANYTOONE
+from strawberry.types.nodes import FragmentSpread, InlineFragment, SelectedField, Selection
+from strawberry.utils.str_converters import to_camel_case
 
 from platformics.graphql_api.core.errors import PlatformicsError
+from platformics.support import sqlalchemy_helpers
 
 
 def filter_meta_fields(selections: list[SelectedField]) -> list[SelectedField]:
@@ -39,3 +43,86 @@ def get_aggregate_selections(selected_fields: list[SelectedField]) -> Tuple[list
         raise PlatformicsError("No aggregate functions selected")
 
     return aggregate_selections, groupby_selections
+
+
+def get_connection_node_selections(selections: list[Selection]) -> list[Selection]:
+    """
+    Given the selections of a relay connection field, return the selections of its nodes (connection -> edges -> node)
+    """
+    node_selections: list[Selection] = []
+    for edges in selections:
+        if isinstance(edges, SelectedField) and edges.name == "edges":
+            for node in edges.selections:
+                if isinstance(node, SelectedField) and node.name == "node":
+                    node_selections.extend(node.selections)
+    return node_selections
+
+
+def get_graphql_field_names(model_cls: Any) -> Tuple[dict[str, str], frozenset[str]]:
+    """
+    Return the GraphQL names of a model's columns (mapped to the column names) and relationships.
+    """
+    return _get_graphql_field_names(sqlalchemy_helpers.get_model_metadata(model_cls))
+
+
+# Keyed by the model's metadata rather than by the model, so that it's computed again if the registry is rebuilt
+@functools.cache
+def _get_graphql_field_names(metadata: sqlalchemy_helpers.ModelMetadata) -> Tuple[dict[str, str], frozenset[str]]:
+    columns = {to_camel_case(key): key for key in metadata.column_keys}
+    return columns, frozenset(to_camel_case(key) for key in metadata.relationships)
+
+
+def get_selected_columns(model_cls: Any, selections: list[Any]) -> Optional[tuple[str, ...]]:
+    """
+    Return the names of the columns needed to resolve the selected fields of a model: the selected
+    columns, along with the primary and foreign keys that (nested) relationships are loaded with.
+    Returns None (i.e. "load every column") if any of the selected fields isn't a column or relationship
+    of the model, since it might be computed from other columns.
+    """
+    columns, relationships = get_graphql_field_names(model_cls)
+    selected: set[str] = set()
+
+    def visit(items: list[Any]) -> bool:
+        for item in items:
+            if isinstance(item, (FragmentSpread, InlineFragment)):
+                if not visit(item.selections):
+                    return False
+            elif item.name.startswith("__") or item.name in ("_id", "_cursor"):
+                continue
+            elif item.name in columns:
+                selected.add(columns[item.name])
+            elif item.name not in relationships and item.name.removesuffix("Aggregate") not in relationships:
+                return False
+        return True
+
+    if not visit(selections):
+        return None
+
+    # Keys used to load relationships are always included
+    selected.update(sqlalchemy_helpers.get_model_metadata(model_cls).key_column_keys)
+    return tuple(sorted(selected))
+
+
+def get_selected_to_one_relationships(model_cls: Any, selections: list[Any]) -> dict[str, Optional[tuple[str, ...]]]:
+    """
+    Return the many-to-one relationships of a model that are selected (without any arguments, i.e. with the
+    same filters as their dataloader's default) along with the columns to load for them. These can be joined
+    into the query that loads the model, rather than loaded by their dataloader.
+    """
+    relationships = {
+        to_camel_case(relationship.key): relationship
+        for relationship in sqlalchemy_helpers.get_model_metadata(model_cls).relationships.values()
+        if relationship.direction == MANYTOONE
+    }
+    selected: dict[str, list[SelectedField]] = {}
+    for item in selections:
+        if isinstance(item, SelectedField) and item.name in relationships:
+            selected.setdefault(item.name, []).append(item)
+    to_one = {}
+    for name, items in selected.items():
+        # The same relationship could be selected more than once with aliases and different arguments
+        if len(items) > 1 or items[0].arguments:
+            continue
+        relationship = relationships[name]
+        to_one[relationship.key] = get_selected_columns(relationship.mapper.class_, items[0].selections)
+    return to_one
@@ -3,6 +3,7 @@ Launch the GraphQL server.
 """
 
 import typing
+from contextlib import asynccontextmanager
 
 import strawberry
 from fastapi import Depends, FastAPI
@@ -10,15 +11,26 @@ from strawberry.fastapi import GraphQLRouter
 from strawberry.schema.config import StrawberryConfig
 from strawberry.schema.name_converter import HasGraphQLName, NameConverter
 
-from platformics.database.connect import AsyncDB
+from platformics.database.connect import AsyncDB, RequestSessionManager, init_async_db
+from platformics.database.table_versions import TableVersions
 from platformics.graphql_api.core.deps import (
     get_auth_principal,
     get_authz_client,
     get_engine,
+    get_entity_cache,
+    get_read_flights,
+    get_result_cache,
+    get_session_manager,
+    get_settings,
 )
+from platformics.graphql_api.core.entity_cache import EntityCache
 from platformics.graphql_api.core.gql_loaders import EntityLoader
-from platformics.security.authorization import AuthzClient, Principal
+from platformics.graphql_api.core.result_cache import ResultCache
+from platformics.security.auth_executor import AuthExecutor
+from platformics.security.authorization import AuthzClient, Principal, PrincipalCache
 from platformics.settings import APISettings
+from platformics.support.singleflight import SingleFlight
+from platformics.support.sqlalchemy_helpers import build_model_registry
 
 # ------------------------------------------------------------------------------
 # Utilities for setting up the app
@@ -27,14 +39,29 @@ from platformics.settings import APISettings
 
 def get_context(
     engine: AsyncDB = Depends(get_engine),
+    session_manager: RequestSessionManager = Depends(get_session_manager),
     authz_client: AuthzClient = Depends(get_authz_client),
     principal: Principal = Depends(get_auth_principal),
+    settings: APISettings = Depends(get_settings),
+    entity_cache: EntityCache = Depends(get_entity_cache),
+    result_cache: ResultCache = Depends(get_result_cache),
+    read_flights: typing.Optional[SingleFlight] = Depends(get_read_flights),
 ) -> dict[str, typing.Any]:
     """
     Defines sqlalchemy_loader, used by dataloaders
     """
     return {
-        "sqlalchemy_loader": EntityLoader(engine=engine, authz_client=authz_client, principal=principal),
+        "sqlalchemy_loader": EntityLoader(
+            engine=engine,
+            authz_client=authz_client,
+            principal=principal,
+            session_manager=session_manager,
+            max_batch_size=settings.DATALOADER_MAX_BATCH_SIZE,
+            core_reads=settings.DB_CORE_READS,
+            entity_cache=entity_cache,
+            result_cache=result_cache,
+            flights=read_flights,
+        ),
     }
 
 
@@ -49,6 +76,19 @@ class CustomNameConverter(NameConverter):
         return super().get_graphql_name(obj)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> typing.AsyncIterator[None]:
+    """
+    Listen for table versions while the app runs, and release app-lifetime resources on shutdown.
+    """
+    app.state.table_versions.start(app.state.db)
+    yield
+    await app.state.table_versions.stop()
+    await app.state.db.dispose()
+    await app.state.authz_client.close()
+    app.state.auth_executor.shutdown()
+
+
 def get_app(
     settings: APISettings,
     schema: strawberry.Schema,
@@ -60,10 +100,32 @@ def get_app(
 
     title = settings.SERVICE_NAME
     graphql_app: GraphQLRouter = GraphQLRouter(schema, context_getter=get_context)
-    _app = FastAPI(title=title, debug=settings.DEBUG, dependencies=dependencies)
+    _app = FastAPI(title=title, debug=settings.DEBUG, dependencies=dependencies, lifespan=lifespan)
     _app.include_router(graphql_app, prefix="/graphql")
     # Add a global settings object to the app that we can use as a dependency
     _app.state.settings = settings
+    # Share one engine (and its connection pool) across all requests handled by this app
+    _app.state.db = init_async_db(
+        settings.DB_URI,
+        replica_uris=settings.DB_REPLICA_URIS,
+        **settings.DB_ENGINE_OPTIONS,
+    )
+    # Share one authz client (along with its Cerbos connections and plan cache) across all requests
+    _app.state.authz_client = AuthzClient(settings)
+    # Hydrated principals, keyed by (a digest of) the token they were hydrated from
+    _app.state.principal_cache = PrincipalCache(settings)
+    # Rows read by primary key, shared by all requests (and evicted by the mutations that write them)
+    _app.state.entity_cache = EntityCache(settings)
+    # Write versions of the tables, kept in sync across workers
+    _app.state.table_versions = TableVersions(settings)
+    # Results of top-level queries, shared by all requests (and invalidated by the table versions)
+    _app.state.result_cache = ResultCache(settings, _app.state.table_versions)
+    # Reads in flight, which concurrent requests that run the same statements share
+    _app.state.read_flights = SingleFlight() if settings.DB_COALESCE_READS else None
+    # Token decryption is CPU-bound, so it runs in a pool instead of blocking the event loop
+    _app.state.auth_executor = AuthExecutor(settings)
+    # Introspect the models once, rather than on every request (by now, the schema has imported all of them)
+    build_model_registry()
 
     return _app
 
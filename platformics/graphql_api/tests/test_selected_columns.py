@@ -0,0 +1,49 @@
+"""
+Tests for deriving the columns to load from a query's selected fields
+"""
+
+from typing import Optional
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from strawberry.types.nodes import InlineFragment, SelectedField
+
+from platformics.graphql_api.core.strawberry_helpers import get_selected_columns
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Sample(Base):
+    __tablename__ = "sample"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    sequence: Mapped[Optional[str]]
+    run_id: Mapped[Optional[int]] = mapped_column(ForeignKey("run.id"))
+    run: Mapped[Optional["Run"]] = relationship("Run", back_populates="samples")
+
+
+class Run(Base):
+    __tablename__ = "run"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    samples: Mapped[list[Sample]] = relationship(Sample, back_populates="run")
+
+
+def field(name: str, selections: Optional[list] = None) -> SelectedField:
+    return SelectedField(name=name, directives={}, arguments={}, selections=selections or [])
+
+
+def test_selected_columns() -> None:
+    selections = [
+        field("__typename"),
+        field("_id"),
+        InlineFragment(type_condition="Sample", directives={}, selections=[field("name")]),
+        field("run", [field("id")]),
+    ]
+    # Keys used to load relationships are always included
+    assert get_selected_columns(Sample, selections) == ("id", "name", "run_id")
+
+
+def test_unknown_fields_load_every_column() -> None:
+    assert get_selected_columns(Sample, [field("name"), field("computedField")]) is None
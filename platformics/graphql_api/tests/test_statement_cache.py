@@ -0,0 +1,44 @@
+"""
+Tests for the keys that statements are cached and shared by
+"""
+
+import sqlalchemy as sa
+from sqlalchemy import BindParameter
+
+from platformics.graphql_api.core.query_builder import get_statement_key, parameterize_where
+
+
+def test_where_shapes_ignore_values() -> None:
+    first_params: dict = {}
+    second_params: dict = {}
+    first_shape, template = parameterize_where(
+        {"name": {"_eq": "apple"}, "sample": {"id": {"_in": [1, 2]}}, "description": {"_is_null": True}},
+        first_params,
+    )
+    second_shape, _ = parameterize_where(
+        {"name": {"_eq": "banana"}, "sample": {"id": {"_in": [3]}}, "description": {"_is_null": True}},
+        second_params,
+    )
+    assert first_shape == second_shape
+    assert first_params == {"where_0": "apple", "where_1": [1, 2]}
+    assert second_params == {"where_0": "banana", "where_1": [3]}
+    assert isinstance(template["name"]["_eq"], BindParameter)
+    assert isinstance(template["sample"]["id"]["_in"], BindParameter)
+    # Values that change the structure of the query are part of the shape
+    assert template["description"] == {"_is_null": True}
+    other_shape, _ = parameterize_where({"name": {"_eq": "apple"}, "description": {"_is_null": False}}, {})
+    assert other_shape != first_shape
+
+
+def test_statement_keys_ignore_unique_parameter_names() -> None:
+    table = sa.Table("sample", sa.MetaData(), sa.Column("id", sa.Integer), sa.Column("owner_user_id", sa.Integer))
+    authz_filter = table.c.owner_user_id == sa.bindparam("authz_0")
+
+    def get_key(owner_user_id: int, limit: int) -> object:
+        # Like FilterCache.get_filter, which copies filters with unique bind parameters
+        query = sa.select(table).where(authz_filter.unique_params({"authz_0": owner_user_id}))
+        return get_statement_key(query.where(table.c.id.in_([1, 2])).limit(limit))
+
+    assert get_key(111, 10) == get_key(111, 10)
+    assert get_key(111, 10) != get_key(222, 10)
+    assert get_key(111, 10) != get_key(111, 20)
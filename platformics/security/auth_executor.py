@@ -0,0 +1,94 @@
+"""
+Run CPU-bound auth work (token decryption and signature checks) off the event loop.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import time
+import typing
+from dataclasses import dataclass
+
+from platformics.settings import APISettings
+
+T = typing.TypeVar("T")
+
+
+@dataclass
+class AuthExecutorStats:
+    # Calls that were submitted and haven't completed yet
+    in_flight: int = 0
+    completed: int = 0
+    # Time spent actually running the calls, and time spent waiting for a free worker
+    run_seconds: float = 0.0
+    wait_seconds: float = 0.0
+
+    @property
+    def avg_run_seconds(self) -> float:
+        return self.run_seconds / self.completed if self.completed else 0.0
+
+    @property
+    def avg_wait_seconds(self) -> float:
+        return self.wait_seconds / self.completed if self.completed else 0.0
+
+
+def _timed_call(fn: typing.Callable[..., T], *args: typing.Any) -> tuple[T, float]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class AuthExecutor:
+    """
+    A thread or process pool for auth work. Threads are enough when the crypto libraries release the
+    GIL; processes scale across cores regardless, at the cost of pickling arguments and results.
+    With 0 workers, calls run inline on the event loop.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        self.max_workers = settings.AUTH_EXECUTOR_WORKERS
+        self.stats = AuthExecutorStats()
+        # Workers get the key in its exported form, since JWK objects can't be pickled once they've been used
+        self.private_key_json: str = settings.JWK_PRIVATE_KEY.export(private_key=True)
+        self.executor: typing.Optional[concurrent.futures.Executor] = None
+        if self.max_workers <= 0:
+            return
+        if settings.AUTH_EXECUTOR == "process":
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="auth",
+            )
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a free worker"""
+        if self.executor is None:
+            return 0
+        return max(0, self.stats.in_flight - self.max_workers)
+
+    async def run(self, fn: typing.Callable[..., T], *args: typing.Any) -> T:
+        """
+        Run `fn(*args)` in the pool. With a process pool, `fn`, its arguments and its result must be picklable.
+        """
+        if self.executor is None:
+            result, elapsed = _timed_call(fn, *args)
+            self.stats.completed += 1
+            self.stats.run_seconds += elapsed
+            return result
+        start = time.perf_counter()
+        self.stats.in_flight += 1
+        try:
+            call = functools.partial(_timed_call, fn, *args)
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(self.executor, call)
+        finally:
+            self.stats.in_flight -= 1
+        self.stats.completed += 1
+        self.stats.run_seconds += elapsed
+        self.stats.wait_seconds += max(0.0, time.perf_counter() - start - elapsed)
+        return result
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,16 +1,31 @@
+import asyncio
+import functools
+import hashlib
+import itertools
+import json
+import logging
+import time
 import typing
 from enum import Enum
 
-from cerbos.sdk.client import CerbosClient
+from cerbos.sdk.client import AsyncCerbosClient
+from cerbos.sdk.model import PlanResourcesFilterKind, PlanResourcesResponse, Resource, ResourceDesc
 from cerbos.sdk.model import Principal as CerbosPrincipal
-from cerbos.sdk.model import Resource, ResourceDesc
-from sqlalchemy.sql import Select
+from jwcrypto.jwk import JWK
+from sqlalchemy import and_, bindparam, not_, or_, select
+from sqlalchemy.sql import ColumnElement, Select
+from sqlalchemy.sql.elements import BindParameter
 
 import platformics.database.models as db
+from platformics.security.auth_executor import AuthExecutor
+from platformics.security.policy_evaluator import LocalPolicyEvaluator
 from platformics.security.token_auth import get_token_claims
 from platformics.settings import APISettings
 from platformics.support import sqlalchemy_helpers
-from platformics.thirdparty.cerbos_sqlalchemy.query import get_query
+from platformics.support.cache import LRUCache
+from platformics.thirdparty.cerbos_sqlalchemy.query import OPERATOR_FNS, get_query
+
+logger = logging.getLogger(__name__)
 
 
 class AuthzAction(str, Enum):
@@ -26,16 +41,38 @@ class Principal(CerbosPrincipal):
     pass
 
 
-def hydrate_auth_principal(
-    settings: APISettings,
-    user_token: typing.Optional[str],
-) -> typing.Optional[Principal]:
-    if not user_token:
-        return None
+class PrincipalCache(LRUCache[bytes, Principal]):
+    """
+    Cache of the principals hydrated from bearer tokens, so that clients that reuse a token don't pay
+    for its decryption and signature check on every request. Entries expire along with their token.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        super().__init__(maxsize=settings.PRINCIPAL_CACHE_SIZE)
+
+    def get_key(self, user_token: str) -> bytes:
+        # Don't keep tokens around in memory any longer than we need to
+        return hashlib.sha256(user_token.encode("utf-8")).digest()
+
+
+@functools.lru_cache(maxsize=8)
+def _load_private_key(private_key_json: str) -> JWK:
+    return JWK.from_json(private_key_json)
+
+
+def _principal_from_token(
+    private_key_json: str,
+    user_token: str,
+) -> tuple[typing.Optional[Principal], typing.Optional[float]]:
+    """
+    Decrypt and verify a token, and hydrate a principal from its claims. Returns the principal along with
+    the token's expiration time. This is CPU-bound, and meant to run in an AuthExecutor. The key is passed
+    in its exported form since JWK objects can't be pickled (to be sent to a process pool) once they've been used.
+    """
     try:
-        claims = get_token_claims(settings.JWK_PRIVATE_KEY, user_token)
+        claims = get_token_claims(_load_private_key(private_key_json), user_token)
     except:  # noqa
-        return None
+        return None, None
 
     if "project_roles" not in claims:
         raise Exception("no project roles in claims")
@@ -49,9 +86,9 @@ def hydrate_auth_principal(
             for item in project_ids:
                 assert int(item)
     except Exception:
-        return None
+        return None, None
 
-    return Principal(
+    principal = Principal(
         claims["sub"],
         roles=["user"],
         attr={
@@ -62,21 +99,317 @@ def hydrate_auth_principal(
             "service_identity": claims["service_identity"],
         },
     )
+    return principal, claims["exp"]
+
+
+async def hydrate_auth_principal(
+    settings: APISettings,
+    user_token: typing.Optional[str],
+    principal_cache: typing.Optional[PrincipalCache] = None,
+    auth_executor: typing.Optional[AuthExecutor] = None,
+) -> typing.Optional[Principal]:
+    if not user_token:
+        return None
+    if principal_cache is not None:
+        cache_key = principal_cache.get_key(user_token)
+        if (cached_principal := principal_cache.get(cache_key)) is not None:
+            return cached_principal
+
+    if auth_executor is not None:
+        principal, expiration = await auth_executor.run(
+            _principal_from_token,
+            auth_executor.private_key_json,
+            user_token,
+        )
+    else:
+        principal, expiration = _principal_from_token(settings.JWK_PRIVATE_KEY.export(private_key=True), user_token)
+
+    if principal is not None and principal_cache is not None:
+        ttl = expiration - time.time()  # type: ignore
+        if ttl > 0:
+            principal_cache.set(cache_key, principal, ttl=ttl)
+    return principal
+
+
+class PlanCache(LRUCache[typing.Hashable, PlanResourcesResponse]):
+    """
+    Cache of Cerbos query plans, shared by all requests. Stale plans are served while
+    they're refreshed in the background.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        super().__init__(
+            maxsize=settings.CERBOS_PLAN_CACHE_SIZE,
+            ttl=settings.CERBOS_PLAN_CACHE_TTL,
+            stale_ttl=settings.CERBOS_PLAN_CACHE_STALE_TTL,
+        )
+        self.shared_actions = set(settings.CERBOS_PLAN_CACHE_SHARED_ACTIONS)
+        # Keys that are currently being refreshed
+        self.refreshing: set[typing.Hashable] = set()
+
+    def get_key(self, principal: Principal, action: AuthzAction, resource_kind: str) -> typing.Hashable:
+        """
+        Plans only depend on the principal's roles and attributes. For actions whose policies
+        don't look at who the principal is (only at their project roles), plans are shared
+        by all principals with the same roles.
+        """
+        attr = dict(principal.attr)
+        principal_id = principal.id
+        if action in self.shared_actions:
+            attr.pop("user_id", None)
+            principal_id = None
+        scope = {k: sorted(v) if isinstance(v, list) else v for k, v in attr.items()}
+        return (
+            str(action),
+            resource_kind,
+            principal_id,
+            tuple(sorted(principal.roles)),
+            json.dumps(scope, sort_keys=True, default=str),
+        )
+
+
+_attr_maps: dict[type, dict[str, typing.Any]] = {}
+
+
+def get_attr_map(model_cls: type[db.Base]) -> dict[str, typing.Any]:  # type: ignore
+    """
+    Map of Cerbos resource attributes to the model's columns. Models don't change at runtime, so
+    this is only computed once per model.
+    """
+    attr_map = _attr_maps.get(model_cls)
+    if attr_map is None:
+        # Send all non-relationship columns to cerbos to make decisions
+        attr_map = {
+            f"request.resource.attr.{col.key}": getattr(model_cls, col.key)
+            for col in sqlalchemy_helpers.model_class_cols(model_cls)
+        }
+        _attr_maps[model_cls] = attr_map
+    return attr_map
+
+
+# Python equivalents of the comparisons in OPERATOR_FNS
+_COMPARISONS: dict[str, typing.Callable[[typing.Any, typing.Any], bool]] = {
+    "eq": lambda c, v: c == v,
+    "ne": lambda c, v: c != v,
+    "lt": lambda c, v: c < v,
+    "gt": lambda c, v: c > v,
+    "le": lambda c, v: c <= v,
+    "ge": lambda c, v: c >= v,
+    "in": lambda c, v: c in v,
+}
+
+
+def _check_comparable(operator: str, column_value: typing.Any, value: typing.Any) -> None:
+    # Only compare values that the database wouldn't need to cast (e.g. not a UUID column with a string)
+    numbers = (int, float)
+    if isinstance(column_value, numbers) and isinstance(value, numbers):
+        return
+    if type(column_value) is not type(value) or type(value) not in (str, bool):
+        raise ValueError(f"Can't compare {type(column_value).__name__} with {type(value).__name__}")
+    # The order of strings depends on the database's collation
+    if isinstance(value, str) and operator in ("lt", "gt", "le", "ge"):
+        raise ValueError(f"Can't compare strings with {operator}")
+
+
+def evaluate_condition(operand: dict[str, typing.Any], values: dict[str, typing.Any]) -> typing.Optional[bool]:
+    """
+    Evaluate a query plan condition against a row's column values, with the same result as the SQL filter
+    that it translates into: comparisons with NULL are unknown (None), which isn't a match. Raises ValueError
+    or KeyError for conditions that can't be evaluated in Python, so callers can ask the database instead.
+    """
+    if exp := operand.get("expression"):
+        return evaluate_condition(exp, values)
+    operator = operand["operator"]
+    child_operands = operand["operands"]
+    if operator in ("and", "or"):
+        results = [evaluate_condition(o, values) for o in child_operands]
+        decisive = operator == "or"
+        if decisive in results:
+            return decisive
+        return None if None in results else not decisive
+    if operator == "not":
+        # not_() of several operands is the negation of their conjunction
+        result = evaluate_condition({"operator": "and", "operands": child_operands}, values)
+        return None if result is None else not result
+
+    d = {k: v for o in child_operands for k, v in o.items()}
+    variable = d["variable"]
+    prefix = "request.resource.attr."
+    if not variable.startswith(prefix):
+        raise KeyError(f"Attribute does not exist in the attribute column map: {variable}")
+    column_value = values[variable[len(prefix) :]]
+    if operator not in _COMPARISONS:
+        raise ValueError(f"Unrecognised operator: {operator}")
+    if column_value is None:
+        return None
+    value = d["value"]
+    if operator == "in":
+        if not isinstance(value, list):
+            value = [value]
+        for item in value:
+            _check_comparable(operator, column_value, item)
+    else:
+        _check_comparable(operator, column_value, value)
+    return _COMPARISONS[operator](column_value, value)
+
+
+def _is_null_comparison(operator: str, value: typing.Any) -> bool:
+    # `get_query` compares with None values directly, which SQLAlchemy turns into IS (NOT) NULL
+    return value is None and operator in ("eq", "ne")
+
+
+class FilterCache(LRUCache[typing.Hashable, ColumnElement]):
+    """
+    Cache of the SQL filters that Cerbos query plans translate into. Plans that only differ by their
+    values (e.g. the list of project ids a principal is a member of) share the same filter, built with
+    bind parameters, and only need their values re-bound. Check `stats.hit_rate` to see how effective it is.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        super().__init__(maxsize=settings.CERBOS_FILTER_CACHE_SIZE)
+
+    def get_filter(self, condition: dict[str, typing.Any], model_cls: type[db.Base]) -> ColumnElement:  # type: ignore
+        values: list[typing.Any] = []
+        fingerprint = self._get_fingerprint(condition, values)
+        key = (model_cls, fingerprint)
+        template = self.get(key)
+        if template is None:
+            template = self._build_filter(condition, get_attr_map(model_cls), iter(range(len(values))))
+            self.set(key, template)
+        # Copy the filter with fresh (unique) bind parameters, so it can appear more than once in a query
+        return template.unique_params({f"authz_{i}": value for i, value in enumerate(values)})
+
+    def get_fingerprint(self, condition: dict[str, typing.Any]) -> typing.Tuple[typing.Hashable, list[typing.Any]]:
+        """
+        Returns the structure of a plan condition, along with its values
+        """
+        values: list[typing.Any] = []
+        return self._get_fingerprint(condition, values), values
+
+    def get_template_filter(
+        self,
+        condition: dict[str, typing.Any],
+        model_cls: type[db.Base],  # type: ignore
+        param_prefix: str,
+    ) -> ColumnElement:
+        """
+        Returns the filter for a plan condition, with its values left as bind parameters named
+        `<param_prefix>_<i>`, in the order `get_fingerprint` returns them
+        """
+        return self._build_filter(condition, get_attr_map(model_cls), itertools.count(), param_prefix)
+
+    def _get_fingerprint(self, operand: dict[str, typing.Any], values: list[typing.Any]) -> typing.Hashable:
+        """
+        Returns the structure of a plan condition, and collects its values in traversal order
+        """
+        if exp := operand.get("expression"):
+            return self._get_fingerprint(exp, values)
+        operator = operand["operator"]
+        if operator in ("and", "or", "not"):
+            return (operator, tuple(self._get_fingerprint(o, values) for o in operand["operands"]))
+        d = {k: v for o in operand["operands"] for k, v in o.items()}
+        value = d["value"]
+        if _is_null_comparison(operator, value):
+            # Translated into IS (NOT) NULL, without a bind parameter
+            return (operator, d["variable"], None)
+        if operator == "in" and not isinstance(value, list):
+            value = [value]
+        values.append(value)
+        return (operator, d["variable"])
+
+    def _build_filter(
+        self,
+        operand: dict[str, typing.Any],
+        attr_map: dict[str, typing.Any],
+        param_ids: typing.Iterator[int],
+        param_prefix: str = "authz",
+    ) -> ColumnElement:
+        """
+        Same translation as `get_query`, but with bind parameters instead of values
+        """
+        if exp := operand.get("expression"):
+            return self._build_filter(exp, attr_map, param_ids, param_prefix)
+        operator = operand["operator"]
+        child_operands = operand["operands"]
+        if operator == "and":
+            return and_(*[self._build_filter(o, attr_map, param_ids, param_prefix) for o in child_operands])
+        if operator == "or":
+            return or_(*[self._build_filter(o, attr_map, param_ids, param_prefix) for o in child_operands])
+        if operator == "not":
+            return not_(*[self._build_filter(o, attr_map, param_ids, param_prefix) for o in child_operands])
+
+        d = {k: v for o in child_operands for k, v in o.items()}
+        variable = d["variable"]
+        try:
+            column = attr_map[variable]
+        except KeyError:
+            raise KeyError(f"Attribute does not exist in the attribute column map: {variable}") from None
+        if operator not in OPERATOR_FNS:
+            raise ValueError(f"Unrecognised operator: {operator}")
+        if _is_null_comparison(operator, d["value"]):
+            # Comparing with a NULL bind parameter would never match
+            return OPERATOR_FNS[operator](column, None)
+        param: BindParameter = bindparam(f"{param_prefix}_{next(param_ids)}")
+        if operator == "in":
+            return sqlalchemy_helpers.in_array(column, param)
+        return OPERATOR_FNS[operator](column, param)
+
+
+class StatementCache(LRUCache[typing.Hashable, typing.Any]):
+    """
+    Cache of the statements that authorized queries are built into (see query_builder.get_sorted_db_query),
+    keyed by the shape of their where / orderBy arguments and of the query plans that authorize them. The
+    statements are built with bind parameters instead of values, so queries with the same shapes only need
+    their values re-bound, and share the same compiled SQL. Check `stats.hit_rate` to see how effective it is.
+    """
+
+    def __init__(self, settings: APISettings) -> None:
+        super().__init__(maxsize=settings.DB_STATEMENT_CACHE_SIZE)
+        # The (model, action) of each query plan that a shape of query is authorized with, in the order
+        # that their bind parameters are numbered
+        self.plans: LRUCache[typing.Hashable, list[typing.Tuple[typing.Any, AuthzAction]]] = LRUCache(
+            maxsize=settings.DB_STATEMENT_CACHE_SIZE,
+        )
 
 
 class AuthzClient:
-    def __init__(self, settings: APISettings):
+    """
+    Authorization checks and authorized queries, backed by Cerbos. A single instance (and its pool of
+    keep-alive connections to Cerbos) is meant to be shared by all requests for the lifetime of the app.
+    """
+
+    def __init__(
+        self,
+        settings: APISettings,
+        plan_cache: typing.Optional[PlanCache] = None,
+        filter_cache: typing.Optional[FilterCache] = None,
+        statement_cache: typing.Optional[StatementCache] = None,
+    ):
         self.settings = settings
-        self.client = CerbosClient(host=settings.CERBOS_URL)
+        self.client = AsyncCerbosClient(host=settings.CERBOS_URL)
+        if plan_cache is None:
+            plan_cache = PlanCache(settings)
+        self.plan_cache = plan_cache
+        if filter_cache is None:
+            filter_cache = FilterCache(settings)
+        self.filter_cache = filter_cache
+        if statement_cache is None:
+            statement_cache = StatementCache(settings)
+        self.statement_cache = statement_cache
+        # Keep references to background plan refreshes so they don't get garbage collected
+        self._refresh_tasks: set[asyncio.Task] = set()
+        self.local_evaluator: typing.Optional[LocalPolicyEvaluator] = None
+        if settings.CERBOS_LOCAL_POLICY_DIR:
+            self.local_evaluator = LocalPolicyEvaluator(settings.CERBOS_LOCAL_POLICY_DIR)
+
+    async def close(self) -> None:
+        await self.client.close()
 
     # Convert a model object to a dictionary
     def _obj_to_dict(self, obj):
         mydict = {}
-        relationships = obj.__mapper__.relationships
-        for col in obj.__mapper__.all_orm_descriptors:
-            # Don't send related fields to cerbos for authz checks
-            if col.key in relationships:
-                continue
+        # Don't send related fields to cerbos for authz checks
+        for col in sqlalchemy_helpers.model_class_cols(type(obj)):
             value = getattr(obj, col.key)
             if type(value) not in [int, str, bool, float]:
                 # TODO, we probably want to look into a smarter way to serialize fields for cerbos
@@ -86,22 +419,15 @@ class AuthzClient:
 
     # get a list of non-relationship cols for a model class
     def _model_class_cols(self, cls):
-        cols = []
-        relationships = cls.__mapper__.relationships
-        for col in cls.__mapper__.all_orm_descriptors:
-            # Don't send related fields to cerbos for authz checks
-            if col.key in relationships:
-                continue
-            cols.append(col)
-        return cols
-
-    def can_create(self, resource, principal: Principal) -> bool:
+        return sqlalchemy_helpers.model_class_cols(cls)
+
+    async def can_create(self, resource, principal: Principal) -> bool:
         resource_type = type(resource).__tablename__
         attr = self._obj_to_dict(resource)
         resource = Resource(id="NEW_ID", kind=resource_type, attr=attr)
-        return bool(self.client.is_allowed(AuthzAction.CREATE, principal, resource))
+        return await self._is_allowed(AuthzAction.CREATE, principal, resource)
 
-    def can_update(self, resource, principal: Principal) -> bool:
+    async def can_update(self, resource, principal: Principal) -> bool:
         resource_type = type(resource).__tablename__
         attr = self._obj_to_dict(resource)
         # TODO - this should send in the actual resource ID instead of a placeholder string
@@ -109,31 +435,128 @@ class AuthzClient:
         # so they cannot be sent in cerbos perms checks, and we need to find/use the table's
         # primary key instead of a hardcoded column name.
         resource = Resource(id="resource_id", kind=resource_type, attr=attr)
-        return bool(self.client.is_allowed(AuthzAction.UPDATE, principal, resource))
+        return await self._is_allowed(AuthzAction.UPDATE, principal, resource)
+
+    async def _is_allowed(self, action: AuthzAction, principal: Principal, resource: Resource) -> bool:
+        if self.local_evaluator:
+            allowed = self.local_evaluator.is_allowed(action, principal, resource)
+            if allowed is not None:
+                return allowed
+        return bool(await self.client.is_allowed(action, principal, resource))
 
     # Get a SQLAlchemy model with authz filters already applied
-    def get_resource_query(
+    async def get_resource_query(
         self,
         principal: Principal,
         action: AuthzAction,
         model_cls: type[db.Base],  # type: ignore
         relationship: typing.Optional[typing.Any] = None,  # type: ignore
     ) -> Select:
-        rd = ResourceDesc(model_cls.__tablename__)
-        plan = self.client.plan_resources(action, principal, rd)
-
-        attr_map = {}
-        joins = []  # type: ignore
-        # Send all non-relationship columns to cerbos to make decisions
-        for col in sqlalchemy_helpers.model_class_cols(model_cls):
-            attr_map[f"request.resource.attr.{col.key}"] = getattr(model_cls, col.key)
-        query = get_query(
+        plan = await self._get_plan(principal, action, model_cls.__tablename__)
+        if plan.filter is not None and plan.filter.kind == PlanResourcesFilterKind.CONDITIONAL:
+            return select(model_cls).where(self.filter_cache.get_filter(plan.filter.condition.to_dict(), model_cls))
+        return get_query(
             plan,
             model_cls,  # type: ignore
-            attr_map,  # type: ignore
-            joins,  # type: ignore
+            get_attr_map(model_cls),  # type: ignore
         )
-        return query
+
+    async def can_view_row(
+        self,
+        principal: Principal,
+        model_cls: type[db.Base],  # type: ignore
+        values: dict[str, typing.Any],
+    ) -> typing.Optional[bool]:
+        """
+        Whether a principal can view a row, given its column values (e.g. a row from a cache that's shared by
+        all principals), according to the same query plan that authorizes queries for the model. Returns None
+        if the plan can't be evaluated in Python, in which case the row should be read from the database.
+        """
+        plan = await self._get_plan(principal, AuthzAction.VIEW, model_cls.__tablename__)
+        if plan.filter is None or plan.filter.kind == PlanResourcesFilterKind.ALWAYS_DENIED:
+            return False
+        if plan.filter.kind == PlanResourcesFilterKind.ALWAYS_ALLOWED:
+            return True
+        try:
+            return evaluate_condition(plan.filter.condition.to_dict(), values) is True
+        except (KeyError, ValueError, TypeError):
+            return None
+
+    async def get_plan_fingerprint(
+        self,
+        principal: Principal,
+        action: AuthzAction,
+        model_cls: type[db.Base],  # type: ignore
+    ) -> typing.Tuple[typing.Hashable, list[typing.Any]]:
+        """
+        Returns the structure of the plan that authorizes queries for a model, along with its values
+        """
+        plan = await self._get_plan(principal, action, model_cls.__tablename__)
+        return self._get_plan_fingerprint(plan)
+
+    async def get_resource_query_template(
+        self,
+        principal: Principal,
+        action: AuthzAction,
+        model_cls: type[db.Base],  # type: ignore
+        param_prefix: str,
+    ) -> typing.Tuple[Select, typing.Hashable, list[typing.Any]]:
+        """
+        Same as `get_resource_query`, but the values of the plan's filter are left as bind parameters named
+        `<param_prefix>_<i>`. Also returns the structure of the plan, and the values to bind.
+        """
+        plan = await self._get_plan(principal, action, model_cls.__tablename__)
+        fingerprint, values = self._get_plan_fingerprint(plan)
+        if plan.filter is not None and plan.filter.kind == PlanResourcesFilterKind.CONDITIONAL:
+            condition = self.filter_cache.get_template_filter(plan.filter.condition.to_dict(), model_cls, param_prefix)
+            return select(model_cls).where(condition), fingerprint, values
+        return get_query(plan, model_cls, get_attr_map(model_cls)), fingerprint, values  # type: ignore
+
+    def _get_plan_fingerprint(self, plan: PlanResourcesResponse) -> typing.Tuple[typing.Hashable, list[typing.Any]]:
+        if plan.filter is None:
+            return None, []
+        if plan.filter.kind == PlanResourcesFilterKind.CONDITIONAL:
+            fingerprint, values = self.filter_cache.get_fingerprint(plan.filter.condition.to_dict())
+            return (plan.filter.kind, fingerprint), values
+        return plan.filter.kind, []
+
+    async def _get_plan(self, principal: Principal, action: AuthzAction, resource_kind: str) -> PlanResourcesResponse:
+        if self.local_evaluator:
+            # Local plans are cheaper to compute than to look up in the cache
+            local_plan = self.local_evaluator.plan_resources(action, principal, resource_kind)
+            if local_plan is not None:
+                return local_plan
+        key = self.plan_cache.get_key(principal, action, resource_kind)
+        plan, is_stale = self.plan_cache.lookup(key)
+        if plan is None:
+            return await self._fetch_plan(key, principal, action, resource_kind)
+        if is_stale and key not in self.plan_cache.refreshing:
+            # Serve the stale plan and refresh it in the background
+            self.plan_cache.refreshing.add(key)
+            task = asyncio.create_task(self._fetch_plan(key, principal, action, resource_kind))
+            self._refresh_tasks.add(task)
+            task.add_done_callback(self._on_refreshed)
+        return plan
+
+    def _on_refreshed(self, task: asyncio.Task) -> None:
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # The stale plan keeps being served (and refreshed) until it expires
+            logger.warning("Failed to refresh a Cerbos query plan", exc_info=task.exception())
+
+    async def _fetch_plan(
+        self,
+        key: typing.Hashable,
+        principal: Principal,
+        action: AuthzAction,
+        resource_kind: str,
+    ) -> PlanResourcesResponse:
+        try:
+            plan = await self.client.plan_resources(action, principal, ResourceDesc(resource_kind))
+            self.plan_cache.set(key, plan)
+        finally:
+            self.plan_cache.refreshing.discard(key)
+        return plan
 
     # An opportunity to modify SQL WHERE clauses before they get sent to the DB.
     def modify_where_clause(
@@ -0,0 +1,362 @@
+"""
+In-process evaluation of Cerbos policies.
+
+Platformics' generated policies only grant access based on derived roles whose conditions compare a
+resource attribute to a principal attribute, for example:
+
+    request.resource.attr.collection_id in request.principal.attr.member_projects
+    request.resource.attr.owner_user_id == request.principal.attr.user_id
+
+LocalPolicyEvaluator loads the policy YAML files and evaluates conditions like these without a
+network round trip to Cerbos. It produces the same query plans (which get turned into SQL filters by
+`platformics.thirdparty.cerbos_sqlalchemy.query.get_query`) and the same allow/deny decisions as Cerbos
+would. Whenever a resource kind or an action uses a policy feature it doesn't understand, it returns
+None so that callers can fall back to asking Cerbos.
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Optional, Union
+
+import yaml
+from cerbos.sdk.model import (
+    PlanResourcesExpression,
+    PlanResourcesFilter,
+    PlanResourcesFilterKind,
+    PlanResourcesResponse,
+    Principal,
+    Resource,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY_VERSION = "default"
+
+_RESOURCE_ATTR = r"(?:request\.resource|R)\.attr\.(\w+)"
+_PRINCIPAL_ATTR = r"(?:request\.principal|P)\.attr\.(\w+)"
+_LITERAL = r"(-?\d+|\"[^\"]*\"|'[^']*'|true|false)"
+_IN_PRINCIPAL_ATTR = re.compile(rf"^{_RESOURCE_ATTR}\s+in\s+{_PRINCIPAL_ATTR}$")
+_EQ_PRINCIPAL_ATTR = re.compile(rf"^{_RESOURCE_ATTR}\s*==\s*{_PRINCIPAL_ATTR}$")
+_EQ_PRINCIPAL_ATTR_REVERSED = re.compile(rf"^{_PRINCIPAL_ATTR}\s*==\s*{_RESOURCE_ATTR}$")
+_EQ_LITERAL = re.compile(rf"^{_RESOURCE_ATTR}\s*==\s*{_LITERAL}$")
+
+
+class UnsupportedPolicyError(Exception):
+    pass
+
+
+# A condition that has been partially evaluated against a principal: either a constant, or a
+# plan expression (in the same format as Cerbos' query plans) over resource attributes.
+PlanCondition = Union[bool, dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class Condition:
+    """
+    A compiled policy condition. `op` is one of:
+      - "in": resource attribute is in the list held by a principal attribute
+      - "eq": resource attribute equals a principal attribute (or a literal value)
+      - "and" / "or" / "not": combinations of other conditions
+    """
+
+    op: str
+    resource_attr: Optional[str] = None
+    principal_attr: Optional[str] = None
+    value: Any = None
+    children: tuple["Condition", ...] = ()
+
+    def plan(self, principal: Principal) -> PlanCondition:
+        if self.op == "in":
+            values = principal.attr.get(self.principal_attr)
+            if not values:
+                return False
+            return _expression("in", self.resource_attr, list(values))
+        if self.op == "eq":
+            value = self.value
+            if self.principal_attr:
+                if self.principal_attr not in principal.attr:
+                    return False
+                value = principal.attr[self.principal_attr]
+            return _expression("eq", self.resource_attr, value)
+        children = [child.plan(principal) for child in self.children]
+        if self.op == "and":
+            return _and(children)
+        if self.op == "or":
+            return _or(children)
+        # "not" conditions only have a single child
+        return _not(children[0])
+
+    def evaluate(self, principal: Principal, resource: Resource) -> bool:
+        if self.op in ("in", "eq"):
+            if self.resource_attr not in resource.attr:
+                return False
+            resource_value = resource.attr[self.resource_attr]
+            if self.op == "in":
+                return resource_value in (principal.attr.get(self.principal_attr) or [])
+            if self.principal_attr:
+                return self.principal_attr in principal.attr and resource_value == principal.attr[self.principal_attr]
+            return resource_value == self.value
+        results = [child.evaluate(principal, resource) for child in self.children]
+        if self.op == "and":
+            return all(results)
+        if self.op == "or":
+            return any(results)
+        return not results[0]
+
+
+def _expression(operator: str, resource_attr: Optional[str], value: Any) -> dict[str, Any]:
+    return {
+        "operator": operator,
+        "operands": [{"variable": f"request.resource.attr.{resource_attr}"}, {"value": value}],
+    }
+
+
+def _and(conditions: list[PlanCondition]) -> PlanCondition:
+    if any(condition is False for condition in conditions):
+        return False
+    expressions = [condition for condition in conditions if condition is not True]
+    if not expressions:
+        return True
+    if len(expressions) == 1:
+        return expressions[0]
+    return {"operator": "and", "operands": [{"expression": expr} for expr in expressions]}
+
+
+def _or(conditions: list[PlanCondition]) -> PlanCondition:
+    if any(condition is True for condition in conditions):
+        return True
+    expressions = [condition for condition in conditions if condition is not False]
+    if not expressions:
+        return False
+    if len(expressions) == 1:
+        return expressions[0]
+    return {"operator": "or", "operands": [{"expression": expr} for expr in expressions]}
+
+
+def _not(condition: PlanCondition) -> PlanCondition:
+    if isinstance(condition, bool):
+        return not condition
+    return {"operator": "not", "operands": [{"expression": condition}]}
+
+
+def _action_name(action: Any) -> str:
+    # Actions are usually passed in as AuthzAction enum members
+    return action.value if isinstance(action, Enum) else str(action)
+
+
+def compile_expression(expr: str) -> Condition:
+    expr = " ".join(expr.split())
+    if match := _IN_PRINCIPAL_ATTR.match(expr):
+        return Condition("in", resource_attr=match.group(1), principal_attr=match.group(2))
+    if match := _EQ_PRINCIPAL_ATTR.match(expr):
+        return Condition("eq", resource_attr=match.group(1), principal_attr=match.group(2))
+    if match := _EQ_PRINCIPAL_ATTR_REVERSED.match(expr):
+        return Condition("eq", resource_attr=match.group(2), principal_attr=match.group(1))
+    if match := _EQ_LITERAL.match(expr):
+        return Condition("eq", resource_attr=match.group(1), value=yaml.safe_load(match.group(2)))
+    raise UnsupportedPolicyError(f"Unsupported condition: {expr}")
+
+
+def compile_match(match: dict[str, Any]) -> Condition:
+    """
+    Compile the `match` block of a Cerbos condition
+    """
+    if "expr" in match:
+        return compile_expression(match["expr"])
+    for key, op in (("all", "and"), ("any", "or"), ("none", "not")):
+        if key in match:
+            children = tuple(compile_match(item) for item in match[key]["of"])
+            if op == "not":
+                return Condition("not", children=(Condition("or", children=children),))
+            return Condition(op, children=children)
+    raise UnsupportedPolicyError(f"Unsupported condition: {match}")
+
+
+def compile_condition(condition: Optional[dict[str, Any]]) -> Optional[Condition]:
+    if not condition:
+        return None
+    if set(condition.keys()) != {"match"}:
+        raise UnsupportedPolicyError(f"Unsupported condition: {condition}")
+    return compile_match(condition["match"])
+
+
+@dataclass
+class DerivedRole:
+    parent_roles: set[str]
+    condition: Optional[Condition]
+
+
+@dataclass
+class Rule:
+    actions: set[str]
+    allow: bool
+    roles: set[str] = field(default_factory=set)
+    derived_roles: list[DerivedRole] = field(default_factory=list)
+    condition: Optional[Condition] = None
+
+    def matches_action(self, action: str) -> bool:
+        return "*" in self.actions or action in self.actions
+
+    def plan(self, principal: Principal) -> PlanCondition:
+        principal_roles = set(principal.roles)
+        activations: list[PlanCondition] = []
+        if "*" in self.roles or principal_roles & self.roles:
+            activations.append(True)
+        for derived_role in self.derived_roles:
+            if "*" in derived_role.parent_roles or principal_roles & derived_role.parent_roles:
+                activations.append(derived_role.condition.plan(principal) if derived_role.condition else True)
+        conditions = [_or(activations)]
+        if self.condition:
+            conditions.append(self.condition.plan(principal))
+        return _and(conditions)
+
+    def evaluate(self, principal: Principal, resource: Resource) -> bool:
+        principal_roles = set(principal.roles)
+        activated = "*" in self.roles or bool(principal_roles & self.roles)
+        for derived_role in self.derived_roles:
+            if activated:
+                break
+            if "*" in derived_role.parent_roles or principal_roles & derived_role.parent_roles:
+                activated = derived_role.condition is None or derived_role.condition.evaluate(principal, resource)
+        if not activated:
+            return False
+        return self.condition is None or self.condition.evaluate(principal, resource)
+
+
+class LocalPolicyEvaluator:
+    """
+    Evaluates the (default version of the) resource policies found in a directory of Cerbos policies.
+    Policies are only read once, when it's created: if the policies that Cerbos serves change, processes
+    that evaluate them locally must be restarted to pick the changes up.
+    """
+
+    def __init__(self, policy_dir: str) -> None:
+        self.rules: dict[str, list[Rule]] = {}
+        # Resource kinds whose policies use features we can't evaluate locally
+        self.unsupported_kinds: set[str] = set()
+        # Principal policies can override any resource policy, so we can't evaluate anything locally
+        self.has_principal_policies = False
+        self._load(policy_dir)
+
+    def _load(self, policy_dir: str) -> None:
+        derived_role_defs: dict[str, dict[str, dict[str, Any]]] = {}
+        resource_policies = []
+        for root, _dirs, files in os.walk(policy_dir):
+            for filename in sorted(files):
+                if not filename.endswith((".yaml", ".yml")) or filename.endswith(("_test.yaml", "_test.yml")):
+                    continue
+                with open(os.path.join(root, filename)) as fh:
+                    for doc in yaml.safe_load_all(fh):
+                        if not isinstance(doc, dict) or not str(doc.get("apiVersion", "")).startswith("api.cerbos.dev"):
+                            continue
+                        if "derivedRoles" in doc:
+                            definitions = doc["derivedRoles"].get("definitions", [])
+                            derived_role_defs[doc["derivedRoles"]["name"]] = {
+                                item["name"]: item for item in definitions
+                            }
+                        elif "resourcePolicy" in doc:
+                            resource_policies.append(doc["resourcePolicy"])
+                        elif "principalPolicy" in doc:
+                            self.has_principal_policies = True
+
+        for policy in resource_policies:
+            kind = policy["resource"]
+            if policy.get("version", DEFAULT_POLICY_VERSION) != DEFAULT_POLICY_VERSION:
+                continue
+            try:
+                self.rules[kind] = self._compile_resource_policy(policy, derived_role_defs)
+            except (UnsupportedPolicyError, KeyError) as e:
+                logger.info("Policies for %s will be evaluated by Cerbos: %s", kind, e)
+                self.unsupported_kinds.add(kind)
+
+    def _compile_resource_policy(
+        self,
+        policy: dict[str, Any],
+        derived_role_defs: dict[str, dict[str, dict[str, Any]]],
+    ) -> list[Rule]:
+        if policy.get("scope") or policy.get("variables") or policy.get("constants"):
+            raise UnsupportedPolicyError("scopes, variables and constants aren't supported")
+        derived_roles: dict[str, DerivedRole] = {}
+        for import_name in policy.get("importDerivedRoles", []):
+            for name, definition in derived_role_defs[import_name].items():
+                if definition.get("variables") or definition.get("constants"):
+                    raise UnsupportedPolicyError("variables and constants aren't supported")
+                derived_roles[name] = DerivedRole(
+                    parent_roles=set(definition["parentRoles"]),
+                    condition=compile_condition(definition.get("condition")),
+                )
+        rules = []
+        for rule in policy.get("rules", []):
+            actions = set(rule["actions"])
+            if any("*" in action and action != "*" for action in actions):
+                raise UnsupportedPolicyError("partial action wildcards aren't supported")
+            rules.append(
+                Rule(
+                    actions=actions,
+                    allow=rule["effect"] == "EFFECT_ALLOW",
+                    roles=set(rule.get("roles", [])),
+                    derived_roles=[derived_roles[name] for name in rule.get("derivedRoles", [])],
+                    condition=compile_condition(rule.get("condition")),
+                ),
+            )
+        return rules
+
+    def _get_rules(self, principal: Principal, resource_kind: str) -> Optional[list[Rule]]:
+        if self.has_principal_policies or resource_kind in self.unsupported_kinds:
+            return None
+        if (principal.policy_version or DEFAULT_POLICY_VERSION) != DEFAULT_POLICY_VERSION or principal.scope:
+            return None
+        return self.rules.get(resource_kind)
+
+    def plan_resources(self, action: str, principal: Principal, resource_kind: str) -> Optional[PlanResourcesResponse]:
+        """
+        Returns a query plan equivalent to Cerbos' PlanResources API, or None if the policies
+        for this resource kind can't be evaluated locally.
+        """
+        rules = self._get_rules(principal, resource_kind)
+        if rules is None:
+            return None
+        action = _action_name(action)
+        allow_conditions = []
+        deny_conditions = []
+        for rule in rules:
+            if not rule.matches_action(action):
+                continue
+            if rule.allow:
+                allow_conditions.append(rule.plan(principal))
+            else:
+                deny_conditions.append(rule.plan(principal))
+        condition = _and([_or(allow_conditions), _not(_or(deny_conditions))])
+        if condition is True:
+            plan_filter = PlanResourcesFilter(kind=PlanResourcesFilterKind.ALWAYS_ALLOWED)
+        elif condition is False:
+            plan_filter = PlanResourcesFilter(kind=PlanResourcesFilterKind.ALWAYS_DENIED)
+        else:
+            plan_filter = PlanResourcesFilter(
+                kind=PlanResourcesFilterKind.CONDITIONAL,
+                condition=PlanResourcesExpression.from_dict({"expression": condition}),
+            )
+        return PlanResourcesResponse(
+            request_id="local",
+            action=action,
+            resource_kind=resource_kind,
+            policy_version=DEFAULT_POLICY_VERSION,
+            filter=plan_filter,
+        )
+
+    def is_allowed(self, action: str, principal: Principal, resource: Resource) -> Optional[bool]:
+        """
+        Returns whether the principal can perform the action on the resource, or None if the
+        policies for this resource kind can't be evaluated locally.
+        """
+        rules = self._get_rules(principal, resource.kind)
+        if rules is None:
+            return None
+        action = _action_name(action)
+        matching_rules = [rule for rule in rules if rule.matches_action(action)]
+        if any(not rule.allow and rule.evaluate(principal, resource) for rule in matching_rules):
+            return False
+        return any(rule.allow and rule.evaluate(principal, resource) for rule in matching_rules)
@@ -0,0 +1,31 @@
+"""
+Tests for running token decryption in an executor
+"""
+
+import pytest
+from jwcrypto import jwk
+
+from platformics.security.auth_executor import AuthExecutor
+from platformics.security.authorization import hydrate_auth_principal
+from platformics.security.token_auth import create_token
+from platformics.settings import APISettings
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_type", ["thread", "process"])
+async def test_hydrate_in_executor(executor_type: str) -> None:
+    private_key = jwk.JWK.generate(kty="EC", crv="P-384")
+    settings = APISettings.model_construct(AUTH_EXECUTOR=executor_type, AUTH_EXECUTOR_WORKERS=2)
+    settings.__dict__["JWK_PRIVATE_KEY"] = private_key  # cached_property
+    executor = AuthExecutor(settings)
+    token = create_token(private_key, userid=111, project_claims={"owner": [1, 2]}, service_identity="")
+    try:
+        principal = await hydrate_auth_principal(settings, token, auth_executor=executor)
+        assert principal is not None
+        assert principal.attr["owner_projects"] == [1, 2]
+        assert await hydrate_auth_principal(settings, "not a token", auth_executor=executor) is None
+    finally:
+        executor.shutdown()
+    assert executor.stats.completed == 2
+    assert executor.stats.in_flight == 0
+    assert executor.stats.avg_run_seconds > 0
@@ -0,0 +1,118 @@
+"""
+Tests for the cache of SQL filters built from Cerbos query plans, and for evaluating plans in Python
+"""
+
+import typing
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+import platformics.database.models as db
+from platformics.security.authorization import FilterCache, evaluate_condition
+from platformics.settings import APISettings
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Sample(Base):
+    __tablename__ = "sample"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    collection_id: Mapped[int]
+    owner_user_id: Mapped[int]
+
+
+# Filters work with any mapped class, not just the models of platformics' Base
+SampleModel = typing.cast(type[db.Base], Sample)
+
+
+def make_condition(project_ids: list[int], user_id: int) -> dict:
+    return {
+        "expression": {
+            "operator": "or",
+            "operands": [
+                {
+                    "expression": {
+                        "operator": "in",
+                        "operands": [{"variable": "request.resource.attr.collection_id"}, {"value": project_ids}],
+                    },
+                },
+                {
+                    "expression": {
+                        "operator": "eq",
+                        "operands": [{"value": user_id}, {"variable": "request.resource.attr.owner_user_id"}],
+                    },
+                },
+            ],
+        },
+    }
+
+
+def test_filters_are_reused_with_new_values() -> None:
+    cache = FilterCache(APISettings.model_construct(CERBOS_FILTER_CACHE_SIZE=10))
+    first = cache.get_filter(make_condition([1, 2], 111), SampleModel)
+    second = cache.get_filter(make_condition([3], 222), SampleModel)
+    assert cache.stats.misses == 1
+    assert cache.stats.hits == 1
+
+    query = select(Sample).where(first).where(second).compile(dialect=postgresql.dialect())
+    # Each copy of the filter gets its own bind parameters
+    assert sorted(query.params.values(), key=str) == sorted([[1, 2], 111, [3], 222], key=str)
+
+
+def test_lists_are_bound_as_one_array() -> None:
+    cache = FilterCache(APISettings.model_construct(CERBOS_FILTER_CACHE_SIZE=10))
+    statements = [
+        str(
+            select(Sample)
+            .where(cache.get_filter(make_condition(project_ids, 111), SampleModel))
+            .compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True}),
+        )
+        for project_ids in ([1], [1, 2, 3])
+    ]
+    # The statement text doesn't depend on the number of values
+    assert statements[0] == statements[1]
+    assert "= ANY (" in statements[0]
+
+
+def test_conditions_are_evaluated_like_filters() -> None:
+    condition = make_condition([1, 2], 111)
+    assert evaluate_condition(condition, {"collection_id": 2, "owner_user_id": 222}) is True
+    assert evaluate_condition(condition, {"collection_id": 3, "owner_user_id": 111}) is True
+    assert evaluate_condition(condition, {"collection_id": 3, "owner_user_id": 222}) is False
+    # Comparisons with NULL are unknown, like in SQL
+    assert evaluate_condition(condition, {"collection_id": None, "owner_user_id": 222}) is None
+    assert evaluate_condition(condition, {"collection_id": None, "owner_user_id": 111}) is True
+    # Values that the database would cast can't be compared in Python
+    with pytest.raises(ValueError):
+        evaluate_condition(condition, {"collection_id": "3", "owner_user_id": 222})
+    # The order of strings depends on the database's collation
+    ordered = {
+        "expression": {
+            "operator": "lt",
+            "operands": [{"variable": "request.resource.attr.name"}, {"value": "b"}],
+        },
+    }
+    with pytest.raises(ValueError):
+        evaluate_condition(ordered, {"name": "a"})
+
+
+def test_null_comparisons_match_the_plan_translator() -> None:
+    cache = FilterCache(APISettings.model_construct(CERBOS_FILTER_CACHE_SIZE=10))
+
+    def get_statement(value: typing.Optional[int]) -> str:
+        condition = {
+            "expression": {
+                "operator": "ne",
+                "operands": [{"variable": "request.resource.attr.owner_user_id"}, {"value": value}],
+            },
+        }
+        return str(select(Sample).where(cache.get_filter(condition, SampleModel)))
+
+    assert "sample.owner_user_id IS NOT NULL" in get_statement(None)
+    # ... and don't share a filter with comparisons of non-NULL values
+    assert "sample.owner_user_id != " in get_statement(111)
+    assert cache.stats.misses == 2
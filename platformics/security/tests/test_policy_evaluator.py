@@ -0,0 +1,146 @@
+"""
+Tests for the in-process Cerbos policy evaluator
+"""
+
+import pathlib
+
+import pytest
+from cerbos.sdk.model import PlanResourcesFilterKind, Principal, Resource
+
+from platformics.security.policy_evaluator import LocalPolicyEvaluator
+
+DERIVED_ROLES = """
+apiVersion: "api.cerbos.dev/v1"
+derivedRoles:
+  name: common_roles
+  definitions:
+    - name: owner
+      parentRoles: ["user"]
+      condition:
+        match:
+          expr: request.resource.attr.owner_user_id == request.principal.attr.user_id
+
+    - name: project_member
+      parentRoles: ["user"]
+      condition:
+        match:
+          any:
+            of:
+              - expr: request.resource.attr.collection_id in request.principal.attr.member_projects
+              - expr: request.resource.attr.collection_id in request.principal.attr.owner_projects
+
+    - name: project_viewer
+      parentRoles: ["user"]
+      condition:
+        match:
+          any:
+            of:
+              - expr: request.resource.attr.collection_id in request.principal.attr.viewer_projects
+"""
+
+SAMPLE_POLICY = """
+apiVersion: api.cerbos.dev/v1
+resourcePolicy:
+  version: "default"
+  importDerivedRoles:
+    - common_roles
+  resource: "sample"
+  rules:
+    - actions: ['view']
+      effect: EFFECT_ALLOW
+      derivedRoles:
+        - project_viewer
+
+    - actions: ['view', 'create', 'update']
+      effect: EFFECT_ALLOW
+      derivedRoles:
+        - project_member
+
+    - actions: ['download', 'delete']
+      effect: EFFECT_ALLOW
+      derivedRoles:
+        - owner
+"""
+
+UNSUPPORTED_POLICY = """
+apiVersion: api.cerbos.dev/v1
+resourcePolicy:
+  version: "default"
+  resource: "file"
+  rules:
+    - actions: ['view']
+      effect: EFFECT_ALLOW
+      roles: ["user"]
+      condition:
+        match:
+          expr: request.resource.attr.name.startsWith("public")
+"""
+
+
+@pytest.fixture
+def evaluator(tmp_path: pathlib.Path) -> LocalPolicyEvaluator:
+    (tmp_path / "derived_roles_common.yaml").write_text(DERIVED_ROLES)
+    (tmp_path / "sample.yaml").write_text(SAMPLE_POLICY)
+    (tmp_path / "file.yaml").write_text(UNSUPPORTED_POLICY)
+    return LocalPolicyEvaluator(str(tmp_path))
+
+
+def make_principal(member_projects: list[int], viewer_projects: list[int]) -> Principal:
+    return Principal(
+        "111",
+        roles=["user"],
+        attr={
+            "user_id": 111,
+            "owner_projects": [],
+            "member_projects": member_projects,
+            "viewer_projects": viewer_projects,
+        },
+    )
+
+
+def test_conditional_plan(evaluator: LocalPolicyEvaluator) -> None:
+    plan = evaluator.plan_resources("view", make_principal([1, 2], [3]), "sample")
+    assert plan is not None
+    assert plan.filter.kind == PlanResourcesFilterKind.CONDITIONAL
+    # Empty project lists are pruned from the plan
+    assert plan.filter.condition.to_dict() == {
+        "expression": {
+            "operator": "or",
+            "operands": [
+                {
+                    "expression": {
+                        "operator": "in",
+                        "operands": [{"variable": "request.resource.attr.collection_id"}, {"value": [3]}],
+                    },
+                },
+                {
+                    "expression": {
+                        "operator": "in",
+                        "operands": [{"variable": "request.resource.attr.collection_id"}, {"value": [1, 2]}],
+                    },
+                },
+            ],
+        },
+    }
+
+
+def test_always_denied_plan(evaluator: LocalPolicyEvaluator) -> None:
+    plan = evaluator.plan_resources("update", make_principal([], [3]), "sample")
+    assert plan is not None
+    assert plan.filter.kind == PlanResourcesFilterKind.ALWAYS_DENIED
+
+
+def test_is_allowed(evaluator: LocalPolicyEvaluator) -> None:
+    principal = make_principal([1], [3])
+    sample = Resource(id="NEW_ID", kind="sample", attr={"collection_id": 3, "owner_user_id": 111})
+    assert evaluator.is_allowed("view", principal, sample)
+    assert not evaluator.is_allowed("create", principal, sample)
+    assert evaluator.is_allowed("delete", principal, sample)
+
+
+def test_unsupported_policies_fall_back(evaluator: LocalPolicyEvaluator) -> None:
+    principal = make_principal([1], [3])
+    assert evaluator.plan_resources("view", principal, "file") is None
+    assert evaluator.is_allowed("view", principal, Resource(id="1", kind="file", attr={"name": "x"})) is None
+    # Unknown resource kinds are also left to Cerbos
+    assert evaluator.plan_resources("view", principal, "contig") is None
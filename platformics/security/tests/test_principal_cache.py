@@ -0,0 +1,33 @@
+"""
+Tests for the cache of principals hydrated from bearer tokens
+"""
+
+from unittest import mock
+
+import pytest
+from jwcrypto import jwk
+
+from platformics.security import authorization
+from platformics.security.authorization import PrincipalCache, hydrate_auth_principal
+from platformics.security.token_auth import create_token
+from platformics.settings import APISettings
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_skips_decryption() -> None:
+    private_key = jwk.JWK.generate(kty="EC", crv="P-384")
+    settings = APISettings.model_construct(PRINCIPAL_CACHE_SIZE=10)
+    settings.__dict__["JWK_PRIVATE_KEY"] = private_key  # cached_property
+    cache = PrincipalCache(settings)
+    token = create_token(private_key, userid=111, project_claims={"member": [1]}, service_identity="")
+
+    with mock.patch.object(authorization, "get_token_claims", wraps=authorization.get_token_claims) as get_claims:
+        first = await hydrate_auth_principal(settings, token, cache)
+        second = await hydrate_auth_principal(settings, token, cache)
+        assert get_claims.call_count == 1
+    assert first is second
+    assert first is not None and first.attr["member_projects"] == [1]
+
+    # Tokens that failed to hydrate aren't cached
+    assert await hydrate_auth_principal(settings, "not a token", cache) is None
+    assert len(cache) == 1
@@ -1,4 +1,5 @@
 from functools import cached_property
+from typing import Any, Literal, Optional
 
 from jwcrypto import jwk
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -16,6 +17,16 @@ class Settings(BaseSettings):
     DB_DRIVER: str = "postgresql+asyncpg"
     DB_POOL_SIZE: int = 5
     DB_MAX_OVERFLOW: int = 0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_TIMEOUT: int = 30  # seconds
+    # Max number of DB connections a single GraphQL request can hold at once
+    DB_CONNECTIONS_PER_REQUEST: int = 2
+    # Max number of keys that a dataloader loads in one statement. Larger batches are split into chunks that
+    # run concurrently (up to DB_CONNECTIONS_PER_REQUEST at a time), so memory use stays bounded.
+    DATALOADER_MAX_BATCH_SIZE: Optional[int] = 1000
+    # Read rows for queries without the ORM, as lightweight records (see graphql_api/core/records.py)
+    DB_CORE_READS: bool = False
     DB_ECHO: bool = False
     DEBUG: bool = False
 
@@ -26,6 +37,9 @@ class Settings(BaseSettings):
 
     # Properties usually read from env vars
     PLATFORMICS_DATABASE_HOST: str
+    # Read replicas, as a JSON list of "host" or "host:port" entries. Replicas use the same
+    # credentials and database name as the primary.
+    PLATFORMICS_DATABASE_REPLICA_HOSTS: list[str] = []
     PLATFORMICS_DATABASE_PORT: str
     PLATFORMICS_DATABASE_USER: str
     PLATFORMICS_DATABASE_PASSWORD: str
@@ -34,18 +48,29 @@ class Settings(BaseSettings):
     ############################################################################
     # Computed properties
 
-    @cached_property
-    def DB_URI(self) -> str:  # noqa: N802
+    def _get_db_uri(self, db_host: str, db_port: str) -> str:
         db_uri = "{protocol}://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}".format(
             protocol=self.DB_DRIVER,
-            db_host=self.PLATFORMICS_DATABASE_HOST,
-            db_port=self.PLATFORMICS_DATABASE_PORT,
+            db_host=db_host,
+            db_port=db_port,
             db_user=self.PLATFORMICS_DATABASE_USER,
             db_pass=self.PLATFORMICS_DATABASE_PASSWORD,
             db_name=self.PLATFORMICS_DATABASE_NAME,
         )
         return db_uri
 
+    @cached_property
+    def DB_URI(self) -> str:  # noqa: N802
+        return self._get_db_uri(self.PLATFORMICS_DATABASE_HOST, self.PLATFORMICS_DATABASE_PORT)
+
+    @cached_property
+    def DB_REPLICA_URIS(self) -> list[str]:  # noqa: N802
+        uris = []
+        for replica in self.PLATFORMICS_DATABASE_REPLICA_HOSTS:
+            db_host, _, db_port = replica.partition(":")
+            uris.append(self._get_db_uri(db_host, db_port or self.PLATFORMICS_DATABASE_PORT))
+        return uris
+
     @cached_property
     def SYNC_DB_URI(self) -> str:  # noqa: N802
         db_uri = "postgresql+psycopg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}".format(
@@ -57,9 +82,59 @@ class Settings(BaseSettings):
         )
         return db_uri
 
+    @cached_property
+    def DB_ENGINE_OPTIONS(self) -> dict[str, Any]:  # noqa: N802
+        return {
+            "echo": self.DB_ECHO,
+            "pool_size": self.DB_POOL_SIZE,
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "pool_pre_ping": self.DB_POOL_PRE_PING,
+            "pool_recycle": self.DB_POOL_RECYCLE,
+            "pool_timeout": self.DB_POOL_TIMEOUT,
+        }
+
 
 class APISettings(Settings):
     CERBOS_URL: str
+    # Cache of Cerbos query plans. Set the size to 0 to disable it.
+    CERBOS_PLAN_CACHE_SIZE: int = 4096
+    CERBOS_PLAN_CACHE_TTL: float = 30  # seconds
+    CERBOS_PLAN_CACHE_STALE_TTL: float = 30  # seconds
+    # Actions whose policies only depend on the principal's roles and project attributes (and not on
+    # *who* the principal is), so their plans can be shared by principals with the same project roles.
+    # Opt-in: only list actions that no rule (or derived role like `owner`) grants on principal.attr.user_id.
+    CERBOS_PLAN_CACHE_SHARED_ACTIONS: list[str] = []
+    # Cache of the SQL filters that query plans translate into. Set the size to 0 to disable it.
+    CERBOS_FILTER_CACHE_SIZE: int = 1024
+    # Cache of the statements that queries with the same where / orderBy shapes are built into. Set the size
+    # to 0 to disable it.
+    DB_STATEMENT_CACHE_SIZE: int = 1024
+    # Cache of rows for primary key lookups (e.g. node queries and many-to-one relationships), shared by all
+    # requests and re-authorized for each of them (see graphql_api/core/entity_cache.py). Set the size to 0
+    # to disable it.
+    ENTITY_CACHE_SIZE: int = 0
+    ENTITY_CACHE_TTL: float = 60  # seconds
+    # Cache of the results of top-level list and aggregate queries, for the models that declare a
+    # `result_cache_ttl` annotation (see graphql_api/core/result_cache.py). Requires DB_TABLE_VERSIONS, which
+    # invalidates it. Set the size to 0 to disable it.
+    RESULT_CACHE_SIZE: int = 0
+    # Share the results of identical reads that run concurrently (e.g. the same query sent by many users of a
+    # project at once) instead of executing each of them (see support/singleflight.py)
+    DB_COALESCE_READS: bool = False
+    # Keep a write version per table, bumped by the generated mutations and broadcast to all workers with
+    # Postgres NOTIFY (see database/table_versions.py)
+    DB_TABLE_VERSIONS: bool = False
+    DB_TABLE_VERSIONS_RECONNECT_DELAY: float = 1  # seconds
+    # Directory with the same policies Cerbos is configured with. When set, policies that only use simple
+    # (derived) role conditions are evaluated in-process, and everything else is still sent to Cerbos. The
+    # policies are only read at startup, so restart the API whenever the policies Cerbos serves change.
+    CERBOS_LOCAL_POLICY_DIR: Optional[str] = None
+    # Cache of the principals hydrated from bearer tokens. Set the size to 0 to disable it.
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    # Pool that decrypts and verifies bearer tokens off the event loop: "thread" or "process", with
+    # AUTH_EXECUTOR_WORKERS workers. Set the number of workers to 0 to decrypt tokens on the event loop.
+    AUTH_EXECUTOR: Literal["thread", "process"] = "thread"
+    AUTH_EXECUTOR_WORKERS: int = 4
     JWK_PUBLIC_KEY_FILE: str
     JWK_PRIVATE_KEY_FILE: str
 
@@ -0,0 +1,106 @@
+"""
+In-process caches for the API's hot paths.
+"""
+
+import threading
+import time
+import typing
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Hashable, Optional, Tuple
+
+K = typing.TypeVar("K", bound=Hashable)
+V = typing.TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.stale_hits + self.misses
+        if not lookups:
+            return 0.0
+        return (self.hits + self.stale_hits) / lookups
+
+
+class LRUCache(Generic[K, V]):
+    """
+    A bounded mapping that evicts its least recently used entries first.
+
+    Entries can expire after `ttl` seconds. Expired entries are kept around for another
+    `stale_ttl` seconds, during which `lookup` still returns them but flags them as stale,
+    so that callers can serve the stale value while they fetch a fresh one.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, stale_ttl: float = 0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict[K, Tuple[V, float]] = OrderedDict()
+        # Entries can be written from executor threads (e.g. background refreshes)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, key: K) -> Tuple[Optional[V], bool]:
+        """
+        Returns a (value, is_stale) tuple. The value is None on a cache miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None, False
+            value, expires_at = entry
+            if now >= expires_at + self.stale_ttl:
+                del self._entries[key]
+                self.stats.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if now >= expires_at:
+                self.stats.stale_hits += 1
+                return value, True
+            self.stats.hits += 1
+            return value, False
+
+    def get(self, key: K) -> Optional[V]:
+        """
+        Returns the cached value, or None if it is missing or expired (stale values included).
+        """
+        value, is_stale = self.lookup(key)
+        if is_stale:
+            return None
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        if ttl is None:
+            ttl = self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.stats.evictions += 1
+        return entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,91 @@
+"""
+Coalescing of concurrent calls that would do the same work.
+"""
+
+import asyncio
+import time
+import typing
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Hashable, Optional, Tuple
+
+T = typing.TypeVar("T")
+
+
+@dataclass
+class _Calls:
+    # Key -> (time.monotonic() when the call started, future of its result)
+    in_flight: dict[Hashable, Tuple[float, asyncio.Future]] = field(default_factory=dict)
+    coalesced: int = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time: calls made with the key of a call that's still in flight wait for
+    it and share its result (or its exception) instead of running themselves. Nothing is kept once a call is
+    done, so results are never staler than the call they come from. `coalesced` counts the shared calls.
+
+    A call that's in flight may have started before its callers did, e.g. before a write they've seen was
+    committed. Callers that need fresher results than that share calls through `since`.
+    """
+
+    def __init__(self) -> None:
+        self._calls = _Calls()
+        self._not_before: Optional[float] = None
+
+    @property
+    def coalesced(self) -> int:
+        return self._calls.coalesced
+
+    def __len__(self) -> int:
+        return len(self._calls.in_flight)
+
+    def since(self, started_at: float) -> "SingleFlight":
+        """
+        The same calls in flight, but only the ones that started at or after `started_at` (a time.monotonic()
+        value) are shared with the calls made through the returned SingleFlight
+        """
+        flights = SingleFlight()
+        flights._calls = self._calls
+        flights._not_before = started_at
+        return flights
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Returns the result of `fn`, or of the call in flight with the same key, and whether it was shared
+        """
+        while (call := self._calls.in_flight.get(key)) is not None:
+            started_at, future = call
+            if self._not_before is not None and started_at < self._not_before:
+                # Too old to share: make a call of our own, which later calls can share instead
+                break
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # We were cancelled ourselves
+                    raise
+                # The call we were waiting for was cancelled, so make (or wait for) another one
+                continue
+            self._calls.coalesced += 1
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        call = (time.monotonic(), future)
+        self._calls.in_flight[key] = call
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Don't log the exception as unretrieved if no other call was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            # A newer call may have taken over the key
+            if self._calls.in_flight.get(key) is call:
+                del self._calls.in_flight[key]
+        return result, False
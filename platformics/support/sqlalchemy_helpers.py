@@ -1,45 +1,175 @@
-from sqlalchemy import inspect
-from sqlalchemy.orm import ColumnProperty
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import BindParameter, all_, any_, bindparam, inspect
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import ColumnProperty, RelationshipProperty, configure_mappers
+from sqlalchemy.orm.exc import UnmappedColumnError
 from sqlalchemy_utils import get_primary_keys
 
 from platformics.database.models.base import Base
 
 
+@dataclass(frozen=True, eq=False)
+class ModelMetadata:
+    """
+    What the API needs to know about a model, introspected from its mapper once (see ModelRegistry). Metadata is
+    compared (and hashed) by identity, so it can key caches of what's derived from it.
+    """
+
+    model: Any
+    # (attribute name, attribute) of the model's primary key, or None if it doesn't have exactly one
+    primary_key: Optional[tuple[str, Any]]
+    # Non-relationship attributes of the model
+    columns: tuple[Any, ...]
+    # Names of the model's column attributes
+    column_keys: frozenset[str]
+    relationships: Mapping[str, RelationshipProperty]
+    # Names of the local columns that each relationship is joined on
+    local_keys: Mapping[str, tuple[str, ...]]
+    # Names of the columns that rows are identified and relationships are loaded with: the primary keys and
+    # the local join columns
+    key_column_keys: tuple[str, ...]
+
+    @classmethod
+    def from_model(cls, model_cls: Any) -> "ModelMetadata":
+        mapper = inspect(model_cls)
+        relationships = dict(mapper.relationships)
+        local_keys = {}
+        for name, relationship in relationships.items():
+            keys = []
+            for local, _ in relationship.local_remote_pairs:  # type: ignore
+                try:
+                    keys.append(mapper.get_property_by_column(local).key)
+                except UnmappedColumnError:
+                    # Not a column of this model (e.g. the remote side of a secondary join)
+                    continue
+            local_keys[name] = tuple(keys)
+        pks = get_primary_keys(model_cls)
+        # Only use the PK for the leaf table.
+        pks = {k: v for k, v in pks.items() if v.table.name == model_cls.__table__.name}
+        primary_key = None
+        if len(pks) == 1:
+            pk_name = next(iter(pks))
+            primary_key = (pk_name, getattr(model_cls, pk_name))
+
+        key_column_keys = []
+        for column in mapper.primary_key:
+            try:
+                key_column_keys.append(mapper.get_property_by_column(column).key)
+            except UnmappedColumnError:
+                continue
+        if primary_key:
+            key_column_keys.append(primary_key[0])
+        for relationship_keys in local_keys.values():
+            key_column_keys.extend(relationship_keys)
+        if "id" in mapper.column_attrs:
+            key_column_keys.append("id")
+
+        return cls(
+            model=model_cls,
+            primary_key=primary_key,
+            # Don't send related fields to cerbos for authz checks
+            columns=tuple(col for col in mapper.all_orm_descriptors if col.key not in relationships),
+            column_keys=frozenset(mapper.column_attrs.keys()),
+            relationships=MappingProxyType(relationships),
+            local_keys=MappingProxyType(local_keys),
+            key_column_keys=tuple(dict.fromkeys(key_column_keys)),
+        )
+
+
+class ModelRegistry:
+    """
+    Metadata of every model mapped by `Base`, looked up by class or by class name. Models don't change at
+    runtime, so this is built once at startup (see build_model_registry) rather than re-introspecting
+    mappers on every call.
+    """
+
+    def __init__(self, base: Any = Base) -> None:
+        configure_mappers()
+        models = [mapper.class_ for mapper in base.registry.mappers]
+        self._by_model: Mapping[Any, ModelMetadata] = MappingProxyType(
+            {model: ModelMetadata.from_model(model) for model in models},
+        )
+        self._by_name: Mapping[str, Any] = MappingProxyType({model.__name__: model for model in models})
+
+    def __contains__(self, model_cls: Any) -> bool:
+        return model_cls in self._by_model
+
+    def get(self, model_cls: Any) -> Optional[ModelMetadata]:
+        return self._by_model.get(model_cls)
+
+    def get_by_name(self, class_name: str) -> Optional[Any]:
+        return self._by_name.get(class_name)
+
+
+_model_registry: Optional[ModelRegistry] = None
+# Metadata of models that aren't mapped by `Base` (e.g. in tests), introspected the first time they're looked up
+_unregistered_metadata: dict[Any, ModelMetadata] = {}
+
+
+def build_model_registry() -> ModelRegistry:
+    """
+    (Re)build the model registry. Call this once every model has been imported.
+    """
+    global _model_registry
+    _model_registry = ModelRegistry()
+    return _model_registry
+
+
+def get_model_registry() -> ModelRegistry:
+    return _model_registry or build_model_registry()
+
+
+def get_model_metadata(model_cls: Any) -> ModelMetadata:
+    metadata = get_model_registry().get(model_cls)
+    if metadata is not None:
+        return metadata
+    if isinstance(model_cls, type) and issubclass(model_cls, Base):
+        raise Exception(f"{model_cls.__name__} was mapped after the model registry was built")
+    metadata = _unregistered_metadata.get(model_cls)
+    if metadata is None:
+        metadata = _unregistered_metadata[model_cls] = ModelMetadata.from_model(model_cls)
+    return metadata
+
+
 def model_class_cols(model_cls):
-    cols = []
-    relationships = model_cls.__mapper__.relationships
-    for col in model_cls.__mapper__.all_orm_descriptors:
-        # Don't send related fields to cerbos for authz checks
-        if col.key in relationships:
-            continue
-        cols.append(col)
-    return cols
+    return list(get_model_metadata(model_cls).columns)
 
 
 def get_primary_key(model) -> tuple[str, ColumnProperty]:
-    pks = get_primary_keys(model)
-    # Only use the PK for the leaf table.
-    pks = {k: v for k, v in pks.items() if v.table.name == model.__table__.name}
-    if len(pks) != 1:
+    primary_key = get_model_metadata(model).primary_key
+    if primary_key is None:
         raise Exception(f"Expected exactly one primary key for {model.__name__}")
-    for k, _ in pks.items():
-        return k, getattr(model, k)
-    raise Exception("PK definition missing")
+    return primary_key
 
 
 def get_relationship(cls, field):
-    mapper = inspect(cls)
-    relationship = mapper.relationships[field]
-    return relationship
+    return get_model_metadata(cls).relationships[field]
 
 
 # TODO FIXME THIS IS TOO OPEN. THIS SHOULD BE LOCKED DOWN TO ONLY ACCEPTABLE TYPES.
 def get_orm_class_by_name(class_name: str) -> Base:
-    for mapper in Base.registry.mappers:
-        cls = mapper.class_
-        if cls.__name__ == class_name:
-            # Don't allow abstract classes to be manipulated directly
-            # if cls.abstract:
-            #     continue
-            return cls
-    raise Exception("Invalid class name")
+    cls = get_model_registry().get_by_name(class_name)
+    if cls is None:
+        raise Exception("Invalid class name")
+    # Don't allow abstract classes to be manipulated directly
+    # if cls.abstract:
+    #     continue
+    return cls
+
+
+def in_array(column, values, negate: bool = False):
+    """
+    Compares a column with a list of values bound as a single Postgres array (`column = ANY(:values)`), rather
+    than with one bind parameter per value (`column IN (:v1, :v2, ...)`), so the statement text doesn't depend
+    on the number of values. `values` can also be a bind parameter that the list is bound to later.
+    """
+    if isinstance(values, BindParameter):
+        values = bindparam(values.key, values.value, type_=ARRAY(column.type), required=values.required)
+    else:
+        values = bindparam(None, list(values), type_=ARRAY(column.type))
+    if negate:
+        return column != all_(values)
+    return column == any_(values)
@@ -0,0 +1,47 @@
+"""
+Tests for the in-process LRU/TTL cache
+"""
+
+import time
+
+from platformics.support.cache import LRUCache
+
+
+def test_lru_eviction() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now the most recently used entry
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_ttl_and_stale_entries() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=10, ttl=0.05, stale_ttl=0.05)
+    cache.set("a", 1)
+    assert cache.lookup("a") == (1, False)
+    time.sleep(0.06)
+    # Expired entries are still returned during the stale window, but flagged as stale
+    assert cache.lookup("a") == (1, True)
+    assert cache.get("a") is None
+    time.sleep(0.05)
+    assert cache.lookup("a") == (None, False)
+
+
+def test_stats() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=10)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.hit_rate == 0.5
+
+
+def test_disabled_cache() -> None:
+    cache: LRUCache[str, int] = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -0,0 +1,85 @@
+"""
+Tests for coalescing concurrent calls
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from platformics.support.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced() -> None:
+    flights = SingleFlight()
+    calls = []
+
+    async def fn(value: int) -> int:
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value
+
+    results = await asyncio.gather(
+        flights.do("a", lambda: fn(1)),
+        flights.do("a", lambda: fn(2)),
+        flights.do("b", lambda: fn(3)),
+    )
+    assert results == [(1, False), (1, True), (3, False)]
+    assert calls == [1, 3]
+    assert flights.coalesced == 1
+    assert len(flights) == 0
+
+    # Calls that are done aren't shared
+    assert await flights.do("a", lambda: fn(4)) == (4, False)
+
+
+@pytest.mark.asyncio
+async def test_exceptions_are_shared() -> None:
+    flights = SingleFlight()
+
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(flights.do("a", fail), flights.do("a", fail), return_exceptions=True)
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_calls_are_retried_by_waiters() -> None:
+    flights = SingleFlight()
+
+    async def fn(value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    leader = asyncio.create_task(flights.do("a", lambda: fn(1)))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flights.do("a", lambda: fn(2)))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == (2, False)
+
+
+@pytest.mark.asyncio
+async def test_calls_from_before_are_not_shared() -> None:
+    flights = SingleFlight()
+
+    async def fn(value: int) -> int:
+        await asyncio.sleep(0.01)
+        return value
+
+    old_call = asyncio.create_task(flights.do("a", lambda: fn(1)))
+    await asyncio.sleep(0)
+    # e.g. a request that started after the old call, which may not see the writes it has seen
+    request_flights = flights.since(time.monotonic())
+    results = await asyncio.gather(
+        request_flights.do("a", lambda: fn(2)),
+        request_flights.do("a", lambda: fn(3)),
+        flights.do("a", lambda: fn(4)),
+    )
+    assert await old_call == (1, False)
+    assert results == [(2, False), (2, True), (2, True)]
+    assert flights.coalesced == 2
+    assert len(flights) == 0
@@ -0,0 +1,49 @@
+"""
+Tests for the model metadata that SQLAlchemy helpers look up instead of introspecting mappers
+"""
+
+from typing import Optional
+
+from sqlalchemy import ForeignKey
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from platformics.support import sqlalchemy_helpers
+from platformics.support.sqlalchemy_helpers import ModelMetadata
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Run(Base):
+    __tablename__ = "run"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    samples: Mapped[list["Sample"]] = relationship("Sample", back_populates="run")
+
+
+class Sample(Base):
+    __tablename__ = "sample"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    run_id: Mapped[Optional[int]] = mapped_column(ForeignKey("run.id"))
+    run: Mapped[Optional[Run]] = relationship(Run, back_populates="samples")
+
+
+def test_model_metadata() -> None:
+    metadata = ModelMetadata.from_model(Sample)
+    assert metadata.primary_key == ("id", Sample.id)
+    assert {col.key for col in metadata.columns} == {"id", "name", "run_id"}
+    assert metadata.column_keys == {"id", "name", "run_id"}
+    assert metadata.relationships["run"] is Sample.run.property
+    assert metadata.local_keys == {"run": ("run_id",)}
+    assert metadata.key_column_keys == ("id", "run_id")
+    assert ModelMetadata.from_model(Run).local_keys == {"samples": ("id",)}
+
+
+def test_helpers_support_unregistered_models() -> None:
+    # Models that aren't mapped by platformics' Base aren't in the registry, but helpers still work with them
+    assert Sample not in sqlalchemy_helpers.get_model_registry()
+    assert sqlalchemy_helpers.get_primary_key(Sample) == ("id", Sample.id)
+    assert sqlalchemy_helpers.get_relationship(Run, "samples") is Run.samples.property
+    # ... and are only introspected once
+    assert sqlalchemy_helpers.get_model_metadata(Sample) is sqlalchemy_helpers.get_model_metadata(Sample)
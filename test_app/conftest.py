@@ -7,6 +7,7 @@ import os
 import typing
 from typing import Optional
 from platformics.graphql_api.core.error_handler import HandleErrors
+from platformics.graphql_api.core.query_compiler import CompiledQueryExtension, compiled
 
 import pytest
 import pytest_asyncio
@@ -191,7 +192,13 @@ async def api_test_schema(async_db: AsyncDB) -> FastAPI:
     """
     settings = APISettings.model_validate({})  # Workaround for https://github.com/pydantic/pydantic/issues/3753
     strawberry_config = get_strawberry_config()
-    schema = strawberry.Schema(query=Query, mutation=Mutation, config=strawberry_config, extensions=[HandleErrors()])
+    schema = strawberry.Schema(
+        query=Query,
+        mutation=Mutation,
+        config=strawberry_config,
+        directives=[compiled],
+        extensions=[HandleErrors(), CompiledQueryExtension],
+    )
     api = get_app(settings, schema)
     overwrite_api(api, async_db)
     return api
@@ -6,13 +6,20 @@ import strawberry
 import uvicorn
 from platformics.graphql_api.setup import get_app, get_strawberry_config
 from platformics.graphql_api.core.error_handler import HandleErrors
+from platformics.graphql_api.core.query_compiler import CompiledQueryExtension, compiled
 from platformics.settings import APISettings
 
 from graphql_api.mutations import Mutation
 from graphql_api.queries import Query
 
 settings = APISettings.model_validate({})  # Workaround for https://github.com/pydantic/pydantic/issues/3753
-schema = strawberry.Schema(query=Query, mutation=Mutation, config=get_strawberry_config(), extensions=[HandleErrors()])
+schema = strawberry.Schema(
+    query=Query,
+    mutation=Mutation,
+    config=get_strawberry_config(),
+    directives=[compiled],
+    extensions=[HandleErrors(), CompiledQueryExtension],
+)
 
 
 # Create and run app
@@ -1,3 +1,4 @@
+import asyncio
 import operator
 
 
@@ -33,3 +34,15 @@ def deep_eq(_v1, _v2):
                 op = _deep_iter_eq
 
     return op(c1, c2)
+
+
+async def wait_for(condition, timeout: float = 5) -> None:
+    """
+    Wait until a condition is true, e.g. until a notification has been received
+    """
+
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout)
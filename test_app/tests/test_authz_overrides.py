@@ -3,17 +3,17 @@ Test that our principal-generation and authz client functionality can be overrid
 """
 
 import datetime
+import typing
 import pytest
+import pytest_asyncio
 import sqlalchemy as sa
 from platformics.database.connect import SyncDB
 from platformics.security.authorization import AuthzClient
-from platformics.graphql_api.core.deps import get_settings, get_authz_client
-from fastapi import Depends
+from platformics.graphql_api.core.deps import get_authz_client
 from conftest import GQLTestClient, SessionStorage
 from test_infra.factories.sample import SampleFactory
 from fastapi import FastAPI
 from platformics.security.authorization import Principal
-from platformics.settings import APISettings
 from platformics.graphql_api.core.deps import (
     get_auth_principal,
 )
@@ -97,13 +97,17 @@ async def test_principal_override(
 
 
 class CustomAuthzClient(AuthzClient):
-    def get_resource_query(self, principal, action, model_cls, relationship):
+    async def get_resource_query(self, principal, action, model_cls, relationship):
         query = sa.select(model_cls).where(model_cls.name.in_(["apple", "asparagus"]))
         return query
 
 
-def custom_authz_client(settings: APISettings = Depends(get_settings)) -> AuthzClient:
-    return AuthzClient(settings=settings)
+@pytest_asyncio.fixture()
+async def custom_authz_client(api_test_schema: FastAPI) -> typing.AsyncGenerator[AuthzClient, None]:
+    # AuthzClient instances are meant to be shared by all requests, so only create one
+    authz_client = AuthzClient(settings=api_test_schema.state.settings)
+    yield authz_client
+    await authz_client.close()
 
 
 @pytest.mark.asyncio
@@ -111,6 +115,7 @@ async def test_authz_client_override(
     api_test_schema: FastAPI,
     sync_db: SyncDB,
     gql_client: GQLTestClient,
+    custom_authz_client: AuthzClient,
 ) -> None:
     """
     Test that we can override the way auth principals get generated. Our tests
@@ -119,7 +124,7 @@ async def test_authz_client_override(
     interface.
     """
 
-    api_test_schema.dependency_overrides[get_authz_client] = custom_authz_client
+    api_test_schema.dependency_overrides[get_authz_client] = lambda: custom_authz_client
 
     user_id = 12345
     secondary_user_id = 67890
@@ -0,0 +1,97 @@
+"""
+Tests for sharing identical reads that run concurrently (DB_COALESCE_READS)
+"""
+
+import asyncio
+
+import database.models as db
+import pytest
+from fastapi import FastAPI
+from platformics.database.connect import AsyncDB, SyncDB
+from platformics.graphql_api.core.query_builder import get_aggregate_db_rows, get_db_rows
+from platformics.graphql_api.core.query_input_types import orderBy
+from platformics.security.authorization import Principal
+from platformics.support.singleflight import SingleFlight
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from strawberry.types.nodes import SelectedField
+from conftest import SessionStorage
+from test_infra.factories.sample import SampleFactory
+
+
+def make_principal(user_id: int, member_projects: list[int]) -> Principal:
+    return Principal(
+        str(user_id),
+        roles=["user"],
+        attr={"user_id": user_id, "member_projects": member_projects, "owner_projects": [], "viewer_projects": []},
+    )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_are_coalesced(
+    sync_db: SyncDB,
+    async_db: AsyncDB,
+    api_test_schema: FastAPI,
+) -> None:
+    """
+    Concurrent reads of the same rows by principals with the same permissions share one statement
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        SampleFactory.create_batch(3, owner_user_id=111, collection_id=888)
+        SampleFactory.create_batch(2, owner_user_id=222, collection_id=999)
+        session.commit()
+
+    authz_client = api_test_schema.state.authz_client
+    flights = SingleFlight()
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    principals = [make_principal(333, [888]), make_principal(444, [888]), make_principal(222, [999])]
+    sessions = [async_db.session() for _ in principals]
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        results = await asyncio.gather(
+            *[
+                get_db_rows(
+                    db.Sample,
+                    async_session,
+                    authz_client,
+                    principal,
+                    {},
+                    [{"name": orderBy.asc}],
+                    flights=flights,
+                )
+                for async_session, principal in zip(sessions, principals)
+            ],
+        )
+        assert [len(rows) for rows in results] == [3, 3, 2]
+        assert len(statements) == 2
+        assert flights.coalesced == 1
+        # Shared rows are copied into the session of each read
+        for async_session, rows in zip(sessions, results):
+            assert all(row in async_session for row in rows)
+        assert [row.id for row in results[0]] == [row.id for row in results[1]]
+
+        aggregate_results = await asyncio.gather(
+            *[
+                get_aggregate_db_rows(
+                    db.Sample,
+                    async_session,
+                    authz_client,
+                    principal,
+                    {},
+                    [SelectedField(name="count", directives={}, arguments={}, selections=[])],
+                    flights=flights,
+                )
+                for async_session, principal in zip(sessions, principals)
+            ],
+        )
+        assert [rows[0]["count"] for rows in aggregate_results] == [3, 3, 2]
+        assert flights.coalesced == 2
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+        for async_session in sessions:
+            await async_session.close()
@@ -0,0 +1,133 @@
+"""
+Tests for queries compiled into a single SQL statement (@compiled)
+"""
+
+import pytest
+from platformics.graphql_api.core import graphql_internals
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from platformics.database.connect import SyncDB
+from conftest import GQLTestClient, SessionStorage
+from test_infra.factories.sample import SampleFactory
+from test_infra.factories.sequencing_read import SequencingReadFactory
+
+
+async def query_with_statements(gql_client: GQLTestClient, query: str) -> tuple[dict, list[str]]:
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        results = await gql_client.query(query, user_id=111, member_projects=[888])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+    return results, statements
+
+
+@pytest.mark.asyncio
+async def test_compiled_query(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Compiled queries return the same results as the regular resolvers, in a single statement
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        samples = SampleFactory.create_batch(3, owner_user_id=111, collection_id=888)
+        SampleFactory.create_batch(2, owner_user_id=222, collection_id=999)
+        for sample in samples:
+            SequencingReadFactory.create_batch(3, sample=sample, owner_user_id=111, collection_id=888)
+            # Reads that the user can't see
+            SequencingReadFactory.create_batch(2, sample=sample, owner_user_id=222, collection_id=999)
+        session.commit()
+
+    query = """
+        query MyQuery%s {
+          samples(orderBy: {name: desc}, limitOffset: {limit: 2}) {
+            __typename
+            _id
+            id
+            collectionDate
+            ...SampleFields
+            reads: sequencingReads(where: {protocol: {_neq: MSSPE}}, orderBy: {nucleicAcid: asc}) {
+              edges {
+                node {
+                  id
+                  nucleicAcid
+                  sample { name }
+                }
+              }
+            }
+          }
+        }
+
+        fragment SampleFields on Sample {
+          name
+          waterControl
+        }
+    """
+    expected, _ = await query_with_statements(gql_client, query % "")
+    results, statements = await query_with_statements(gql_client, query % " @compiled")
+    assert results == expected
+    assert len(statements) == 1
+    assert len(results["data"]["samples"]) == 2
+    assert all(len(sample["reads"]["edges"]) <= 3 for sample in results["data"]["samples"])
+
+
+@pytest.mark.asyncio
+async def test_compiled_query_fallback(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Compiled queries that select unsupported fields are executed by the regular resolvers
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        samples = SampleFactory.create_batch(2, owner_user_id=111, collection_id=888)
+        for sample in samples:
+            SequencingReadFactory.create_batch(2, sample=sample, owner_user_id=111, collection_id=888)
+        session.commit()
+
+    query = """
+        query MyQuery @compiled {
+          samples {
+            name
+            sequencingReadsAggregate { aggregate { count } }
+          }
+        }
+    """
+    results, statements = await query_with_statements(gql_client, query)
+    assert "errors" not in results
+    assert len(results["data"]["samples"]) == 2
+    assert len(statements) > 1
+
+
+@pytest.mark.asyncio
+async def test_compiled_query_unsupported_versions(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Compiled queries are executed by the regular resolvers with versions of Strawberry / graphql-core that the
+    compiler doesn't support
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        SampleFactory.create_batch(2, owner_user_id=111, collection_id=888)
+        session.commit()
+
+    monkeypatch.setitem(graphql_internals.SUPPORTED_VERSIONS, "graphql-core", ("0.",))
+    graphql_internals.is_supported.cache_clear()
+    try:
+        results, statements = await query_with_statements(gql_client, "query MyQuery @compiled { samples { name } }")
+    finally:
+        monkeypatch.undo()
+        graphql_internals.is_supported.cache_clear()
+    assert len(results["data"]["samples"]) == 2
+    # The regular resolvers read rows, rather than building the response in SQL
+    assert not any("json_build_object" in statement for statement in statements)
@@ -0,0 +1,75 @@
+"""
+Tests for reading rows without the ORM (DB_CORE_READS)
+"""
+
+import pytest
+from fastapi import FastAPI
+from platformics.database.connect import SyncDB
+from conftest import GQLTestClient, SessionStorage
+from test_infra.factories.sample import SampleFactory
+from test_infra.factories.sequencing_read import SequencingReadFactory
+
+
+@pytest.mark.asyncio
+async def test_core_reads(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+    api_test_schema: FastAPI,
+) -> None:
+    """
+    Core reads return the same results as ORM reads
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        samples = SampleFactory.create_batch(3, owner_user_id=111, collection_id=888)
+        for sample in samples:
+            SequencingReadFactory.create_batch(2, sample=sample, owner_user_id=111, collection_id=888)
+            # Reads that the user can't see
+            SequencingReadFactory.create_batch(1, sample=sample, owner_user_id=222, collection_id=999)
+        session.commit()
+
+    query = """
+        query MyQuery {
+          samples(orderBy: {name: asc}, limitOffset: {limit: 2}) {
+            __typename
+            _id
+            _cursor
+            name
+            collectionDate
+            sequencingReads(orderBy: {nucleicAcid: asc}) {
+              edges {
+                node {
+                  id
+                  nucleicAcid
+                  sample { name }
+                }
+              }
+            }
+          }
+          sequencingReads {
+            id
+            sample { id }
+          }
+        }
+    """
+    expected = await gql_client.query(query, user_id=111, member_projects=[888])
+    api_test_schema.state.settings.DB_CORE_READS = True
+    results = await gql_client.query(query, user_id=111, member_projects=[888])
+    assert "errors" not in results
+    assert results == expected
+    assert len(results["data"]["samples"]) == 2
+    assert len(results["data"]["sequencingReads"]) == 6
+
+    # Relay node queries
+    node_id = results["data"]["samples"][0]["_id"]
+    query = f"""
+        query MyQuery {{
+          node(id: "{node_id}") {{
+            ... on Sample {{
+              name
+            }}
+          }}
+        }}
+    """
+    results = await gql_client.query(query, user_id=111, member_projects=[888])
+    assert results["data"]["node"]["name"] == expected["data"]["samples"][0]["name"]
@@ -0,0 +1,80 @@
+"""
+Tests for the cache of rows shared by all requests (ENTITY_CACHE_SIZE)
+"""
+
+import pytest
+from fastapi import FastAPI
+from platformics.database.connect import SyncDB
+from platformics.graphql_api.core.entity_cache import EntityCache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from conftest import GQLTestClient, SessionStorage
+from test_infra.factories.sample import SampleFactory
+from test_infra.factories.sequencing_read import SequencingReadFactory
+
+
+@pytest.mark.asyncio
+async def test_entity_cache(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+    api_test_schema: FastAPI,
+) -> None:
+    """
+    Rows read by primary key are shared between requests, re-authorized for each principal, and evicted
+    by the mutations that write them
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        sample = SampleFactory.create(owner_user_id=111, collection_id=888)
+        # A read that another user can see, of a sample that they can't
+        SequencingReadFactory.create(sample=sample, owner_user_id=222, collection_id=999)
+        session.commit()
+        sample_id = str(sample.id)
+
+    settings = api_test_schema.state.settings
+    settings.ENTITY_CACHE_SIZE = 100
+    entity_cache = EntityCache(settings)
+    api_test_schema.state.entity_cache = entity_cache
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    query = """
+        query MyQuery {
+          sequencingReads {
+            sample { id name }
+          }
+        }
+    """
+    results = await gql_client.query(query, user_id=111, member_projects=[888, 999])
+    assert results["data"]["sequencingReads"][0]["sample"]["id"] == sample_id
+    assert entity_cache.stats.misses == 1
+
+    # The sample is read from the cache
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        cached_results = await gql_client.query(query, user_id=111, member_projects=[888, 999])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+    assert cached_results == results
+    assert entity_cache.stats.hits == 1
+    assert len(statements) == 1
+
+    # ... but only returned to principals that can view it
+    results = await gql_client.query(query, user_id=222, member_projects=[999])
+    assert results["data"]["sequencingReads"][0]["sample"] is None
+    assert entity_cache.stats.hits == 2
+
+    # Updating the sample evicts it
+    mutation = f"""
+        mutation MyMutation {{
+          updateSample(input: {{ name: "Updated" }}, where: {{ id: {{ _eq: "{sample_id}" }} }}) {{ id }}
+        }}
+    """
+    results = await gql_client.query(mutation, user_id=111, member_projects=[888])
+    assert "errors" not in results
+    assert entity_cache.stats.evictions == 1
+    results = await gql_client.query(query, user_id=111, member_projects=[888, 999])
+    assert results["data"]["sequencingReads"][0]["sample"]["name"] == "Updated"
@@ -106,3 +106,113 @@ async def test_offset_query(
     output = await gql_client.query(query, user_id=user_id, member_projects=[project_id])
     assert output["data"] is None
     assert "Cannot use offset without limit" in output["errors"][0]["message"]
+
+
+@pytest.mark.asyncio
+async def test_cursor_query(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Test that we can page through samples with cursors, including on a sort key with duplicates and nulls
+    """
+    user_id = 12345
+    project_id = 123
+
+    # Create mock data
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        for i in range(10):
+            SampleFactory.create(
+                description=f"Description {i % 3}" if i % 4 else None,
+                owner_user_id=user_id,
+                collection_id=project_id,
+            )
+
+    for order_by in ["{description: desc}", "{description: asc_nulls_first}", "{collectionDate: asc}", "[]"]:
+        all_samples_query = f"""
+            query allSamples {{
+                samples(orderBy: {order_by}, limitOffset: {{limit: 100}}) {{
+                    id
+                    _cursor
+                }}
+            }}
+        """
+        output = await gql_client.query(all_samples_query, user_id=user_id, member_projects=[project_id])
+        all_samples = output["data"]["samples"]
+        all_sample_ids = [sample["id"] for sample in all_samples]
+
+        # Page forwards, 3 samples at a time
+        page_ids: list[str] = []
+        cursor_arg = ""
+        while True:
+            query = f"""
+                query cursorQuery {{
+                    samples(orderBy: {order_by}, limitOffset: {{limit: 3}}{cursor_arg}) {{
+                        id
+                        _cursor
+                    }}
+                }}
+            """
+            output = await gql_client.query(query, user_id=user_id, member_projects=[project_id])
+            page = output["data"]["samples"]
+            if not page:
+                break
+            page_ids.extend(sample["id"] for sample in page)
+            cursor_arg = f', after: "{page[-1]["_cursor"]}"'
+        assert page_ids == all_sample_ids
+
+        # Fetch the samples right before one of them
+        query = f"""
+            query cursorQuery {{
+                samples(orderBy: {order_by}, limitOffset: {{limit: 3}}, before: "{all_samples[6]["_cursor"]}") {{
+                    id
+                }}
+            }}
+        """
+        output = await gql_client.query(query, user_id=user_id, member_projects=[project_id])
+        assert [sample["id"] for sample in output["data"]["samples"]] == all_sample_ids[3:6]
+
+
+@pytest.mark.asyncio
+async def test_cursors_of_aliased_queries(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Test that the same rows get the cursor of each query that returns them
+    """
+    user_id = 12345
+    project_id = 123
+
+    # Create mock data
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        for i in range(5):
+            SampleFactory.create(name=f"Sample {i}", owner_user_id=user_id, collection_id=project_id)
+
+    query = """
+        query cursorQuery {
+            ascending: samples(orderBy: {name: asc}, limitOffset: {limit: 5}) {
+                id
+                _cursor
+            }
+            descending: samples(orderBy: {name: desc}, limitOffset: {limit: 5}) {
+                id
+                _cursor
+            }
+        }
+    """
+    output = await gql_client.query(query, user_id=user_id, member_projects=[project_id])
+    for alias, direction in [("ascending", "asc"), ("descending", "desc")]:
+        samples = output["data"][alias]
+        # Each cursor is the row's position in the list it came with
+        query = f"""
+            query cursorQuery {{
+                samples(orderBy: {{name: {direction}}}, limitOffset: {{limit: 5}}, after: "{samples[1]["_cursor"]}") {{
+                    id
+                }}
+            }}
+        """
+        next_output = await gql_client.query(query, user_id=user_id, member_projects=[project_id])
+        assert [sample["id"] for sample in next_output["data"]["samples"]] == [sample["id"] for sample in samples[2:]]
@@ -4,6 +4,10 @@ Tests for nested queries + authorization
 
 import pytest
 from collections import defaultdict
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from fastapi import FastAPI
+from strawberry import relay
 from platformics.database.connect import SyncDB
 from conftest import GQLTestClient, SessionStorage
 from test_infra.factories.sample import SampleFactory
@@ -47,6 +51,52 @@ async def test_nested_query(
         assert results["data"]["sequencingReads"][i]["sample"]["name"] == sequencing_reads[i].sample.name
 
 
+@pytest.mark.asyncio
+async def test_nested_to_one_query_is_joined(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Many-to-one relationships are loaded in the same query as their parents, and still authorized
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        sequencing_reads = SequencingReadFactory.create_batch(3, owner_user_id=111, collection_id=888)
+        for sr in sequencing_reads:
+            sr.sample.collection_id = 888
+        # This sample is in a project that the user can't see
+        sequencing_reads[0].sample.collection_id = 999
+        session.commit()
+        hidden_sample_read_id = str(sequencing_reads[0].id)
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    query = """
+        query MyQuery {
+          sequencingReads {
+            id
+            sample {
+              name
+            }
+          }
+        }
+    """
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        results = await gql_client.query(query, user_id=111, member_projects=[888])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+    assert len(statements) == 1
+    for sequencing_read in results["data"]["sequencingReads"]:
+        if sequencing_read["id"] == hidden_sample_read_id:
+            assert sequencing_read["sample"] is None
+        else:
+            assert sequencing_read["sample"]["name"]
+
+
 @pytest.mark.asyncio
 async def test_nested_query_relay(
     sync_db: SyncDB,
@@ -137,6 +187,62 @@ async def test_nested_query_relay(
         assert actual_samples_by_owner[userid] == 1
 
 
+@pytest.mark.asyncio
+async def test_nested_query_relay_pagination(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Paginate through the sequencing reads of several samples (1:M) at once
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        sa1 = SampleFactory(owner_user_id=111, collection_id=888)
+        sa2 = SampleFactory(owner_user_id=111, collection_id=888)
+        SequencingReadFactory.create_batch(5, sample=sa1, owner_user_id=111, collection_id=888)
+        SequencingReadFactory.create_batch(3, sample=sa2, owner_user_id=111, collection_id=888)
+
+    def get_query(page_args: str) -> str:
+        return f"""
+            query MyQuery {{
+              samples {{
+                id
+                sequencingReads({page_args}orderBy: {{id: desc}}) {{
+                  pageInfo {{ hasNextPage endCursor }}
+                  edges {{ node {{ id }} }}
+                }}
+              }}
+            }}
+        """
+
+    results = await gql_client.query(get_query(""), user_id=111, member_projects=[888])
+    all_reads = {
+        sample["id"]: [edge["node"]["id"] for edge in sample["sequencingReads"]["edges"]]
+        for sample in results["data"]["samples"]
+    }
+    assert sorted(len(reads) for reads in all_reads.values()) == [3, 5]
+
+    # Only the requested window of reads is returned for each sample
+    results = await gql_client.query(get_query("first: 2, "), user_id=111, member_projects=[888])
+    for sample in results["data"]["samples"]:
+        connection = sample["sequencingReads"]
+        assert [edge["node"]["id"] for edge in connection["edges"]] == all_reads[sample["id"]][:2]
+        assert connection["pageInfo"]["hasNextPage"]
+
+    # ... and the next page starts after the cursor
+    end_cursor = results["data"]["samples"][0]["sequencingReads"]["pageInfo"]["endCursor"]
+    results = await gql_client.query(
+        get_query(f'first: 2, after: "{end_cursor}", '), user_id=111, member_projects=[888]
+    )
+    for sample in results["data"]["samples"]:
+        assert [edge["node"]["id"] for edge in sample["sequencingReads"]["edges"]] == all_reads[sample["id"]][2:4]
+
+    # `last` without a cursor still needs every row
+    results = await gql_client.query(get_query("last: 1, "), user_id=111, member_projects=[888])
+    for sample in results["data"]["samples"]:
+        assert [edge["node"]["id"] for edge in sample["sequencingReads"]["edges"]] == all_reads[sample["id"]][-1:]
+
+
 @pytest.mark.asyncio
 async def test_relay_node_queries(
     sync_db: SyncDB,
@@ -217,3 +323,129 @@ async def test_relay_node_queries(
     assert results["data"]["nodes"][0]["name"] == sample1.name
     assert results["data"]["nodes"][1]["name"] == sample2.name
     assert results["data"]["nodes"][2]["technology"] == sequencing_read.technology
+
+
+@pytest.mark.asyncio
+async def test_relay_node_queries_are_batched(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Aliased node queries for the same type are fetched in a single statement
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        samples = SampleFactory.create_batch(4, owner_user_id=111, collection_id=888)
+        session.commit()
+        sample_ids = [str(sample.id) for sample in samples]
+        sample_names = [sample.name for sample in samples]
+
+    node_ids = [relay.to_base64("Sample", sample_id) for sample_id in sample_ids]
+    fields = "\n".join(
+        f'sample{i}: node(id: "{node_id}") {{ ... on Sample {{ name }} }}' for i, node_id in enumerate(node_ids)
+    )
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        results = await gql_client.query(f"query MyQuery {{ {fields} }}", user_id=111, member_projects=[888])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+    assert len(statements) == 1
+    for i in range(len(samples)):
+        assert results["data"][f"sample{i}"]["name"] == sample_names[i]
+
+
+@pytest.mark.asyncio
+async def test_nested_query_batches_are_chunked(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+    api_test_schema: FastAPI,
+) -> None:
+    """
+    Dataloader batches larger than DATALOADER_MAX_BATCH_SIZE are loaded in chunks
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        samples = SampleFactory.create_batch(5, owner_user_id=111, collection_id=888)
+        for sample in samples:
+            SequencingReadFactory.create_batch(2, sample=sample, owner_user_id=111, collection_id=888)
+        session.commit()
+
+    api_test_schema.state.settings.DATALOADER_MAX_BATCH_SIZE = 2
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    query = """
+        query MyQuery {
+          samples {
+            sequencingReads {
+              edges { node { id } }
+            }
+          }
+        }
+    """
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        results = await gql_client.query(query, user_id=111, member_projects=[888])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+    # One statement for the samples, and one per chunk of (at most 2) samples for their reads
+    assert len(statements) == 1 + 3
+    assert len(results["data"]["samples"]) == 5
+    for sample in results["data"]["samples"]:
+        assert len(sample["sequencingReads"]["edges"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_nested_query_uses_identity_cache(
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Rows that a request has already read aren't fetched again by many-to-one relationships or node queries
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        samples = SampleFactory.create_batch(3, owner_user_id=111, collection_id=888)
+        for sample in samples:
+            SequencingReadFactory.create_batch(2, sample=sample, owner_user_id=111, collection_id=888)
+        session.commit()
+        node_id = relay.to_base64("Sample", str(samples[0].id))
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    query = f"""
+        query MyQuery {{
+          samples {{
+            name
+            sequencingReads {{
+              edges {{ node {{ id sample {{ name }} }} }}
+            }}
+          }}
+          node(id: "{node_id}") {{
+            ... on Sample {{
+              name
+            }}
+          }}
+        }}
+    """
+    event.listen(Engine, "before_cursor_execute", record_statement)
+    try:
+        results = await gql_client.query(query, user_id=111, member_projects=[888])
+    finally:
+        event.remove(Engine, "before_cursor_execute", record_statement)
+    # One statement for the samples, one for their reads, and one for the node (which runs concurrently with
+    # the samples query, so the sample isn't cached yet)
+    assert len(statements) == 3
+    for sample in results["data"]["samples"]:
+        for edge in sample["sequencingReads"]["edges"]:
+            assert edge["node"]["sample"]["name"] == sample["name"]
@@ -0,0 +1,132 @@
+"""
+Tests for the cache of top-level query results (RESULT_CACHE_SIZE)
+"""
+
+import database.models as db
+import pytest
+from fastapi import FastAPI
+from platformics.database.connect import AsyncDB, SyncDB
+from platformics.database.table_versions import TableVersions
+from platformics.graphql_api.core.cursors import PaginatedRows
+from platformics.graphql_api.core.result_cache import ResultCache
+from platformics.settings import APISettings
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
+from conftest import GQLTestClient, SessionStorage
+from test_infra.factories.sample import SampleFactory
+from tests.helpers import wait_for
+
+
+@pytest.mark.asyncio
+async def test_result_cache(
+    sync_db: SyncDB,
+    async_db: AsyncDB,
+    gql_client: GQLTestClient,
+    api_test_schema: FastAPI,
+) -> None:
+    """
+    Results are shared by principals with the same authorization scope, until their tables are written
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        SampleFactory.create_batch(3, owner_user_id=111, collection_id=888)
+        SampleFactory.create_batch(2, owner_user_id=222, collection_id=999)
+        session.commit()
+
+    settings = api_test_schema.state.settings
+    settings.DB_TABLE_VERSIONS = True
+    settings.RESULT_CACHE_SIZE = 100
+    table_versions = TableVersions(settings)
+    result_cache = ResultCache(settings, table_versions)
+    api_test_schema.state.table_versions = table_versions
+    api_test_schema.state.result_cache = result_cache
+    table_versions.start(async_db)
+
+    statements = []
+
+    def record_statement(conn, cursor, statement, *args) -> None:  # type: ignore
+        statements.append(statement)
+
+    query = """
+        query MyQuery {
+          samples(orderBy: {name: asc}) { name }
+          samplesAggregate { aggregate { count } }
+        }
+    """
+    try:
+        await wait_for(lambda: table_versions.is_live)
+        results = await gql_client.query(query, user_id=111, member_projects=[888])
+        assert len(results["data"]["samples"]) == 3
+        assert result_cache.stats.misses == 2
+
+        # Another principal with the same authorization scope gets the cached results
+        event.listen(Engine, "before_cursor_execute", record_statement)
+        try:
+            cached_results = await gql_client.query(query, user_id=333, member_projects=[888])
+        finally:
+            event.remove(Engine, "before_cursor_execute", record_statement)
+        assert cached_results == results
+        assert result_cache.stats.hits == 2
+        assert statements == []
+
+        # ... but not principals that can see other rows
+        results = await gql_client.query(query, user_id=222, member_projects=[999])
+        assert results["data"]["samplesAggregate"]["aggregate"][0]["count"] == 2
+        assert result_cache.stats.misses == 4
+
+        # Writes invalidate the results
+        mutation = """
+            mutation MyMutation {
+              createSample(input: {
+                name: "Test Sample"
+                sampleType: "Type 1"
+                waterControl: false
+                collectionLocation: "San Francisco, CA"
+                collectionDate: "2024-01-01"
+                collectionId: 888
+              }) { id }
+            }
+        """
+        results = await gql_client.query(mutation, user_id=111, member_projects=[888])
+        assert "errors" not in results
+        results = await gql_client.query(query, user_id=111, member_projects=[888])
+        assert len(results["data"]["samples"]) == 4
+        assert results["data"]["samplesAggregate"]["aggregate"][0]["count"] == 4
+    finally:
+        await table_versions.stop()
+
+
+@pytest.mark.asyncio
+async def test_cached_rows_outlive_their_session(sync_db: SyncDB, async_db: AsyncDB) -> None:
+    """
+    Cached rows are rebuilt on each hit, rather than shared with the session that read them
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        SampleFactory.create_batch(2, owner_user_id=111, collection_id=888)
+        session.commit()
+
+    settings = APISettings.model_construct(
+        RESULT_CACHE_SIZE=100,
+        DB_TABLE_VERSIONS=True,
+        DB_TABLE_VERSIONS_RECONNECT_DELAY=1,
+    )
+    result_cache = ResultCache(settings, TableVersions(settings))
+    async with async_db.session() as async_session:
+
+        async def load() -> PaginatedRows:
+            rows = (await async_session.execute(select(db.Sample).order_by(db.Sample.name))).scalars().all()
+            return PaginatedRows(rows, ["first", "second"])
+
+        rows = await result_cache.get_or_load("samples", load, ttl=60)
+        ids = [row.id for row in rows]
+        # Rolling back expires the rows that the session read
+        await async_session.rollback()
+
+    cached_rows = await result_cache.get_or_load("samples", load, ttl=60)
+    assert result_cache.stats.hits == 1
+    assert isinstance(cached_rows, PaginatedRows)
+    assert cached_rows.cursors == ["first", "second"]
+    assert cached_rows[0] is not rows[0]
+    assert [row.id for row in cached_rows] == ids
+    assert all(row.name for row in cached_rows)
@@ -0,0 +1,41 @@
+"""
+Tests for the sessions shared by the resolvers of a request
+"""
+
+import database.models as db
+import pytest
+from platformics.database.connect import AsyncDB, RequestSessionManager, SyncDB
+from sqlalchemy import select
+from conftest import SessionStorage
+from test_infra.factories.sample import SampleFactory
+
+
+@pytest.mark.asyncio
+async def test_failed_borrowers_dont_expire_rows(sync_db: SyncDB, async_db: AsyncDB) -> None:
+    """
+    Rows returned by one resolver stay usable when another resolver of the request fails
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        SampleFactory.create_batch(2, owner_user_id=111, collection_id=888)
+        session.commit()
+
+    session_manager = RequestSessionManager(async_db, 1)
+    try:
+        async with session_manager.session(read_only=True) as read_session:
+            rows = (await read_session.execute(select(db.Sample))).scalars().all()
+            # The read transaction ends with the borrow
+            assert rows
+        assert not read_session.in_transaction()
+
+        with pytest.raises(ValueError):
+            async with session_manager.session(read_only=True) as read_session:
+                await read_session.execute(select(db.Sample))
+                raise ValueError("failed")
+        with pytest.raises(ValueError):
+            async with session_manager.session():
+                raise ValueError("failed")
+        # Accessing an expired attribute would lazy-load it, which fails outside of a greenlet
+        assert all(row.name for row in rows)
+    finally:
+        await session_manager.close()
@@ -0,0 +1,45 @@
+"""
+Tests for the cache of statements built for queries with the same shape
+"""
+
+import pytest
+from fastapi import FastAPI
+from platformics.database.connect import SyncDB
+from conftest import GQLTestClient, SessionStorage
+from test_infra.factories.sample import SampleFactory
+
+
+@pytest.mark.asyncio
+async def test_statements_are_reused_with_new_values(
+    api_test_schema: FastAPI,
+    sync_db: SyncDB,
+    gql_client: GQLTestClient,
+) -> None:
+    """
+    Queries that only differ by their values (including the projects they're authorized for) share a statement
+    """
+    with sync_db.session() as session:
+        SessionStorage.set_session(session)
+        SampleFactory.create(name="apple", owner_user_id=111, collection_id=888)
+        SampleFactory.create(name="banana", owner_user_id=111, collection_id=888)
+        SampleFactory.create(name="cherry", owner_user_id=222, collection_id=999)
+        session.commit()
+
+    query = """
+        query MyQuery {
+          samples(where: {name: {_in: %s}}, orderBy: {name: asc}) {
+            name
+          }
+        }
+    """
+    stats = api_test_schema.state.authz_client.statement_cache.stats
+    results = await gql_client.query(query % '["apple"]', user_id=111, member_projects=[888])
+    assert [sample["name"] for sample in results["data"]["samples"]] == ["apple"]
+    misses = stats.misses
+
+    results = await gql_client.query(query % '["banana", "cherry"]', user_id=111, member_projects=[888])
+    assert [sample["name"] for sample in results["data"]["samples"]] == ["banana"]
+    results = await gql_client.query(query % '["apple", "cherry"]', user_id=222, member_projects=[999])
+    assert [sample["name"] for sample in results["data"]["samples"]] == ["cherry"]
+    assert stats.misses == misses
+    assert stats.hits == 2
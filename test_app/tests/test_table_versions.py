@@ -0,0 +1,65 @@
+"""
+Tests for the write versions of tables (DB_TABLE_VERSIONS)
+"""
+
+import pytest
+from fastapi import FastAPI
+from platformics.database.connect import AsyncDB
+from platformics.database.table_versions import TableVersions
+from conftest import GQLTestClient
+from tests.helpers import wait_for
+
+
+@pytest.mark.asyncio
+async def test_mutations_bump_table_versions(
+    async_db: AsyncDB,
+    gql_client: GQLTestClient,
+    api_test_schema: FastAPI,
+) -> None:
+    """
+    Mutations bump the versions of the tables they write to, and every worker hears about it
+    """
+    settings = api_test_schema.state.settings
+    settings.DB_TABLE_VERSIONS = True
+    table_versions = TableVersions(settings)
+    api_test_schema.state.table_versions = table_versions
+    # Stands in for another worker
+    other_table_versions = TableVersions(settings)
+    table_versions.start(async_db)
+    other_table_versions.start(async_db)
+    try:
+        await wait_for(lambda: table_versions.is_live and other_table_versions.is_live)
+        assert other_table_versions.get_versions(["entity", "sample"]) == (0, 0)
+
+        mutation = """
+            mutation MyMutation {
+              createSample(input: {
+                name: "Test Sample"
+                sampleType: "Type 1"
+                waterControl: false
+                collectionLocation: "San Francisco, CA"
+                collectionDate: "2024-01-01"
+                collectionId: 123
+              }) { id }
+            }
+        """
+        results = await gql_client.query(mutation, member_projects=[123])
+        assert "errors" not in results
+        # The worker that committed the write doesn't wait for the notification
+        assert table_versions.get_versions(["entity", "sample"]) == (1, 1)
+        await wait_for(lambda: other_table_versions.get("sample") == 1)
+
+        sample_id = results["data"]["createSample"]["id"]
+        mutation = f"""
+            mutation MyMutation {{
+              deleteSample(where: {{ id: {{ _eq: "{sample_id}" }} }}) {{ id }}
+            }}
+        """
+        results = await gql_client.query(mutation, member_projects=[123])
+        assert "errors" not in results
+        await wait_for(lambda: other_table_versions.get("sample") == 2)
+        assert other_table_versions.get_versions(["entity", "sample", "sequencing_read"]) == (2, 2, 0)
+    finally:
+        await table_versions.stop()
+        await other_table_versions.stop()
+    assert table_versions.get_versions(["sample"]) is None